@@ -1,11 +1,37 @@
-from . import modeltools
-from . import latextools
-from . import utils
-from . import analyse
-from .analyse import Symca
-from .analyse import RateChar
-from .analyse import ThermoKin
-from .utils.model_graph import ModelGraph
-from .utils.plotting import SimpleData2D
-from .utils.plotting import Data2D
+# Submodules and their (heavy) dependencies, e.g. pysces, sympy and
+# matplotlib, are only imported when they are first accessed.
+from importlib import import_module
+
 from .version import __version__
+
+_lazy_submodules = ['modeltools',
+                    'latextools',
+                    'utils',
+                    'analyse',
+                    'profiling']
+
+_lazy_attributes = {'Symca': ('.analyse', 'Symca'),
+                    'RateChar': ('.analyse', 'RateChar'),
+                    'ThermoKin': ('.analyse', 'ThermoKin'),
+                    'ModelGraph': ('.utils.model_graph', 'ModelGraph'),
+                    'SimpleData2D': ('.utils.plotting', 'SimpleData2D'),
+                    'Data2D': ('.utils.plotting', 'Data2D')}
+
+__all__ = _lazy_submodules + list(_lazy_attributes) + ['__version__']
+
+
+def __getattr__(name):
+    if name in _lazy_submodules:
+        return import_module('.' + name, __name__)
+    try:
+        module_name, attribute = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(
+            __name__, name))
+    value = getattr(import_module(module_name, __name__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
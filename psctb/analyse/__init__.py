@@ -1,3 +1,23 @@
-from ._ratechar import RateChar
-from ._symca import Symca
-from ._thermokin import ThermoKin
+# The analysis classes are only imported when they are first accessed.
+from importlib import import_module
+
+_lazy_attributes = {'RateChar': '._ratechar',
+                    'Symca': '._symca',
+                    'ThermoKin': '._thermokin'}
+
+__all__ = list(_lazy_attributes)
+
+
+def __getattr__(name):
+    try:
+        module_name = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(
+            __name__, name))
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
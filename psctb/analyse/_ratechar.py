@@ -2,26 +2,35 @@ from __future__ import division, print_function
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
-from os import path
+from os import path, listdir, remove, replace, fdopen
+from tempfile import mkstemp
+from zipfile import BadZipFile
+from hashlib import sha1
 from colorsys import hsv_to_rgb, rgb_to_hsv
 from collections import OrderedDict
 from random import shuffle
+from multiprocessing import cpu_count
 
 import numpy
 from pysces.PyscesModelMap import ModelMap
 from pysces import Scanner
 import pysces
-from matplotlib.pyplot import get_cmap
+from matplotlib.pyplot import get_cmap, subplots
 
 from .. import modeltools
 from ..latextools import LatexExpr
 from ..utils.plotting import ScanFig, LineData, Data2D
 from ..utils.misc import silence_print
 from ..utils.misc import DotDict
+from ..utils.misc import LazyDotDict
+from ..utils.misc import ResultArray
 from ..utils.misc import formatter_factory
+from ..utils.misc import parallel_map
+from ._ratechar_session import RateCharSessionStore
 
 
 exportLAWH = silence_print(pysces.write.exportLabelledArrayWithHeader)
+quiet_mod_to_str = silence_print(modeltools.mod_to_str)
 
 __all__ = ['RateChar']
 
@@ -36,6 +45,47 @@ def strip_nan_from_scan(array_like):
     return array_like[start:end, :]
 
 
+def _scalar_or_pair(value):
+    # RateChar2D accepts either a single value for both fixed species
+    # or a separate value for each of the two
+    if type(value) is list or type(value) is tuple:
+        assert len(value) == 2, 'Expected a value for each fixed species'
+        return tuple(value)
+    return value, value
+
+
+def _nearest_log_index(scan_range, values):
+    # maps scan output values back onto the positions of a log spaced
+    # scan range (Scanner does not guarantee bit-identical values)
+    log_range = numpy.log10(scan_range)
+    log_values = numpy.log10(values)
+    return numpy.argmin(numpy.abs(log_values[:, None] - log_range[None, :]),
+                        axis=1)
+
+
+@silence_print
+def _scan_2d_slice(args):
+    # worker for RateChar.do_ratechar_2d - instantiates its own copy of
+    # the fixed model from its string representation and scans a block
+    # of the grid. Needs to be module level to be picklable.
+    (model_str, model_name, fixed_pair, range_1, range_2,
+     user_output, solver) = args
+
+    fixed_mod = modeltools.str_to_mod(model_str, model_name)
+    fixed_mod.SetQuiet()
+    fixed_mod.mode_solver = solver
+
+    scanner = Scanner(fixed_mod)
+    scanner.quietRun = True
+    scanner.addScanParameter(fixed_pair[0], range_1[0], range_1[-1],
+                             len(range_1), log=True)
+    scanner.addScanParameter(fixed_pair[1], range_2[0], range_2[-1],
+                             len(range_2), log=True)
+    scanner.addUserOutput(*user_output)
+    scanner.Run()
+    return scanner.UserOutputResults
+
+
 class RateChar(object):
     def __init__(self, mod, min_concrange_factor=100,
                  max_concrange_factor=100,
@@ -59,6 +109,7 @@ class RateChar(object):
         self._ltxe = LatexExpr(self.mod)
         for species in self.mod.species:
             setattr(self, species, None)
+        self.pair_results = DotDict()
         if auto_load:
             self.load_session()
 
@@ -69,9 +120,19 @@ class RateChar(object):
                     max_concrange_factor=None,
                     scan_points=None,
                     solver=0,
-                    auto_save=False):
+                    auto_save=False,
+                    checkpoint=False,
+                    checkpoint_chunk_size=32):
 
         # this function wraps _do_scan functionality in a user friendly bubble
+
+        # with checkpoint=True the results of each species (and of each
+        # completed chunk of a scan) are written to the "checkpoints"
+        # subdirectory of the working dir as soon as they are available.
+        # A re-run with the same model, range, points and solver resumes
+        # from (or entirely reuses) these results.
+        if checkpoint:
+            model_hash = self._model_hash()
         if fixed == 'all':
             to_scan = self.mod.species
         elif type(fixed) is list or type(fixed) is tuple:
@@ -101,11 +162,23 @@ class RateChar(object):
             if not scan_points:
                 scan_points = self._scan_points
 
-            column_names, results = self._do_scan(fixed_mod,
-                                                  each,
-                                                  scan_start,
-                                                  scan_end,
-                                                  scan_points)
+            if checkpoint:
+                column_names, results = self._do_checkpointed_scan(
+                    fixed_mod,
+                    each,
+                    scan_start,
+                    scan_end,
+                    scan_points,
+                    solver,
+                    model_hash,
+                    checkpoint_chunk_size)
+            else:
+                column_names, results = self._do_scan(fixed_mod,
+                                                      each,
+                                                      scan_start,
+                                                      scan_end,
+                                                      scan_points,
+                                                      solver)
 
             cleaned_results = strip_nan_from_scan(results)
 
@@ -120,6 +193,154 @@ class RateChar(object):
         if auto_save:
             self.save_session()
 
+    def do_ratechar_2d(self, fixed_pair,
+                       scan_min=None,
+                       scan_max=None,
+                       min_concrange_factor=None,
+                       max_concrange_factor=None,
+                       scan_points=64,
+                       solver=0,
+                       par_scan=True,
+                       processes=None):
+        """
+        Performs a two-dimensional supply-demand analysis for a pair of
+        metabolites.
+
+        Both metabolites are fixed at their steady-state values and the
+        fluxes of all the reactions that produce or consume either of them
+        are calculated over a log spaced grid of the two concentrations.
+        The results are stored as a ``RateCharData2D`` object in
+        ``pair_results`` under the key "fixed1_fixed2".
+
+        Parameters
+        ----------
+        fixed_pair : list of str
+            The two species to fix. The first species varies along the
+            first axis of the result arrays.
+        scan_min : float or list of float, optional (Default : None)
+            The minimum concentration of the scan. Either a single value
+            or one value for each of the fixed species.
+        scan_max : float or list of float, optional (Default : None)
+            The maximum concentration of the scan. Either a single value
+            or one value for each of the fixed species.
+        min_concrange_factor : float or list of float, optional (Default : None)
+            Factor by which the steady-state concentration is divided to
+            obtain ``scan_min`` when it is not supplied.
+        max_concrange_factor : float or list of float, optional (Default : None)
+            Factor by which the steady-state concentration is multiplied to
+            obtain ``scan_max`` when it is not supplied.
+        scan_points : int or list of int, optional (Default : 64)
+            The number of points along each axis of the grid.
+        solver : int, optional (Default : 0)
+            The PySCeS steady-state solver mode.
+        par_scan : bool, optional (Default : True)
+            Distributes the grid over a pool of worker processes.
+        processes : int, optional (Default : None)
+            The number of worker processes. If None the number of CPUs is
+            used.
+
+        Returns
+        -------
+        RateCharData2D
+            The results of the analysis.
+        """
+        assert len(fixed_pair) == 2, 'Exactly two species must be fixed'
+        fixed_pair = [str(each) for each in fixed_pair]
+        for each in fixed_pair:
+            assert each in self.mod.species, 'Invalid species'
+        assert fixed_pair[0] != fixed_pair[1], 'Fixed species must differ'
+        assert solver in (0, 1, 2), 'Solver mode can only be one of 0, 1 or 2'
+
+        fixed_mod, fixed_ss = self._fix_pair_at_ss(fixed_pair)
+
+        scan_mins = _scalar_or_pair(scan_min)
+        scan_maxs = _scalar_or_pair(scan_max)
+        min_factors = _scalar_or_pair(min_concrange_factor)
+        max_factors = _scalar_or_pair(max_concrange_factor)
+        points = _scalar_or_pair(scan_points)
+
+        scan_ranges = []
+        for i in range(2):
+            scan_start = self._min_max_chooser(fixed_ss[i],
+                                               scan_mins[i],
+                                               min_factors[i],
+                                               'min')
+            scan_end = self._min_max_chooser(fixed_ss[i],
+                                             scan_maxs[i],
+                                             max_factors[i],
+                                             'max')
+            scan_ranges.append(numpy.logspace(numpy.log10(scan_start),
+                                              numpy.log10(scan_end),
+                                              points[i]))
+        range_1, range_2 = scan_ranges
+
+        flux_names = []
+        for each in fixed_pair:
+            fix_map = getattr(self._model_map, each)
+            for reaction in fix_map.isSubstrateOf() + fix_map.isProductOf():
+                flux = str('J_' + reaction)
+                if flux not in flux_names:
+                    flux_names.append(flux)
+        user_output = fixed_pair + flux_names
+
+        # the first axis is divided into blocks of at least two points
+        # (Scanner needs a start and end point) that are scanned in
+        # separate processes
+        if par_scan:
+            if processes is None:
+                processes = cpu_count()
+            n_blocks = max(1, min(processes, len(range_1) // 2))
+        else:
+            n_blocks = 1
+            processes = 1
+        blocks = numpy.array_split(range_1, n_blocks)
+
+        model_str = quiet_mod_to_str(fixed_mod)
+        base_name = '%s_%s_%s' % (modeltools.get_model_name(self.mod),
+                                  fixed_pair[0],
+                                  fixed_pair[1])
+        jobs = [(model_str, '%s_%d' % (base_name, i), fixed_pair, block,
+                 range_2, user_output, solver)
+                for i, block in enumerate(blocks)]
+        block_results = parallel_map(_scan_2d_slice, jobs,
+                                     processes=processes)
+
+        flux_data = numpy.empty((len(range_1), len(range_2),
+                                 len(flux_names)))
+        flux_data.fill(numpy.nan)
+        for results in block_results:
+            i_1 = _nearest_log_index(range_1, results[:, 0])
+            i_2 = _nearest_log_index(range_2, results[:, 1])
+            flux_data[i_1, i_2, :] = results[:, 2:]
+
+        rcd = RateCharData2D(fixed_pair=fixed_pair,
+                             fixed_ss=fixed_ss,
+                             fixed_mod=fixed_mod,
+                             basemod=self.mod,
+                             flux_names=flux_names,
+                             scan_range_1=range_1,
+                             scan_range_2=range_2,
+                             flux_data=flux_data,
+                             model_map=self._model_map,
+                             ltxe=self._ltxe)
+        self.pair_results['_'.join(fixed_pair)] = rcd
+        return rcd
+
+    @silence_print
+    def _fix_pair_at_ss(self, fixed_pair):
+        # fixes two metabolites at their steady-state
+        # (calls psctb.modeltools.fix_metabolites)
+        # and returns both ss values and the fixed model
+        self.mod.doState()
+        fixed_ss = tuple(getattr(self.mod, each + '_ss')
+                         for each in fixed_pair)
+        fixed_mod = modeltools.fix_metabolites(self.mod, fixed_pair)
+        fixed_mod.SetQuiet()
+        for each, ss in zip(fixed_pair, fixed_ss):
+            setattr(fixed_mod, each, ss)
+        fixed_mod.doState()
+        return fixed_mod, fixed_ss
+
     def _min_max_chooser(self, ss, point, concrange, min_max):
         # chooses a minimum or maximum point based
         # on the information given by a user
@@ -142,6 +363,126 @@ class RateChar(object):
 
         return the_point
 
+    def _model_hash(self):
+        # the model file string includes the current values of all
+        # parameters and is therefore a reasonable fingerprint of the
+        # model as it will be scanned
+        return sha1(quiet_mod_to_str(self.mod).encode('utf-8')).hexdigest()
+
+    @property
+    def _checkpoint_dir(self):
+        return modeltools.make_path(self.mod,
+                                    self._analysis_method,
+                                    ['checkpoints'])
+
+    def _checkpoint_file(self, fixed):
+        return path.join(self._checkpoint_dir, fixed + '.npz')
+
+    def _do_checkpointed_scan(self,
+                              fixed_mod,
+                              fixed,
+                              scan_min,
+                              scan_max,
+                              scan_points,
+                              solver,
+                              model_hash,
+                              chunk_size):
+        # performs the same scan as _do_scan, but in chunks of the scan
+        # range, saving the results after each chunk. Any matching
+        # checkpoint (same inputs) is resumed.
+        key = sha1(repr((model_hash,
+                         fixed,
+                         float(scan_min),
+                         float(scan_max),
+                         int(scan_points),
+                         int(solver))).encode('utf-8')).hexdigest()
+        file_name = self._checkpoint_file(fixed)
+
+        scan_range = numpy.logspace(numpy.log10(scan_min),
+                                    numpy.log10(scan_max),
+                                    scan_points)
+        column_names = None
+        done_points = 0
+        partial_results = []
+        if path.exists(file_name):
+            try:
+                with numpy.load(file_name) as data_file:
+                    if str(data_file['key']) == key:
+                        column_names = [str(each) for each in
+                                        list(data_file['column_names'])]
+                        partial_results = [data_file['results']]
+                        # resume from the number of completed points
+                        # rather than chunks, as the chunk size may differ
+                        # from that of the interrupted scan
+                        done_points = partial_results[0].shape[0]
+            except (IOError, KeyError, ValueError, EOFError, BadZipFile):
+                # e.g. a checkpoint of an incompatible version
+                column_names = None
+                done_points = 0
+                partial_results = []
+            if done_points > scan_points:
+                column_names = None
+                done_points = 0
+                partial_results = []
+
+        chunks = self._checkpoint_chunks(scan_points - done_points,
+                                         chunk_size)
+        for start, stop in chunks:
+            start += done_points
+            stop += done_points
+            column_names, results = self._do_scan(fixed_mod,
+                                                  fixed,
+                                                  scan_range[start],
+                                                  scan_range[stop - 1],
+                                                  stop - start,
+                                                  solver)
+            partial_results.append(results)
+            partial_results = [numpy.vstack(partial_results)]
+            self._save_checkpoint(file_name,
+                                  key=numpy.array(key),
+                                  column_names=numpy.array(column_names),
+                                  results=partial_results[0])
+
+        return column_names, partial_results[0]
+
+    @staticmethod
+    def _save_checkpoint(file_name, **arrays):
+        # the checkpoint is written to a temporary file that then replaces
+        # the previous checkpoint, so that an interrupted write never
+        # leaves a truncated checkpoint behind
+        fd, temp_name = mkstemp(suffix='.npz.tmp',
+                                dir=path.dirname(file_name))
+        try:
+            with fdopen(fd, 'wb') as f:
+                numpy.savez(f, **arrays)
+            replace(temp_name, file_name)
+        except BaseException:
+            if path.exists(temp_name):
+                remove(temp_name)
+            raise
+
+    @staticmethod
+    def _checkpoint_chunks(scan_points, chunk_size):
+        # (start, stop) indices of the chunks of a scan. Scanner needs
+        # at least two points, so a trailing single point is merged into
+        # the previous chunk.
+        chunk_size = max(2, int(chunk_size))
+        chunks = [[start, min(start + chunk_size, scan_points)]
+                  for start in range(0, scan_points, chunk_size)]
+        if len(chunks) > 1 and chunks[-1][1] - chunks[-1][0] < 2:
+            last = chunks.pop()
+            chunks[-1][1] = last[1]
+        return [tuple(each) for each in chunks]
+
+    def clear_checkpoints(self):
+        """
+        Removes all checkpoint files of this model.
+        """
+        checkpoint_dir = self._checkpoint_dir
+        for each in listdir(checkpoint_dir):
+            if each.endswith('.npz'):
+                remove(path.join(checkpoint_dir, each))
+
     @silence_print
     def _do_scan(self,
                  fixed_mod,
@@ -192,7 +533,29 @@ class RateChar(object):
         fixed_mod.doState()
         return fixed_mod, fixed_ss
 
-    def save_session(self, file_name=None):
+    def save_session(self, file_name=None, store='npz'):
+        """
+        Saves the scan results of all species.
+
+        Parameters
+        ----------
+        file_name : str, optional (Default : None)
+            The file (``store="npz"``) or directory (``store="mmap"``) to
+            save to. If None a default location in the working directory
+            is used.
+        store : str, optional (Default : "npz")
+            Either "npz" to save all results to a single numpy npz file or
+            "mmap" to save each data kind of each species to a separate
+            memory-mappable array file in a directory with a JSON manifest
+            (see ``RateCharSessionStore``). Sessions saved with "mmap" load
+            instantaneously and only read the data of the species that are
+            accessed.
+        """
+        assert store in ('npz', 'mmap'), 'store must be "npz" or "mmap"'
+        if store == 'mmap':
+            self._save_session_store(file_name)
+            return
+
         file_name = modeltools.get_file_path(working_dir=self._working_dir,
                                              internal_filename='save_data',
                                              fmt='npz',
@@ -221,7 +584,112 @@ class RateChar(object):
             getattr(self, species).save_all_results(folder=folder,
                                                     separator=separator)
 
-    def load_session(self, file_name=None):
+    def _session_store_dir(self, directory=None):
+        if not directory:
+            directory = path.join(self._working_dir, 'session_store')
+        return directory
+
+    def _save_session_store(self, directory=None):
+        store = RateCharSessionStore(self._session_store_dir(directory))
+        to_save = {}
+        for species in self.mod.species:
+            # species that were lazily loaded and never accessed are not
+            # in __dict__ and do not need to be loaded just to be saved
+            species_object = self.__dict__.get(species)
+            if species_object is not None:
+                to_save[species] = species_object
+        # the files of species that have not been accessed yet are copied
+        # from the store they were loaded from (unless it is this store)
+        lazy_species = self.__dict__.get('_lazy_species')
+        if lazy_species:
+            source = self._session_store
+            if path.abspath(source.directory) != \
+                    path.abspath(store.directory):
+                store.copy_species(source, sorted(lazy_species))
+        store.save(to_save, model_name=modeltools.get_model_name(self.mod))
+
+    def _load_session_store(self, directory=None):
+        # species are only loaded on first access (see __getattr__)
+        store = RateCharSessionStore(self._session_store_dir(directory))
+        if not RateCharSessionStore.is_store(store.directory):
+            raise IOError('No session store found in %s' % store.directory)
+        self._session_store = store
+        self._lazy_species = set()
+        for species in store.species:
+            if species in self.mod.species:
+                self.__dict__.pop(species, None)
+                self._lazy_species.add(species)
+
+    def _load_stored_species(self, species):
+        store = self._session_store
+        entry = store.entry(species)
+        fixed_mod, _ = self._fix_at_ss(species)
+        rcd = RateCharData(fixed_ss=entry['fixed_ss'],
+                           fixed_mod=fixed_mod,
+                           basemod=self.mod,
+                           column_names=entry['column_names'],
+                           scan_results=store.load(species, 'flux'),
+                           model_map=self._model_map,
+                           ltxe=self._ltxe)
+        coefficient_results = {}
+        for each in ['ec', 'rc', 'prc']:
+            coefficient_results[each] = (entry[each + '_names'],
+                                         store.load(species, each))
+        mca_values = store.load(species, 'mca', mmap_mode=None)
+        rcd._use_stored_results(coefficient_results,
+                                entry['mca_names'],
+                                mca_values)
+        return rcd
+
+    def __getattr__(self, name):
+        # only called when normal attribute lookup fails, i.e. for species
+        # of a session store that have not been accessed yet
+        lazy_species = self.__dict__.get('_lazy_species')
+        if lazy_species and name in lazy_species:
+            lazy_species.discard(name)
+            rcd = self._load_stored_species(name)
+            setattr(self, name, rcd)
+            return rcd
+        raise AttributeError(name)
+
+    def session_size(self, directory=None):
+        """
+        Returns the size on disk of the results of each species in a
+        session store.
+
+        Parameters
+        ----------
+        directory : str, optional (Default : None)
+            The directory of the session store. If None the default session
+            store location in the working directory is used.
+
+        Returns
+        -------
+        dict
+            Species names as keys and sizes (in bytes) as values.
+        """
+        store = RateCharSessionStore(self._session_store_dir(directory))
+        return store.species_size()
+
+    def load_session(self, file_name=None, store='npz'):
+        """
+        Loads previously saved scan results.
+
+        Parameters
+        ----------
+        file_name : str, optional (Default : None)
+            The file or session store directory to load. If None the
+            default location in the working directory is used.
+        store : str, optional (Default : "npz")
+            Either "npz" or "mmap" (see ``save_session``). Directories
+            containing a session store are always loaded as "mmap".
+        """
+        assert store in ('npz', 'mmap'), 'store must be "npz" or "mmap"'
+        if store == 'mmap' or (file_name and
+                               RateCharSessionStore.is_store(file_name)):
+            self._load_session_store(file_name)
+            return
+
         file_name = modeltools.get_file_path(working_dir=self._working_dir,
                                              internal_filename='save_data',
                                              fmt='npz',
@@ -266,8 +734,8 @@ class RateCharData(object):
         super(RateCharData, self).__init__()
         self.mod = fixed_mod
 
-        self.scan_results = DotDict()
-        self.mca_results = DotDict()
+        self.scan_results = LazyDotDict()
+        self._mca_results = None
 
         self._slope_range_factor = 3.0
 
@@ -282,12 +750,6 @@ class RateCharData(object):
         self.scan_results['flux_min'] = None
         self.scan_results['scan_max'] = None
         self.scan_results['scan_min'] = None
-        self.scan_results['ec_names'] = None
-        self.scan_results['ec_data'] = None
-        self.scan_results['rc_names'] = None
-        self.scan_results['rc_data'] = None
-        self.scan_results['prc_names'] = None
-        self.scan_results['prc_data'] = None
 
         self._column_names = column_names
         self._scan_results = scan_results
@@ -301,31 +763,98 @@ class RateCharData(object):
         self._ltxe = ltxe
 
         self._color_dict_ = None
+        self._line_data_dict_ = None
+        self._mca_done = False
         self._data_setup()
-        self.mca_results._ltxe = ltxe
-        self.mca_results._make_repr(
-            '"$" + self._ltxe.expression_to_latex(k) + "$"', 'v',
-            formatter_factory())
         # del self.scan_results
         # del self.mca_results
 
     def _data_setup(self):
-        # reset value to do mcarc
-        setattr(self.mod, self.scan_results.fixed, self.scan_results.fixed_ss)
-        self.mod.doMcaRC()
+        # Only the flux results are set up here. The MCA at the fixed
+        # steady state, tangent lines, summaries and line data are only
+        # calculated once they are accessed (see _add_lazy_coefficients,
+        # mca_results and _line_data_dict).
         self._make_attach_total_fluxes()
         self._min_max_setup()
         self._attach_fluxes_to_self()
-        self._make_all_coefficient_lines()
+        self._add_lazy_coefficients()
+
+    def _mca_setup(self):
+        if not self._mca_done:
+            # reset value to do mcarc
+            setattr(self.mod, self.scan_results.fixed,
+                    self.scan_results.fixed_ss)
+            self.mod.doMcaRC()
+            self._mca_done = True
+
+    def _add_lazy_coefficients(self):
+        # all coefficient tangent lines are calculated together on first
+        # access of any of their names or data
+        def make_coefficients(key):
+            def factory():
+                self._mca_setup()
+                self._make_all_coefficient_lines()
+                self._attach_all_coefficients_to_self()
+                return self.scan_results[key]
+            return factory
+
+        for key in self._coefficient_names():
+            self.scan_results.add_lazy(key, make_coefficients(key))
+        for each in ['ec', 'rc', 'prc']:
+            for suffix in ['_names', '_data']:
+                key = each + suffix
+                self.scan_results.add_lazy(key, make_coefficients(key))
+
+    def _coefficient_names(self):
+        # the names of the ec, rc and prc tangent lines
+        # (see _make_ec_lines, _make_rc_lines and _make_prc_lines)
+        fixed = self.scan_results.fixed
+        reagent_of = [each[2:] for each in self.scan_results.flux_names]
+        all_reactions = reagent_of + \
+                        getattr(self._model_map, fixed).isModifierOf()
+        names = ['ec%s_%s' % (reaction, fixed) for reaction in reagent_of]
+        names += ['rcJ%s_%s' % (reaction, fixed) for reaction in reagent_of]
+        names += ['prcJ%s_%s_%s' % (reaction, fixed, route_reaction)
+                  for reaction in reagent_of
+                  for route_reaction in all_reactions]
+        return names
+
+    @property
+    def mca_results(self):
+        if self._mca_results is None:
+            self._mca_setup()
+            self._init_mca_results()
+            self._make_all_summary()
+        return self._mca_results
+
+    def _init_mca_results(self, names=None, values=None):
+        self._mca_results = ResultArray(names, values)
+        self._mca_results._ltxe = self._ltxe
+        self._mca_results._make_repr(
+            '"$" + self._ltxe.expression_to_latex(k) + "$"', 'v',
+            formatter_factory())
+
+    def _use_stored_results(self, coefficient_results, mca_names, mca_values):
+        # uses previously calculated (e.g. memory mapped) tangent lines and
+        # mca results instead of calculating them
+        # coefficient_results is a dict of {'ec': (names, data), ...}
+        for each, (names, data) in coefficient_results.items():
+            self.scan_results[each + '_names'] = names
+            self.scan_results[each + '_data'] = data
         self._attach_all_coefficients_to_self()
-        self._make_all_summary()
-        self._make_all_line_data()
+        self._init_mca_results(mca_names, mca_values)
+
+    @property
+    def _line_data_dict(self):
+        if self._line_data_dict_ is None:
+            self._make_all_line_data()
+        return self._line_data_dict_
 
     def _change_colour_order(self, order=None):
         if not order:
-            order = list(self._color_dict_.keys())
+            order = list(self._color_dict.keys())
             shuffle(order)
-        self._color_dict_ = dict(list(zip(order, list(self._color_dict_.values()))))
+        self._color_dict_ = dict(list(zip(order, list(self._color_dict.values()))))
         self._make_all_line_data()
 
     def _make_all_line_data(self):
@@ -335,13 +864,14 @@ class RateCharData(object):
         self._make_prc_ld()
         self._make_total_flux_ld()
 
-        self._line_data_dict = OrderedDict()
-        self._line_data_dict.update(self._prc_ld_dict)
-        self._line_data_dict.update(self._flux_ld_dict)
-        self._line_data_dict.update(self._total_flux_ld_dict)
+        line_data_dict = OrderedDict()
+        line_data_dict.update(self._prc_ld_dict)
+        line_data_dict.update(self._flux_ld_dict)
+        line_data_dict.update(self._total_flux_ld_dict)
 
-        self._line_data_dict.update(self._ec_ld_dict)
-        self._line_data_dict.update(self._rc_ld_dict)
+        line_data_dict.update(self._ec_ld_dict)
+        line_data_dict.update(self._rc_ld_dict)
+        self._line_data_dict_ = line_data_dict
 
         del self._flux_ld_dict
         del self._ec_ld_dict
@@ -355,10 +885,12 @@ class RateCharData(object):
         self._make_rc_summary()
         self._make_prc_summary()
 
-        self.mca_results.update(self._ec_summary)
-        self.mca_results.update(self._cc_summary)
-        self.mca_results.update(self._rc_summary)
-        self.mca_results.update(self._prc_summary)
+        summary = OrderedDict()
+        summary.update(self._ec_summary)
+        summary.update(self._cc_summary)
+        summary.update(self._rc_summary)
+        summary.update(self._prc_summary)
+        self._mca_results.update(summary)
 
         del self._ec_summary
         del self._cc_summary
@@ -619,8 +1151,8 @@ class RateCharData(object):
 
         resps = numpy.hstack(resps)
 
-        self.scan_results.rc_names = names
-        self.scan_results.rc_data = resps
+        self.scan_results['rc_names'] = names
+        self.scan_results['rc_data'] = resps
 
     def _make_prc_lines(self):
         names = []
@@ -653,8 +1185,8 @@ class RateCharData(object):
 
         prcs = numpy.hstack(prcs)
 
-        self.scan_results.prc_names = names
-        self.scan_results.prc_data = prcs
+        self.scan_results['prc_names'] = names
+        self.scan_results['prc_data'] = prcs
 
     def _make_ec_lines(self):
         names = []
@@ -673,8 +1205,8 @@ class RateCharData(object):
 
         elasts = numpy.hstack(elasts)
 
-        self.scan_results.ec_names = names
-        self.scan_results.ec_data = elasts
+        self.scan_results['ec_names'] = names
+        self.scan_results['ec_data'] = elasts
 
     def _attach_coefficients_to_self(self, names, tangent_lines):
         sp = 0
@@ -1056,3 +1588,219 @@ class RateCharData(object):
 
         return rc_data_obj, cc_ec_data_obj
 
+
+
+class RateCharData2D(object):
+    """
+    Contains the results of a two-dimensional supply-demand analysis.
+
+    All results are stored as arrays with the first axis corresponding to
+    ``scan_results.scan_range_1`` (the first fixed species) and the second
+    axis to ``scan_results.scan_range_2`` (the second fixed species).
+    Individual surfaces (e.g. ``scan_results.J_R1``) are views into the
+    stacked arrays ``flux_data``, ``rc_data`` and ``ec_data``.
+
+    Response coefficient surfaces are named ``rcJreaction_fixed`` and
+    block elasticity surfaces ``ecSupply_species_fixed`` or
+    ``ecDemand_species_fixed``, where ``species`` indicates the block
+    (the reactions producing or consuming ``species``) and ``fixed`` the
+    species with respect to which the coefficient is calculated.
+    """
+    def __init__(self,
+                 fixed_pair,
+                 fixed_ss,
+                 fixed_mod,
+                 basemod,
+                 flux_names,
+                 scan_range_1,
+                 scan_range_2,
+                 flux_data,
+                 model_map,
+                 ltxe):
+
+        super(RateCharData2D, self).__init__()
+        self.mod = fixed_mod
+
+        self.scan_results = DotDict()
+
+        self.scan_results['fixed'] = list(fixed_pair)
+        self.scan_results['fixed_ss'] = tuple(fixed_ss)
+        self.scan_results['scan_range_1'] = scan_range_1
+        self.scan_results['scan_range_2'] = scan_range_2
+        self.scan_results['flux_names'] = list(flux_names)
+        self.scan_results['flux_data'] = flux_data
+        self.scan_results['ec_names'] = None
+        self.scan_results['ec_data'] = None
+        self.scan_results['rc_names'] = None
+        self.scan_results['rc_data'] = None
+
+        self._model_map = model_map
+        self._analysis_method = 'ratechar'
+        self._basemod = basemod
+        self._working_dir = modeltools.make_path(self._basemod,
+                                                 self._analysis_method,
+                                                 ['_'.join(fixed_pair)])
+        self._ltxe = ltxe
+
+        self._data_setup()
+
+    def _data_setup(self):
+        for i, each in enumerate(self.scan_results.flux_names):
+            self.scan_results[each] = self.scan_results.flux_data[:, :, i]
+        self._make_attach_total_fluxes()
+        self._make_rc_surfaces()
+        self._make_ec_surfaces()
+
+    def _block_positions(self, species):
+        fix_map = getattr(self._model_map, species)
+        dem_pos = [self.scan_results.flux_names.index('J_' + flux)
+                   for flux in fix_map.isSubstrateOf()]
+        sup_pos = [self.scan_results.flux_names.index('J_' + flux)
+                   for flux in fix_map.isProductOf()]
+        return sup_pos, dem_pos
+
+    def _make_attach_total_fluxes(self):
+        flux_data = self.scan_results.flux_data
+        for species in self.scan_results.fixed:
+            sup_pos, dem_pos = self._block_positions(species)
+            self.scan_results['total_supply_' + species] = numpy.sum(
+                flux_data[:, :, sup_pos], axis=2)
+            self.scan_results['total_demand_' + species] = numpy.sum(
+                flux_data[:, :, dem_pos], axis=2)
+
+    def _log_gradients(self, data):
+        # scaled (log-log) slopes of data along both fixed species axes
+        # data has shape (points_1, points_2, n)
+        with numpy.errstate(all='ignore'):
+            log_data = numpy.log10(numpy.abs(data))
+            log_data[numpy.isinf(log_data)] = numpy.nan
+            return numpy.gradient(log_data,
+                                  numpy.log10(self.scan_results.scan_range_1),
+                                  numpy.log10(self.scan_results.scan_range_2),
+                                  axis=(0, 1))
+
+    def _make_rc_surfaces(self):
+        gradients = self._log_gradients(self.scan_results.flux_data)
+
+        names = []
+        for species in self.scan_results.fixed:
+            for flux in self.scan_results.flux_names:
+                names.append('rcJ%s_%s' % (flux[2:], species))
+
+        self.scan_results['rc_names'] = names
+        self.scan_results.rc_data = numpy.concatenate(gradients, axis=2)
+        self._attach_surfaces_to_self(self.scan_results.rc_names,
+                                      self.scan_results.rc_data)
+
+    def _make_ec_surfaces(self):
+        block_names = []
+        blocks = []
+        for species in self.scan_results.fixed:
+            block_names.append('Supply_' + species)
+            blocks.append(self.scan_results['total_supply_' + species])
+            block_names.append('Demand_' + species)
+            blocks.append(self.scan_results['total_demand_' + species])
+
+        gradients = self._log_gradients(numpy.stack(blocks, axis=2))
+
+        names = []
+        for species in self.scan_results.fixed:
+            for block in block_names:
+                names.append('ec%s_%s' % (block, species))
+
+        self.scan_results['ec_names'] = names
+        self.scan_results.ec_data = numpy.concatenate(gradients, axis=2)
+        self._attach_surfaces_to_self(self.scan_results.ec_names,
+                                      self.scan_results.ec_data)
+
+    def _attach_surfaces_to_self(self, names, surfaces):
+        for i, name in enumerate(names):
+            self.scan_results[name] = surfaces[:, :, i]
+
+    def get_surface(self, name):
+        """
+        Returns the surface of a flux, total block flux, response
+        coefficient or block elasticity.
+
+        Parameters
+        ----------
+        name : str
+            The name of the surface (e.g. "J_R1", "total_supply_S1",
+            "rcJR1_S1" or "ecSupply_S1_S2").
+
+        Returns
+        -------
+        numpy.ndarray
+            A 2D array with shape (``len(scan_range_1)``,
+            ``len(scan_range_2)``).
+        """
+        try:
+            return self.scan_results[name]
+        except KeyError:
+            raise KeyError('%s is not a valid surface name' % name)
+
+    def plot_surface(self, name, levels=20, cmap='viridis'):
+        """
+        Plots a filled contour plot of a surface over the two fixed
+        species concentrations.
+
+        Parameters
+        ----------
+        name : str
+            The name of the surface (see ``get_surface``).
+        levels : int, optional (Default : 20)
+            The number of contour levels.
+        cmap : str, optional (Default : "viridis")
+            A matplotlib colour map name.
+
+        Returns
+        -------
+        tuple
+            The matplotlib figure and axes.
+        """
+        surface = self.get_surface(name)
+        fixed_1, fixed_2 = self.scan_results.fixed
+        fig, ax = subplots()
+        contours = ax.contourf(self.scan_results.scan_range_1,
+                               self.scan_results.scan_range_2,
+                               surface.transpose(),
+                               levels,
+                               cmap=cmap)
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel('[%s]' % fixed_1.replace('_', ' '))
+        ax.set_ylabel('[%s]' % fixed_2.replace('_', ' '))
+        ax.plot(self.scan_results.fixed_ss[0], self.scan_results.fixed_ss[1],
+                'o', color='white', mec='gray')
+        cbar = fig.colorbar(contours, ax=ax)
+        cbar.set_label('$%s$' % self._ltxe.expression_to_latex(name)
+                       if name in self.scan_results.rc_names else
+                       name.replace('_', ' '))
+        return fig, ax
+
+    def save_results(self, file_name=None):
+        """
+        Saves the stacked result arrays and their names to a numpy npz
+        file.
+
+        Parameters
+        ----------
+        file_name : str, optional (Default : None)
+            The path of the file. If None the file is saved in the working
+            directory of the fixed pair.
+        """
+        file_name = modeltools.get_file_path(working_dir=self._working_dir,
+                                             internal_filename='surface_results',
+                                             fmt='npz',
+                                             file_name=file_name)
+        to_save = {}
+        for k in ['scan_range_1', 'scan_range_2', 'flux_data', 'rc_data',
+                  'ec_data']:
+            to_save[k] = self.scan_results[k]
+        for k in ['fixed', 'flux_names', 'rc_names', 'ec_names']:
+            to_save[k] = numpy.array(self.scan_results[k])
+        to_save['fixed_ss'] = numpy.array(self.scan_results.fixed_ss)
+        try:
+            numpy.savez(file_name, **to_save)
+        except IOError as e:
+            print(e.strerror)
@@ -0,0 +1,200 @@
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+from os import path, makedirs, remove
+from shutil import copyfile
+
+import numpy
+
+__all__ = ['RateCharSessionStore']
+
+
+class RateCharSessionStore(object):
+    """
+    A directory based store for RateChar sessions.
+
+    Each array of each species is saved as a separate ``.npy`` file that
+    is opened as a read-only memory map when loaded, so that only the
+    data of the species (and data kinds) that are actually used are read
+    from disk. A small JSON manifest describes the contents of the store.
+
+    The data kinds saved for each species are:
+
+    ``flux``
+        The scan results (fixed species concentration and fluxes).
+    ``ec``, ``rc``, ``prc``
+        The tangent line data of the respective coefficients.
+    ``mca``
+        The values of all ec, cc, rc and prc coefficients at the fixed
+        steady state (i.e. ``RateCharData.mca_results``).
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the store.
+    """
+
+    manifest_name = 'manifest.json'
+    kinds = ['flux', 'ec', 'rc', 'prc', 'mca']
+
+    def __init__(self, directory):
+        super(RateCharSessionStore, self).__init__()
+        self.directory = directory
+        self._manifest = None
+
+    @classmethod
+    def is_store(cls, directory):
+        """
+        Returns True if ``directory`` contains a session store.
+        """
+        return path.isfile(path.join(directory, cls.manifest_name))
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            manifest_file = path.join(self.directory, self.manifest_name)
+            if path.isfile(manifest_file):
+                with open(manifest_file) as f:
+                    self._manifest = json.load(f)
+            else:
+                self._manifest = {'format': 1, 'species': {}}
+        return self._manifest
+
+    @property
+    def species(self):
+        return list(self.manifest['species'].keys())
+
+    def _write_manifest(self):
+        manifest_file = path.join(self.directory, self.manifest_name)
+        with open(manifest_file, 'w') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+
+    def save(self, rcd_dict, model_name=None):
+        """
+        Saves the results of a number of species to the store.
+
+        Parameters
+        ----------
+        rcd_dict : dict
+            A dictionary with species names as keys and ``RateCharData``
+            objects as values.
+        model_name : str, optional (Default : None)
+            The name of the model that is recorded in the manifest.
+        """
+        if not path.exists(self.directory):
+            makedirs(self.directory)
+        if model_name:
+            self.manifest['model'] = model_name
+
+        for species, rcd in rcd_dict.items():
+            self._remove_species_files(species)
+
+            mca_names = sorted(rcd.mca_results.keys())
+            arrays = {
+                'flux': rcd._scan_results,
+                'ec': rcd.scan_results['ec_data'],
+                'rc': rcd.scan_results['rc_data'],
+                'prc': rcd.scan_results['prc_data'],
+                'mca': numpy.array([rcd.mca_results[k] for k in mca_names],
+                                   dtype=float)}
+
+            entry = {'fixed_ss': float(rcd.scan_results.fixed_ss),
+                     'column_names': [str(each) for each in
+                                      rcd._column_names],
+                     'ec_names': list(rcd.scan_results['ec_names']),
+                     'rc_names': list(rcd.scan_results['rc_names']),
+                     'prc_names': list(rcd.scan_results['prc_names']),
+                     'mca_names': mca_names,
+                     'files': {},
+                     'nbytes': {}}
+            for kind in self.kinds:
+                file_name = '%s_%s.npy' % (species, kind)
+                numpy.save(path.join(self.directory, file_name),
+                           numpy.ascontiguousarray(arrays[kind]))
+                entry['files'][kind] = file_name
+                entry['nbytes'][kind] = int(arrays[kind].nbytes)
+            self.manifest['species'][species] = entry
+        self._write_manifest()
+
+    def copy_species(self, source, species_list):
+        """
+        Copies the results of a number of species from another store
+        without loading them.
+
+        Parameters
+        ----------
+        source : RateCharSessionStore
+            The store to copy from.
+        species_list : iterable of str
+            The species to copy.
+        """
+        if not path.exists(self.directory):
+            makedirs(self.directory)
+        if 'model' in source.manifest:
+            self.manifest.setdefault('model', source.manifest['model'])
+
+        for species in species_list:
+            self._remove_species_files(species)
+            entry = json.loads(json.dumps(source.entry(species)))
+            for file_name in entry['files'].values():
+                copyfile(path.join(source.directory, file_name),
+                         path.join(self.directory, file_name))
+            self.manifest['species'][species] = entry
+        self._write_manifest()
+
+    def _remove_species_files(self, species):
+        old_entry = self.manifest['species'].get(species, {})
+        for file_name in old_entry.get('files', {}).values():
+            old_file = path.join(self.directory, file_name)
+            if path.isfile(old_file):
+                remove(old_file)
+
+    def load(self, species, kind, mmap_mode='r'):
+        """
+        Returns an array of a species from the store.
+
+        Parameters
+        ----------
+        species : str
+            The species.
+        kind : str
+            One of "flux", "ec", "rc", "prc" or "mca".
+        mmap_mode : str, optional (Default : "r")
+            The memory map mode passed to ``numpy.load``. If None the
+            array is read into memory.
+
+        Returns
+        -------
+        numpy.ndarray or numpy.memmap
+        """
+        assert kind in self.kinds, 'kind must be one of %s' % self.kinds
+        file_name = self.manifest['species'][species]['files'][kind]
+        return numpy.load(path.join(self.directory, file_name),
+                          mmap_mode=mmap_mode)
+
+    def entry(self, species):
+        """
+        Returns the manifest entry of a species.
+        """
+        return self.manifest['species'][species]
+
+    def species_size(self):
+        """
+        Returns the size in bytes on disk of the data of each species.
+
+        Returns
+        -------
+        dict
+            Species names as keys and sizes (in bytes) as values.
+        """
+        sizes = {}
+        for species, entry in self.manifest['species'].items():
+            size = 0
+            for file_name in entry['files'].values():
+                file_path = path.join(self.directory, file_name)
+                if path.isfile(file_path):
+                    size += path.getsize(file_path)
+            sizes[species] = size
+        return sizes
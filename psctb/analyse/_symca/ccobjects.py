@@ -3,17 +3,14 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 import numpy as np
-from numpy import array, nanmin, nanmax
+from numpy import nanmin, nanmax
 from sympy import Symbol
 from pysces import ModelMap, Scanner, ParScanner
-from numpy import nan, abs
+from numpy import abs
 
-from ...utils.model_graph import ModelGraph
 from ...utils.misc import silence_print, DotDict, formatter_factory, \
-    do_safe_state, find_min, find_max, get_value, stringify, \
-    scanner_range_setup
-
-from ...utils.plotting import Data2D
+    find_min, find_max, get_value, stringify, scanner_range_setup, \
+    state_version, legacy_scan
 
 
 def cctype(obj):
@@ -45,6 +42,8 @@ class CCBase(object):
 
         self._str_expression_ = None
         self._value = None
+        # the model state version (see state_version) of self._value
+        self._value_version = None
         self._latex_expression = None
 
     @property
@@ -68,8 +67,12 @@ class CCBase(object):
     @property
     def value(self):
         """The value property. Calls self._calc_value() when self._value
-        is None and returns self._value"""
-        self._calc_value()
+        was calculated for a different model state (or not at all) and
+        returns self._value"""
+        version = state_version(self.mod)
+        if self._value_version != version:
+            self._calc_value()
+            self._value_version = version
         return self._value
 
     def _repr_latex_(self):
@@ -130,6 +133,7 @@ class CCoef(CCBase):
         self._latex_expression = None
         self._latex_name = None
         self._abs_value = None
+        self._abs_value_version = None
 
         self.control_patterns = None
 
@@ -137,7 +141,10 @@ class CCoef(CCBase):
 
     @property
     def abs_value(self):
-        self._calc_abs_value()
+        version = state_version(self.mod)
+        if self._abs_value_version != version:
+            self._calc_abs_value()
+            self._abs_value_version = version
         return self._abs_value
 
     @property
@@ -171,55 +178,27 @@ class CCoef(CCBase):
             )
         return self._latex_name
 
-    def _perscan_legacy(self, parameter, scan_range):
-
-        scan_res = [list()
-                    for i in range(len(list(self.control_patterns.values())) + 1)]
-        scan_res[0] = scan_range
-
-        for parvalue in scan_range:
-            state_valid = do_safe_state(
-                self.mod, parameter, parvalue, type='mca')
-            cc_abs_value = 0
-            for i, cp in enumerate(self.control_patterns.values()):
-                if state_valid:
-                    cp_abs = abs(cp.value)
-                    scan_res[i + 1].append(cp_abs)
-                    cc_abs_value += cp_abs
-                else:
-                    scan_res[i + 1].append(nan)
-
-            for i, cp in enumerate(self.control_patterns.values()):
-                if state_valid:
-                    scan_res[i + 1][-1] = (scan_res[i + 1]
-                                           [-1] / cc_abs_value) * 100
-
-        return scan_res
-
-    def _valscan_legacy(self, parameter, scan_range):
-
-        control_pattern_range = list(range(len(list(self.control_patterns.values())) + 2))
-        scan_res = [list() for i in control_pattern_range]
-        scan_res[0] = scan_range
-
-        for parvalue in scan_range:
-            state_valid = do_safe_state(self.mod,
-                                        parameter,
-                                        parvalue,
-                                        type='mca')
-            cc_value = 0
-            for i, cp in enumerate(self.control_patterns.values()):
-                if state_valid:
-                    cp_value = cp.value
-                    scan_res[i + 1].append(cp_value)
-                    cc_value += cp_value
-                else:
-                    scan_res[i + 1].append(nan)
-            if state_valid:
-                scan_res[i + 2].append(cc_value)
-            else:
-                scan_res[i + 2].append(nan)
-
+    def _perscan_legacy(self, parameter, scan_range, processes=1):
+        val_scan_res = self._valscan_legacy(parameter, scan_range, processes)
+        return self._percentages(val_scan_res)
+
+    def _valscan_legacy(self, parameter, scan_range, processes=1):
+        # each point is calculated separately on copies of the model and
+        # points without a valid state are nan
+        needed_symbols = stringify(list(self.expression.atoms(Symbol)))
+        subs_dict = legacy_scan(self.mod, parameter, scan_range,
+                                needed_symbols, state_type='mca',
+                                processes=processes)
+        return self._values_from_subs_dict(parameter, subs_dict)
+
+    @staticmethod
+    def _percentages(val_scan_res):
+        points = val_scan_res.shape[0]
+        parameter = val_scan_res[:, 0].reshape(points, 1)
+        cp_abs_vals = np.abs(val_scan_res[:, 1:-1])
+        cp_abs_sum = np.sum(cp_abs_vals, 1).reshape(points, 1)
+        cp_abs_perc = (cp_abs_vals / cp_abs_sum) * 100
+        scan_res = np.hstack([parameter, cp_abs_perc])
         return scan_res
 
     def _perscan(self,
@@ -232,14 +211,7 @@ class CCoef(CCBase):
                                      scan_range,
                                      par_scan,
                                      par_engine)
-
-        points = len(scan_range)
-        parameter = val_scan_res[:, 0].reshape(points, 1)
-        cp_abs_vals = np.abs(val_scan_res[:, 1:-1])
-        cp_abs_sum = np.sum(cp_abs_vals, 1).reshape(points, 1)
-        cp_abs_perc = (cp_abs_vals / cp_abs_sum) * 100
-        scan_res = np.hstack([parameter, cp_abs_perc])
-        return scan_res
+        return self._percentages(val_scan_res)
 
     def _valscan(self,
                  parameter,
@@ -268,13 +240,16 @@ class CCoef(CCBase):
         subs_dict = {}
         for i, symbol in enumerate(scanner.UserOutputList):
             subs_dict[symbol] = scanner.UserOutputResults[:, i]
+        return self._values_from_subs_dict(parameter, subs_dict)
 
+    def _values_from_subs_dict(self, parameter, subs_dict):
         control_pattern_names = list(self.control_patterns.keys())
         denom_expr = str(self.denominator)
         cp_numerators = [self.control_patterns[cp_name].numerator for
                          cp_name in control_pattern_names]
         column_exprs = stringify(cp_numerators)
 
+        points = len(subs_dict[parameter])
         parameter = subs_dict[parameter].reshape(points, 1)
 
         scan_res = []
@@ -294,7 +269,8 @@ class CCoef(CCBase):
                     init_return=True,
                     par_scan=False,
                     par_engine='multiproc',
-                    force_legacy=False):
+                    force_legacy=False,
+                    legacy_processes=1):
 
         assert scan_type in ['percentage', 'value']
         init = getattr(self.mod, parameter)
@@ -316,8 +292,8 @@ class CCoef(CCBase):
                 print(exception)
                 print('Switching over to slower scan method and replacing')
                 print('invalid steady states with nan values.')
-                scan_res = self._perscan_legacy(parameter, scan_range)
-                data_array = array(scan_res, dtype=float).transpose()
+                data_array = self._perscan_legacy(parameter, scan_range,
+                                                  legacy_processes)
 
             ylim = [nanmin(data_array[:, 1:]), nanmax(data_array[:, 1:]) * 1.1]
         elif scan_type == 'value':
@@ -335,8 +311,8 @@ class CCoef(CCBase):
                 print(exception)
                 print('Switching over to slower scan method and replacing')
                 print('invalid steady states with nan values.')
-                scan_res = self._valscan_legacy(parameter, scan_range)
-                data_array = array(scan_res, dtype=float).transpose()
+                data_array = self._valscan_legacy(parameter, scan_range,
+                                                  legacy_processes)
 
             ylim = [nanmin(data_array[:, 1:]), nanmax(data_array[:, 1:]) * 1.1]
         # print data_array.shape
@@ -359,6 +335,8 @@ class CCoef(CCBase):
                          'xlim': [find_min(scan_range), find_max(scan_range)],
                          'ylim': ylim}
 
+        # plotting (and matplotlib) is only imported when needed
+        from ...utils.plotting import Data2D
         data = Data2D(mod=self.mod,
                       column_names=column_names,
                       data_array=data_array,
@@ -379,8 +357,10 @@ class CCoef(CCBase):
         for key in keys:
             str_key = str(key)
             subsdict[str_key] = getattr(self.mod, str_key)
+        version = state_version(self.mod)
         for pattern in list(self.control_patterns.values()):
             pattern._calc_value(subsdict)
+            pattern._value_version = version
         self._abs_value = sum(
             [abs(pattern._value) for pattern in list(self.control_patterns.values())])
 
@@ -394,8 +374,10 @@ class CCoef(CCBase):
         for key in keys:
             str_key = str(key)
             subsdict[str_key] = getattr(self.mod, str_key)
+        version = state_version(self.mod)
         for pattern in list(self.control_patterns.values()):
             pattern._calc_value(subsdict)
+            pattern._value_version = version
         self._value = sum(
             [pattern._value for pattern in list(self.control_patterns.values())])
 
@@ -438,6 +420,7 @@ class CCoef(CCBase):
                            show_dummy_sinks=False,
                            show_external_modifier_links=False,
                            pos_dic=None):
+        from ...utils.model_graph import ModelGraph
 
         mg = ModelGraph(mod=self.mod, pos_dic=pos_dic,
                         analysis_method=self._analysis_method)
@@ -475,6 +458,7 @@ class CPattern(CCBase):
         self._latex_expression = None
         self._latex_name = None
         self._percentage = None
+        self._percentage_version = None
 
     def _calc_value(self, subsdict=None):
         """Calculates the value of the expression"""
@@ -516,5 +500,9 @@ class CPattern(CCBase):
 
     @property
     def percentage(self):
-        self._percentage = (abs(self.value) / self.parent.abs_value) * 100
+        version = state_version(self.mod)
+        if self._percentage_version != version:
+            self._percentage = (abs(self.value) /
+                                self.parent.abs_value) * 100
+            self._percentage_version = version
         return self._percentage
@@ -3,7 +3,6 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 import subprocess
-from os import devnull
 from os.path import join
 # from os import mkdir
 import sys
@@ -15,8 +14,9 @@ from .ccobjects import CCBase, CCoef
 from ...utils.misc import DotDict
 from ...utils.misc import formatter_factory
 from ...utils import ConfigReader
+from ...latextools import ExpressionCache
 from ...utils.misc import ec_list, prod_ec_list, mod_ec_list, \
-                          flux_list, ss_species_list
+                          flux_list, ss_species_list, coefficient_registry
 
 ## Everything in this file can be a function rather than a static method
 ## better yet, almost everything can be part of symca. Finally everything can
@@ -141,6 +141,7 @@ class SymcaToolBox(object):
         ecReationN2_M0 ecReationN2_M1 ecReationN2_M2
         """
         nmat = nmatrix
+        registry = coefficient_registry(mod)
 
         elas = []
 
@@ -149,9 +150,9 @@ class SymcaToolBox(object):
             elas_row = []
             for row in range(nmat.rows):
                 current_species = species[row]
-                ec_name = 'ec' + \
-                          str(current_reaction)[2:] + '_' + str(
-                    current_species)
+                ec_name = registry.coefficient_name(
+                    registry.find('ec', str(current_reaction)[2:],
+                                  str(current_species)))
                 cond1 = getattr(mod, ec_name) != 0
 
                 if cond1:
@@ -182,6 +183,8 @@ class SymcaToolBox(object):
         """
         nmat = nmatrix
 
+        registry = coefficient_registry(mod)
+
         elas = []
         modifiers = dict(mod.__modifiers__)
         for col in range(nmat.cols):
@@ -189,9 +192,9 @@ class SymcaToolBox(object):
             elas_row = []
             for row in range(nmat.rows):
                 current_species = species[row]
-                ec_name = 'ec' + \
-                          str(current_reaction)[2:] + '_' + str(
-                    current_species)
+                ec_name = registry.coefficient_name(
+                    registry.find('ec', str(current_reaction)[2:],
+                                  str(current_species)))
                 cond1 = nmat[row,col] != 0
                 cond2 = str(current_species) in modifiers[str(current_reaction)[2:]]
                 if cond1 or cond2:
@@ -337,8 +340,6 @@ class SymcaToolBox(object):
         function but uses maxima instead
         """
 
-        maxima_in_file = join(path_to,'in.txt').replace('\\','\\\\')
-        maxima_out_file = join(path_to,'out.txt').replace('\\','\\\\')
         if expression.is_Matrix:
             expr_mat = expression[:, :]
             # print expr_mat
@@ -356,30 +357,41 @@ class SymcaToolBox(object):
             sys.stdout.flush()
             return expr_mat
         else:
-            batch_string = (
-                'stardisp:true;stringout("'
-                + maxima_out_file + '",factor(' + str(expression) + '));')
-            # print batch_string
-            with open(maxima_in_file, 'w') as f:
-                f.write(batch_string)
-
-            config = ConfigReader.get_config()
-            if config['platform'] == 'win32':
-                maxima_command = [config['maxima_path'], '--batch=' + maxima_in_file]
-            else:
-                maxima_command = ['maxima', '--batch=' + maxima_in_file]
-
-            dn = open(devnull, 'w')
-            subprocess.call(maxima_command, stdin=dn, stdout=dn, stderr=dn)
-            simplified_expression = ''
-
-            with open(maxima_out_file) as f:
-                for line in f:
-                    if line != '\n':
-                        simplified_expression = line[:-2]
-            frac = fraction(sympify(simplified_expression))
-            # print frac[0].expand()/frac[1].expand()
-            return frac[0].expand() / frac[1].expand()
+            # maxima results are cached between sessions
+            return ExpressionCache.expression(
+                'maxima',
+                expression,
+                lambda expr: SymcaToolBox._maxima_factor(expr, path_to))
+
+    @staticmethod
+    def _maxima_factor(expression, path_to):
+        # factors a single (non-matrix) expression using maxima
+        maxima_in_file = join(path_to,'in.txt').replace('\\','\\\\')
+        maxima_out_file = join(path_to,'out.txt').replace('\\','\\\\')
+        batch_string = (
+            'stardisp:true;stringout("'
+            + maxima_out_file + '",factor(' + str(expression) + '));')
+        # print batch_string
+        with open(maxima_in_file, 'w') as f:
+            f.write(batch_string)
+
+        config = ConfigReader.get_config()
+        if config['platform'] == 'win32':
+            maxima_command = [config['maxima_path'], '--batch=' + maxima_in_file]
+        else:
+            maxima_command = ['maxima', '--batch=' + maxima_in_file]
+
+        subprocess.call(maxima_command, stdin=subprocess.DEVNULL,
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        simplified_expression = ''
+
+        with open(maxima_out_file) as f:
+            for line in f:
+                if line != '\n':
+                    simplified_expression = line[:-2]
+        frac = fraction(sympify(simplified_expression))
+        # print frac[0].expand()/frac[1].expand()
+        return frac[0].expand() / frac[1].expand()
 
     @staticmethod
     def solve_dep(cc_i_num, scaledk0, scaledl0, num_ind_fluxes, path_to):
@@ -3,19 +3,21 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 from os import path
+from collections import OrderedDict
 
-from numpy import log10, array, nan, nanmin, nanmax, savetxt, hstack
+from numpy import log10, array, nan, nanmin, nanmax, savetxt, hstack, \
+    asarray, broadcast_shapes, broadcast_to, errstate, zeros_like
 from pysces import ModelMap, ParScanner, Scanner
-from sympy import sympify, diff, Symbol
+from sympy import sympify, diff, Symbol, lambdify
 
 from ._thermokin_file_tools import get_subs_dict, get_reqn_path, \
     get_all_terms, get_term_types_from_raw_data, create_reqn_data, \
     write_reqn_file, create_gamma_keq_reqn_data, term_to_file
-from ..latextools import LatexExpr
+from ..latextools import LatexExpr, ExpressionCache
 from ..modeltools import make_path, get_file_path
-from ..utils.misc import do_safe_state, get_value, silence_print, print_f, \
+from ..utils.misc import get_value, silence_print, print_f, \
     is_number, stringify, scanner_range_setup, DotDict, formatter_factory, \
-    find_min, find_max
+    find_min, find_max, LazyDotDict, parallel_map, state_version, legacy_scan
 from ..utils.plotting import Data2D
 
 __author__ = 'carl'
@@ -74,10 +76,274 @@ def silent_state(mod):
     mod.doState()
 
 
+def elasticity_expression(args):
+    """
+    Derives the (scaled) elasticity expression of an expression with
+    respect to a symbol.
+
+    Parameters
+    ----------
+    args : tuple
+        A tuple of a sympy expression and a sympy.Symbol. A single
+        argument is used so that this function can be used with
+        ``parallel_map``.
+
+    Returns
+    -------
+    sympy expression
+
+    """
+    expression, symbol = args
+    return diff(expression, symbol) * (symbol / expression)
+
+
+def add_lazy_elasticity(owner, ec_name, symbol, parent, rname):
+    """
+    Adds an elasticity to the ``ec_results`` of a ``RateEqn`` or
+    ``RateTerm`` which is only derived when it is first accessed.
+
+    Parameters
+    ----------
+    owner : RateEqn or RateTerm
+        The object of which the expression is differentiated.
+    ec_name : str
+        The name of the elasticity.
+    symbol : sympy.Symbol
+        The symbol with respect to which the elasticity is calculated.
+    parent : RateEqn
+        The parent of the new elasticity ``Term``.
+    rname : str
+        The ``_rname`` of the new elasticity ``Term``.
+
+    """
+    owner._ec_specs[ec_name] = (symbol, parent, rname)
+    owner.ec_results.add_lazy(ec_name,
+                              lambda: make_elasticity_term(owner, ec_name))
+
+
+def make_elasticity_term(owner, ec_name, expression=None):
+    """
+    Creates the elasticity ``Term`` of an elasticity added with
+    ``add_lazy_elasticity``.
+
+    Parameters
+    ----------
+    owner : RateEqn or RateTerm
+    ec_name : str
+    expression : sympy expression, optional (Default : None)
+        A previously derived elasticity expression. If None the expression
+        is derived.
+
+    Returns
+    -------
+    Term
+
+    """
+    symbol, parent, rname = owner._ec_specs[ec_name]
+    if expression is None:
+        expression = elasticity_expression((owner._unfac_expression, symbol))
+    return Term(parent, owner.mod, ec_name, rname, expression, owner._ltxe)
+
+
+def build_rate_eqn_pieces(args):
+    """
+    Builds the symbolic components of a ``RateEqn`` and all its
+    elasticities.
+
+    This function is used to build rate equations in worker processes
+    (see ``ThermoKin``), after which the returned components are
+    assembled into ``RateEqn`` objects in the parent process.
+
+    Parameters
+    ----------
+    args : tuple
+        A tuple of the reaction name, the term dictionary and the
+        additional term dictionary (or None) of a reaction.
+
+    Returns
+    -------
+    dict
+        A dictionary with the sympified "terms" and "additional_terms",
+        the "expression" of the rate equation, the rate equation
+        elasticities ("ec_expressions") and a dictionary of term
+        elasticities for each term ("term_ec_expressions").
+
+    """
+    reaction, term_dict, additional_terms = args
+
+    terms = OrderedDict()
+    for term_name, expression in term_dict.items():
+        terms[term_name] = sympify(expression)
+    additional = OrderedDict()
+    if additional_terms:
+        for term_name, expression in additional_terms.items():
+            additional[term_name] = sympify(expression)
+    expression = mult(terms.values())
+
+    expression_symbols = expression.atoms(Symbol)
+    ec_expressions = {}
+    for each in expression_symbols:
+        ec_name = 'ec%s_%s' % (reaction, each)
+        ec_expressions[ec_name] = elasticity_expression((expression, each))
+
+    term_ec_expressions = {}
+    for term_name, term_expression in list(terms.items()) + \
+            list(additional.items()):
+        term_ecs = {}
+        for each in expression_symbols.union(term_expression.atoms(Symbol)):
+            pec_name = 'pec%s_%s_%s' % (reaction, each, term_name)
+            term_ecs[pec_name] = elasticity_expression(
+                (term_expression, each))
+        term_ec_expressions[term_name] = term_ecs
+
+    return {'terms': terms,
+            'additional_terms': additional,
+            'expression': expression,
+            'ec_expressions': ec_expressions,
+            'term_ec_expressions': term_ec_expressions}
+
+
+def term_percentages(rate_eqns, names, values):
+    """
+    Calculates the percentage contributions of the terms of rate
+    equations from arrays of rates (e.g. the output of
+    ``ThermoKinEvaluator.evaluate`` or the results of
+    ``ThermoKin.do_par_scan``).
+
+    Parameters
+    ----------
+    rate_eqns : list of RateEqn
+        The rate equations of which the term percentages are calculated.
+    names : list of str
+        The names of the rows of ``values``. Rows of rate equations and
+        terms that are not in ``names`` are skipped.
+    values : numpy.ndarray
+        An array of shape (len(names),) + any shape (e.g. the number of
+        scan points or parameter sets).
+
+    Returns
+    -------
+    DotDict
+        Term names as keys and arrays of percentage contributions (of the
+        same shape as the rows of ``values``) as values.
+
+    See Also
+    --------
+    RateTerm.percentages
+    """
+    index = dict((name, i) for i, name in enumerate(names))
+    results = DotDict()
+    for rate_eqn in rate_eqns:
+        if rate_eqn.name not in index:
+            continue
+        rate_values = values[index[rate_eqn.name]]
+        for term in rate_eqn.terms.values():
+            if term.name in index:
+                results[term.name] = term.percentages(
+                    values[index[term.name]], rate_values)
+    return results
+
+
+class ThermoKinEvaluator(object):
+    """
+    Evaluates the expressions of a collection of ``ThermoKin`` objects
+    (rate equations, terms and elasticities) with a single compiled numpy
+    function.
+
+    The expressions are lambdified together with common subexpression
+    elimination so that subexpressions shared between terms (e.g. a
+    binding term and its elasticities) are only calculated once. The
+    function is compiled on first use.
+
+    Parameters
+    ----------
+    mod : PysMod
+        The model from which symbol values are taken.
+    term_dict : dict
+        A dictionary of names and ``RateEqn``, ``RateTerm`` or ``Term``
+        objects.
+    """
+
+    def __init__(self, mod, term_dict):
+        super(ThermoKinEvaluator, self).__init__()
+        self.mod = mod
+        self.names = list(term_dict.keys())
+        self._objects = list(term_dict.values())
+        symbols = set()
+        for each in self._objects:
+            symbols.update(each._unfac_expression.atoms(Symbol))
+        self._symbols = sorted(symbols, key=str)
+        self.symbol_names = stringify(self._symbols)
+        self._function = None
+
+    def _compile(self):
+        expressions = [each._unfac_expression for each in self._objects]
+        self._function = lambdify(self._symbols, expressions,
+                                  modules='numpy', cse=True)
+
+    def evaluate(self, subs_dict=None):
+        """
+        Evaluates all expressions.
+
+        Parameters
+        ----------
+        subs_dict : dict, optional (Default : None)
+            A dictionary of symbol names and values (numbers or arrays).
+            Symbols that are not in ``subs_dict`` take their current value
+            in the model.
+
+        Returns
+        -------
+        numpy.ndarray
+            An array of shape (number of expressions,) + the broadcast
+            shape of the values in ``subs_dict``, with rows in the order of
+            ``names``.
+        """
+        if not self._function:
+            self._compile()
+        if subs_dict is None:
+            subs_dict = {}
+        args = []
+        for name in self.symbol_names:
+            if name in subs_dict:
+                args.append(asarray(subs_dict[name], dtype=float))
+            else:
+                args.append(getattr(self.mod, name))
+        # expressions without symbols (e.g. zero elasticities) are returned
+        # as scalars and need to be broadcast to the shape of the inputs
+        shape = broadcast_shapes(*[asarray(arg).shape for arg in args])
+        return array([broadcast_to(asarray(val, dtype=float), shape)
+                      for val in self._function(*args)])
+
+    def refresh(self):
+        """
+        Evaluates all expressions for the current state of the model and
+        stores the values in the evaluated objects.
+
+        Returns
+        -------
+        DotDict
+            The names and values of all evaluated objects.
+        """
+        values = self.evaluate()
+        version = state_version(self.mod)
+        results = DotDict()
+        for name, obj, value in zip(self.names, self._objects, values):
+            value = float(value)
+            obj._value = value
+            obj._value_version = version
+            results[name] = value
+        return results
+
+
 class ThermoKin(object):
     def __init__(self, mod, path_to_reqn_file=None, overwrite=False,
-                 warnings=True, ltxe=None):
+                 warnings=True, ltxe=None, par_build=False, processes=None):
         super(ThermoKin, self).__init__()
+        # with par_build the rate equations (including all their
+        # elasticities) are built in a pool of worker processes
+        self._par_build = par_build
+        self._processes = processes
         self.mod = mod
 
         silent_state(mod)
@@ -105,6 +371,309 @@ class ThermoKin(object):
 
         self._populate_object()
         self._populate_ec_results()
+        self._evaluator = None
+        self._term_evaluator_ = None
+
+    @property
+    def evaluator(self):
+        if not self._evaluator:
+            term_dict = OrderedDict()
+            term_dict.update(self.reaction_results)
+            term_dict.update(self.ec_results)
+            self._evaluator = ThermoKinEvaluator(self.mod, term_dict)
+        return self._evaluator
+
+    def refresh_values(self):
+        """
+        Recalculates the values of all rate equations, terms and
+        elasticities for the current state of the model with a single
+        call to a compiled function.
+
+        Returns
+        -------
+        DotDict
+            The names and values of all rate equations, terms and
+            elasticities.
+        """
+        return self.evaluator.refresh()
+
+    def _rate_eqns(self, reactions=None):
+        if reactions is None:
+            return [getattr(self, 'J_' + reaction) for reaction in
+                    self._raw_data.keys()]
+        rate_eqns = []
+        for reaction in reactions:
+            if not reaction.startswith('J_'):
+                reaction = 'J_' + reaction
+            assert hasattr(self, reaction), 'Invalid reaction %s' % reaction
+            rate_eqns.append(getattr(self, reaction))
+        return rate_eqns
+
+    @property
+    def _term_evaluator(self):
+        # evaluates only the rate equations and their terms
+        if not self._term_evaluator_:
+            term_dict = OrderedDict()
+            for rate_eqn in self._rate_eqns():
+                term_dict[rate_eqn.name] = rate_eqn
+                for term in rate_eqn.terms.values():
+                    term_dict[term.name] = term
+            self._term_evaluator_ = ThermoKinEvaluator(self.mod, term_dict)
+        return self._term_evaluator_
+
+    def term_percentages(self, subs_dict=None, reactions=None):
+        """
+        Calculates the percentage contributions of the terms of rate
+        equations for arrays of symbol values (e.g. the steady-state
+        results of a scan or an ensemble of parameter sets).
+
+        All rates are calculated with a single call to a compiled function
+        (see ``ThermoKinEvaluator``) and the percentages are calculated on
+        the resulting arrays.
+
+        Parameters
+        ----------
+        subs_dict : dict, optional (Default : None)
+            A dictionary of symbol names and values (numbers or arrays).
+            Symbols that are not in ``subs_dict`` take their current value
+            in the model.
+        reactions : list of str, optional (Default : None)
+            The reactions (e.g. "R1" or "J_R1") to include. If None all
+            reactions are included.
+
+        Returns
+        -------
+        DotDict
+            Term names as keys and arrays of percentage contributions as
+            values.
+
+        See Also
+        --------
+        scan_term_percentages
+        RateTerm.percentages
+        """
+        evaluator = self._term_evaluator
+        return term_percentages(self._rate_eqns(reactions),
+                                evaluator.names,
+                                evaluator.evaluate(subs_dict))
+
+    def scan_term_percentages(self, scan_data, reactions=None):
+        """
+        Calculates the percentage contributions of the terms of rate
+        equations from the results of ``do_par_scan``.
+
+        Parameters
+        ----------
+        scan_data : Data2D
+            The results of ``do_par_scan`` (which should include "terms").
+        reactions : list of str, optional (Default : None)
+            The reactions (e.g. "R1" or "J_R1") to include. If None all
+            reactions in ``scan_data`` are included.
+
+        Returns
+        -------
+        DotDict
+            Term names as keys and arrays of percentage contributions
+            (one value per scan point) as values.
+
+        See Also
+        --------
+        term_percentages
+        """
+        return term_percentages(self._rate_eqns(reactions),
+                                scan_data.scan_results.scan_out,
+                                scan_data.scan_results.scan_results.T)
+
+    def do_par_scan(self,
+                    parameter,
+                    scan_range,
+                    reactions=None,
+                    kinds=('terms', 'ecs'),
+                    init_return=True,
+                    par_scan=False,
+                    par_engine='multiproc',
+                    force_legacy=False,
+                    legacy_processes=1):
+        """
+        Scans a parameter and calculates the rates and/or elasticities of
+        the terms of several rate equations.
+
+        Unlike ``RateEqn.do_par_scan`` a single steady-state scan is
+        performed for all reactions, after which all requested terms and
+        elasticities are evaluated at once with a compiled function (see
+        ``ThermoKinEvaluator``).
+
+        Parameters
+        ----------
+        parameter : str
+            The parameter to scan.
+        scan_range : array-like
+            The values of the parameter scan.
+        reactions : list of str, optional (Default : None)
+            The reactions (e.g. "R1" or "J_R1") to include. If None all
+            reactions are included.
+        kinds : tuple of str, optional (Default : ("terms", "ecs"))
+            The kinds of results to calculate: "terms" for the rates of the
+            rate equations and their terms and "ecs" for the elasticities
+            and term elasticities.
+        init_return : bool, optional (Default : True)
+            Return the parameter to its initial value after the scan.
+        par_scan : bool, optional (Default : False)
+            Use the (experimental) PySCeS ParScanner.
+        par_engine : str, optional (Default : "multiproc")
+            The ParScanner engine.
+        force_legacy : bool, optional (Default : False)
+            Use the slower legacy scan (see ``legacy_scan``), which
+            calculates each point separately on copies of the model and
+            replaces invalid steady states with NaN values. The legacy scan
+            is also used if the normal scan fails.
+        legacy_processes : int, optional (Default : 1)
+            The number of worker processes of the legacy scan.
+
+        Returns
+        -------
+        Data2D
+            A single data object containing the results of all reactions.
+        """
+        for kind in kinds:
+            assert kind in ['terms', 'ecs'], 'kinds must be "terms" and/or ' \
+                                             '"ecs"'
+        rate_eqns = self._rate_eqns(reactions)
+
+        init = getattr(self.mod, parameter)
+
+        term_dict = OrderedDict()
+        term_names = []
+        pec_names = []
+        ec_names = []
+        if 'terms' in kinds:
+            for rate_eqn in rate_eqns:
+                for term in rate_eqn.terms.values():
+                    term_dict[term.name] = term
+                    term_names.append(term.name)
+                term_dict[rate_eqn.name] = rate_eqn
+        if 'ecs' in kinds:
+            for rate_eqn in rate_eqns:
+                for ec_term in rate_eqn.ec_results.values():
+                    if ec_term._unfac_expression != 0 and \
+                            not ec_term.name.endswith('gamma_keq'):
+                        term_dict[ec_term.name] = ec_term
+                        if ec_term.name.startswith('p'):
+                            pec_names.append(ec_term.name)
+                        else:
+                            ec_names.append(ec_term.name)
+
+        evaluator = ThermoKinEvaluator(self.mod, term_dict)
+        needed_symbols = [parameter] + [symbol for symbol in
+                                        evaluator.symbol_names
+                                        if symbol != parameter]
+        try:
+            assert not force_legacy, 'Legacy scan requested'
+            # choose between parscanner or scanner
+            if par_scan:
+                # This is experimental
+                scanner = ParScanner(self.mod, par_engine)
+            else:
+                scanner = Scanner(self.mod)
+                scanner.quietRun = True
+
+            start, end, points, log = scanner_range_setup(scan_range)
+            scanner.addScanParameter(parameter,
+                                     start=start,
+                                     end=end,
+                                     points=points,
+                                     log=log)
+            scanner.addUserOutput(*needed_symbols)
+            scanner.Run()
+
+            subs_dict = {}
+            for i, symbol in enumerate(scanner.UserOutputList):
+                subs_dict[symbol] = scanner.UserOutputResults[:, i]
+        except Exception as exception:
+            print('The parameter scan yielded the following error:')
+            print(exception)
+            print('Switching over to slower scan method and replacing')
+            print('invalid steady states with nan values.')
+            state_type = 'mca' if 'ecs' in kinds else 'ss'
+            subs_dict = legacy_scan(self.mod, parameter, scan_range,
+                                    needed_symbols[1:], state_type,
+                                    legacy_processes)
+        points = len(subs_dict[parameter])
+        parameter_values = subs_dict[parameter].reshape(points, 1)
+        data_array = hstack([parameter_values,
+                             evaluator.evaluate(subs_dict).transpose()])
+
+        if init_return:
+            self.mod.SetQuiet()
+            setattr(self.mod, parameter, init)
+            self.mod.doMca()
+            self.mod.SetLoud()
+
+        additional_cat_classes = {}
+        additional_cats = {}
+        category_manifest = {}
+        if 'terms' in kinds:
+            additional_cat_classes['All Fluxes/Reactions/Species'] = \
+                ['Term Rates']
+            additional_cats['Term Rates'] = term_names
+            category_manifest['Flux Rates'] = True
+            category_manifest['Term Rates'] = True
+        if 'ecs' in kinds:
+            additional_cat_classes['All Coefficients'] = ['Term Elasticities']
+            additional_cats['Term Elasticities'] = pec_names
+            category_manifest.update({pec: True for pec in pec_names})
+            category_manifest['Elasticity Coefficients'] = True
+            category_manifest['Term Elasticities'] = True
+
+        if 'ecs' not in kinds:
+            y_label = 'Reaction/Term rate'
+            yscale = 'log'
+        elif 'terms' in kinds:
+            y_label = 'Reaction/Term rate or Elasticity Coefficient'
+            yscale = 'linear'
+        else:
+            y_label = 'Elasticity Coefficient'
+            yscale = 'linear'
+
+        mm = ModelMap(self.mod)
+        species = mm.hasSpecies()
+        if parameter in species:
+            x_label = '[%s]' % parameter.replace('_', ' ')
+        else:
+            x_label = parameter
+
+        xscale = 'log' if scanner_range_setup(scan_range)[3] else 'linear'
+        ax_properties = {'ylabel': y_label,
+                         'xlabel': x_label,
+                         'xscale': xscale,
+                         'yscale': yscale, }
+
+        data = Data2D(mod=self.mod,
+                      column_names=[parameter] + evaluator.names,
+                      data_array=data_array,
+                      ltxe=self._ltxe,
+                      analysis_method='thermokin',
+                      ax_properties=ax_properties,
+                      additional_cat_classes=additional_cat_classes,
+                      additional_cats=additional_cats,
+                      category_manifest=category_manifest,)
+
+        if 'ecs' in kinds:
+            for line in data._lines:
+                if line.name not in pec_names:
+                    continue
+                ec_name = self.ec_results[line.name]._rname
+                if ec_name in ec_names:
+                    line.categories.append(ec_name)
+
+        return data
+
+    @property
+    def _reqn_processes(self):
+        # automatic .reqn generation is done in parallel with par_build
+        if self._par_build:
+            return self._processes
+        return 1
 
     def _do_gamma_keq(self, overwrite, warnings):
         if overwrite:
@@ -120,7 +689,8 @@ class ThermoKin(object):
                                 gamma_keq_todo[-1]
             print_f('%s does not contain Gamma/Keq terms for %s:' % (
                 self._path_to, reaction_printout), warnings)
-            gamma_keq_data, messages = create_gamma_keq_reqn_data(self.mod)
+            gamma_keq_data, messages = create_gamma_keq_reqn_data(
+                self.mod, self._reqn_processes)
             for required in gamma_keq_todo:
                 print_f('{:10.10}: {}'.format(required, messages[required]),
                         warnings)
@@ -140,7 +710,7 @@ class ThermoKin(object):
                     warnings)
         if condition_1 or condition_2:
             ma_terms, vc_binding_terms, gamma_keq_terms, messages = create_reqn_data(
-                self.mod)
+                self.mod, self._reqn_processes)
             for k, v in messages.items():
                 print_f('{:10.10}: {}'.format(k, v), warnings)
             write_reqn_file(self._path_to, self.mod.ModelFile, ma_terms,
@@ -150,37 +720,81 @@ class ThermoKin(object):
         self.reaction_results = DotDict()
         self.reaction_results._make_repr('"$" + v.latex_name + "$"', 'v.value',
                                          formatter_factory())
-        for reaction, terms_dict in self._raw_data.items():
+        if self._par_build:
+            jobs = [(reaction, terms_dict, self._add_raw_data.get(reaction))
+                    for reaction, terms_dict in self._raw_data.items()]
+            all_pieces = parallel_map(build_rate_eqn_pieces,
+                                      jobs,
+                                      processes=self._processes)
+        else:
+            all_pieces = [None] * len(self._raw_data)
+
+        for (reaction, terms_dict), pieces in zip(self._raw_data.items(),
+                                                  all_pieces):
             additional_terms = self._add_raw_data.get(reaction)
+            if pieces:
+                terms_dict = pieces['terms']
+                additional_terms = pieces['additional_terms']
             reqn_obj = RateEqn(self.mod,
                                reaction,
                                terms_dict,
                                self._ltxe,
-                               additional_terms)
+                               additional_terms,
+                               pieces)
             setattr(self, 'J_' + reaction, reqn_obj)
             self.reaction_results['J_' + reaction] = reqn_obj
             for term in reqn_obj.terms.values():
                 self.reaction_results[term.name] = term
 
     def _populate_ec_results(self):
-        self.ec_results = DotDict()
+        self.ec_results = LazyDotDict()
         self.ec_results._make_repr('"$" + v.latex_name + "$"', 'v.value',
                                    formatter_factory())
 
         for rate_eqn in self.reaction_results.values():
             self.ec_results.update(rate_eqn.ec_results)
 
+    def precompute_elasticities(self, processes=None):
+        """
+        Derives all elasticity expressions that have not been accessed yet.
+
+        Elasticities are normally only derived when they are first
+        accessed. This method derives all outstanding elasticities at once
+        using a pool of worker processes.
+
+        Parameters
+        ----------
+        processes : int, optional (Default : None)
+            The number of worker processes. If None the number of CPUs is
+            used.
+        """
+        todo = []
+        for owner in self.reaction_results.values():
+            for ec_name, spec in owner._ec_specs.items():
+                if not owner.ec_results.is_evaluated(ec_name):
+                    todo.append((owner, ec_name))
+        expressions = parallel_map(
+            elasticity_expression,
+            [(owner._unfac_expression, owner._ec_specs[ec_name][0])
+             for owner, ec_name in todo],
+            processes=processes)
+        for (owner, ec_name), expression in zip(todo, expressions):
+            owner.ec_results[ec_name] = make_elasticity_term(owner,
+                                                             ec_name,
+                                                             expression)
+
     def save_results(self, file_name=None, separator=',',fmt='%.9f'):
         file_name = get_file_path(working_dir=self._working_dir,
                                   internal_filename='tk_summary',
                                   fmt='csv',
                                   file_name=file_name, )
 
+        all_values = self.refresh_values()
         values = []
         max_len = 0
         for reaction_name in sorted(self.reaction_results.keys()):
             cols = (reaction_name,
-                    self.reaction_results[reaction_name].value,
+                    all_values[reaction_name],
                     self.reaction_results[reaction_name].latex_name,
                     self.reaction_results[reaction_name].latex_expression)
             values.append(cols)
@@ -194,7 +808,7 @@ class ThermoKin(object):
                                       elasticity_name in ec])
                 for related_ec_name in related_ecs:
                     cols = (related_ec_name,
-                            self.ec_results[related_ec_name].value,
+                            all_values[related_ec_name],
                             self.ec_results[related_ec_name].latex_name,
                             self.ec_results[related_ec_name].latex_expression)
                     values.append(cols)
@@ -221,8 +835,11 @@ class ThermoKin(object):
 
 
 class RateEqn(object):
-    def __init__(self, mod, name, term_dict, ltxe, additional_terms=None):
+    def __init__(self, mod, name, term_dict, ltxe, additional_terms=None,
+                 pieces=None):
         super(RateEqn, self).__init__()
+        # pieces contains the prebuilt expressions of this rate equation
+        # (see build_rate_eqn_pieces)
         self.mod = mod
         self.terms = DotDict()
         self.terms._make_repr('"$" + v.latex_name + "$"', 'v.value',
@@ -232,8 +849,12 @@ class RateEqn(object):
         self._rname = name
         self._ltxe = ltxe
 
-        for val in term_dict.values():
-            self._unfac_expression = self._unfac_expression * (sympify(val))
+        if pieces:
+            self._unfac_expression = pieces['expression']
+        else:
+            for val in term_dict.values():
+                self._unfac_expression = self._unfac_expression * \
+                    (sympify(val))
         for term_name, expression in term_dict.items():
             term = RateTerm(parent=self,
                             mod=self.mod,
@@ -257,30 +878,42 @@ class RateEqn(object):
                 self.terms[term_name] = term
 
         self._value = None
+        # the model state version (see state_version) of self._value
+        self._value_version = None
         self._str_expression_ = None
         self._expression = None
         self._latex_expression = None
         self._latex_name = None
 
-        self.ec_results = DotDict()
+        self.ec_results = LazyDotDict()
         self.ec_results._make_repr('"$" + v.latex_name + "$"', 'v.value',
                                    formatter_factory())
+        self._ec_specs = {}
 
-        self._populate_ec_results()
+        self._populate_ec_results(pieces)
 
-    def _populate_ec_results(self):
+    def _populate_ec_results(self, pieces=None):
+        # elasticities are only derived on first access
+        # (see add_lazy_elasticity) unless they are prebuilt
         expression_symbols = self._unfac_expression.atoms(Symbol)
         for each in expression_symbols:
-            each = sympify(each)
-            ec = diff(self._unfac_expression, each) * \
-                (each / self._unfac_expression)
             ec_name = 'ec%s_%s' % (self._rname, each)
-            self.ec_results[ec_name] = Term(self, self.mod, ec_name,
-                                            self._rname, ec,
-                                            self._ltxe)
+            add_lazy_elasticity(self, ec_name, each, self, self._rname)
+        if pieces:
+            self._use_elasticity_expressions(self, pieces['ec_expressions'])
+            for term_name, term in self.terms.items():
+                self._use_elasticity_expressions(
+                    term, pieces['term_ec_expressions'][term_name])
         for each in self.terms.values():
             self.ec_results.update(each.ec_results)
 
+    @staticmethod
+    def _use_elasticity_expressions(owner, ec_expressions):
+        for ec_name, expression in ec_expressions.items():
+            owner.ec_results[ec_name] = make_elasticity_term(owner,
+                                                             ec_name,
+                                                             expression)
+
     def _repr_latex_(self):
         return get_repr_latex(self)
 
@@ -293,12 +926,16 @@ class RateEqn(object):
     @property
     def expression(self):
         if not self._expression:
-            self._expression = self._unfac_expression.factor()
+            self._expression = ExpressionCache.factor(
+                self._unfac_expression)
         return self._expression
 
     @property
     def value(self):
-        self._calc_value()
+        version = state_version(self.mod)
+        if self._value_version != version:
+            self._calc_value()
+            self._value_version = version
         return self._value
 
     @property
@@ -323,22 +960,13 @@ class RateEqn(object):
         self._value = mult([each._value for each in self.terms.values() if
                             type(each) is not AdditionalRateTerm])
 
-    def _valscan_x(self, parameter, scan_range):
-        scan_res = [list() for _ in range(len(list(self.terms.values())) + 2)]
-        scan_res[0] = scan_range
-
-        for parvalue in scan_range:
-            state_valid = do_safe_state(self.mod, parameter, parvalue)
-            for i, term in enumerate(self.terms.values()):
-                if state_valid:
-                    scan_res[i + 1].append(term.value)
-                else:
-                    scan_res[i + 1].append(nan)
-            if state_valid:
-                scan_res[i + 2].append(self.value)
-            else:
-                scan_res[i + 2].append(nan)
-        return scan_res
+    def _valscan_x(self, parameter, scan_range, processes=1):
+        # each point is calculated separately on copies of the model and
+        # points without a valid steady state are nan
+        needed_symbols = stringify(list(self.expression.atoms(Symbol)))
+        subs_dict = legacy_scan(self.mod, parameter, scan_range,
+                                needed_symbols, processes=processes)
+        return self._values_from_subs_dict(parameter, subs_dict)
 
     def _valscan(self,
                  parameter,
@@ -372,10 +1000,13 @@ class RateEqn(object):
         subs_dict = {}
         for i, symbol in enumerate(scanner.UserOutputList):
             subs_dict[symbol] = scanner.UserOutputResults[:, i]
+        return self._values_from_subs_dict(parameter, subs_dict)
 
+    def _values_from_subs_dict(self, parameter, subs_dict):
         term_expressions = [term.expression for term in list(self.terms.values())]\
             + [self.expression]
         term_str_expressions = stringify(term_expressions)
+        points = len(subs_dict[parameter])
         parameter_values = subs_dict[parameter].reshape(points, 1)
 
         scan_res = []
@@ -419,7 +1050,9 @@ class RateEqn(object):
         subs_dict = {}
         for i, symbol in enumerate(scanner.UserOutputList):
             subs_dict[symbol] = scanner.UserOutputResults[:, i]
+        return self._ecs_from_subs_dict(parameter, subs_dict)
 
+    def _ecs_from_subs_dict(self, parameter, subs_dict):
         # we include all ec_terms that are not zero (even though they are
         # included in the main dict)
         ec_term_expressions = [ec_term.expression for ec_term in
@@ -427,6 +1060,7 @@ class RateEqn(object):
                                ec_term.expression != 0 and
                                not ec_term.name.endswith('gamma_keq')]
         ec_term_str_expressions = stringify(ec_term_expressions)
+        points = len(subs_dict[parameter])
         parameter_values = subs_dict[parameter].reshape(points, 1)
 
         scan_res = []
@@ -439,23 +1073,14 @@ class RateEqn(object):
         scan_res = hstack([parameter_values, scan_res])
         return scan_res
 
-    def _ecscan_x(self, parameter, scan_range):
-        mca_objects = [ec_term for ec_term in list(self.ec_results.values()) if
-                       ec_term.expression != 0 and not ec_term.name.endswith(
-                           'gamma_keq')]
-
-        scan_res = [list() for _ in range(len(mca_objects) + 1)]
-        scan_res[0] = scan_range
-
-        for parvalue in scan_range:
-            state_valid = do_safe_state(self.mod, parameter, parvalue,
-                                        type='mca')
-            for i, term in enumerate(mca_objects):
-                if state_valid:
-                    scan_res[i + 1].append(term.value)
-                else:
-                    scan_res[i + 1].append(nan)
-        return scan_res
+    def _ecscan_x(self, parameter, scan_range, processes=1):
+        # each point is calculated separately on copies of the model and
+        # points without a valid steady state are nan
+        needed_symbols = stringify(list(self.expression.atoms(Symbol)))
+        subs_dict = legacy_scan(self.mod, parameter, scan_range,
+                                needed_symbols, state_type='mca',
+                                processes=processes)
+        return self._ecs_from_subs_dict(parameter, subs_dict)
 
     def do_par_scan(self,
                     parameter,
@@ -463,7 +1088,9 @@ class RateEqn(object):
                     scan_type='value',
                     init_return=True,
                     par_scan=False,
-                    par_engine='multiproc'):
+                    par_engine='multiproc',
+                    force_legacy=False,
+                    legacy_processes=1):
 
         try:
             assert scan_type in ['elasticity', 'value'], 'scan_type must be one\
@@ -487,10 +1114,19 @@ class RateEqn(object):
             column_names = [parameter] + \
                 [ec_term.name for ec_term in mca_objects]
             y_label = 'Elasticity Coefficient'
-            scan_res = self._ecscan(parameter,
-                                    scan_range,
-                                    par_scan,
-                                    par_engine)
+            try:
+                assert not force_legacy, 'Legacy scan requested'
+                scan_res = self._ecscan(parameter,
+                                        scan_range,
+                                        par_scan,
+                                        par_engine)
+            except Exception as exception:
+                print('The parameter scan yielded the following error:')
+                print(exception)
+                print('Switching over to slower scan method and replacing')
+                print('invalid steady states with nan values.')
+                scan_res = self._ecscan_x(parameter, scan_range,
+                                          legacy_processes)
             data_array = scan_res
             # ylim = [nanmin(data_array[:, 1:]),
             #         nanmax(data_array[:, 1:]) * 1.1]
@@ -507,10 +1143,19 @@ class RateEqn(object):
             additional_cats = {'Term Rates': term_names}
             column_names = [parameter] + term_names + [self.name]
             y_label = 'Reaction/Term rate'
-            scan_res = self._valscan(parameter,
-                                     scan_range,
-                                     par_scan,
-                                     par_engine)
+            try:
+                assert not force_legacy, 'Legacy scan requested'
+                scan_res = self._valscan(parameter,
+                                         scan_range,
+                                         par_scan,
+                                         par_engine)
+            except Exception as exception:
+                print('The parameter scan yielded the following error:')
+                print(exception)
+                print('Switching over to slower scan method and replacing')
+                print('invalid steady states with nan values.')
+                scan_res = self._valscan_x(parameter, scan_range,
+                                           legacy_processes)
             data_array = scan_res
             # ylim = [nanmin(data_array[:, 1:]),
             #         nanmax(data_array[:, 1:]) * 1.1]
@@ -614,6 +1259,8 @@ class Term(object):
         self._expression = None
         self._str_expression_ = None
         self._value = None
+        # the model state version (see state_version) of self._value
+        self._value_version = None
         self._latex_name = None
         self._latex_expression = None
 
@@ -629,12 +1276,16 @@ class Term(object):
     @property
     def expression(self):
         if not self._expression:
-            self._expression = self._unfac_expression.factor()
+            self._expression = ExpressionCache.factor(
+                self._unfac_expression)
         return self._expression
 
     @property
     def value(self):
-        self._calc_value()
+        version = state_version(self.mod)
+        if self._value_version != version:
+            self._calc_value()
+            self._value_version = version
         return self._value
 
     @property
@@ -703,9 +1354,10 @@ class RateTerm(Term):
     def __init__(self, parent, mod, name, rname, expression, ltxe):
         super(RateTerm, self).__init__(parent, mod, name, rname, expression,
                                        ltxe)
-        self.ec_results = DotDict()
+        self.ec_results = LazyDotDict()
         self.ec_results._make_repr('"$" + v.latex_name + "$"', 'v.value',
                                    formatter_factory())
+        self._ec_specs = {}
         self._populate_ec_results()
         self._percentage = None
 
@@ -714,21 +1366,36 @@ class RateTerm(Term):
         per = (log10(self.value) / log10(self._parent.value)) * 100
         return per
 
+    def percentages(self, term_values, rate_values):
+        """
+        Calculates the percentage contribution of the term for arrays of
+        term and rate values (e.g. over a scan or an ensemble of parameter
+        sets).
+
+        This is the array-valued equivalent of ``percentage``.
+
+        Parameters
+        ----------
+        term_values : array-like
+            The values of the term.
+        rate_values : array-like
+            The values of the rate equation.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        with errstate(divide='ignore', invalid='ignore'):
+            return (log10(asarray(term_values, dtype=float)) /
+                    log10(asarray(rate_values, dtype=float))) * 100
+
     def _populate_ec_results(self):
         expression_symbols = self._parent._unfac_expression.atoms(Symbol)
         expression_symbols.update(self._unfac_expression.atoms(Symbol))
         for each in expression_symbols:
-            each = sympify(each)
             ec_name = 'ec%s_%s' % (self._parent._rname, each)
             pec_name = 'p%s_%s' % (ec_name, self._rname)
-            ec = diff(self._unfac_expression, each) * \
-                (each / self._unfac_expression)
-            self.ec_results[pec_name] = Term(self._parent,
-                                             self.mod,
-                                             pec_name,
-                                             ec_name,
-                                             ec,
-                                             self._ltxe)
+            add_lazy_elasticity(self, pec_name, each, self._parent, ec_name)
 
 
 class AdditionalRateTerm(RateTerm):
@@ -736,6 +1403,59 @@ class AdditionalRateTerm(RateTerm):
     def percentage(self):
         return 0.0
 
+    def percentages(self, term_values, rate_values):
+        """
+        Calculates the percentage contribution of the term for arrays of
+        term and rate values.
+
+        This is the array-valued equivalent of ``percentage``: additional
+        terms are not factors of the rate equation and therefore
+        contribute zero.
+
+        Parameters
+        ----------
+        term_values : array-like
+            The values of the term.
+        rate_values : array-like
+            The values of the rate equation.
+
+        Returns
+        -------
+        numpy.ndarray
+
+        See Also
+        --------
+        displacement_percentages
+        """
+        return zeros_like(asarray(term_values, dtype=float))
+
+    def displacement_percentages(self, gamma_keq_values, rate_values):
+        """
+        Calculates the part of the mass action term contribution that is
+        due to the displacement from equilibrium, i.e.
+        log10(1 - gamma/keq)/log10(rate) * 100, for arrays of gamma/keq and
+        rate values.
+
+        This share is already included in the percentage of the mass
+        action term and should not be added to the term percentages.
+
+        Parameters
+        ----------
+        gamma_keq_values : array-like
+            The values of the gamma/keq term.
+        rate_values : array-like
+            The values of the rate equation.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        assert self._rname == 'gamma_keq', \
+            'Only defined for the gamma/keq term'
+        with errstate(divide='ignore', invalid='ignore'):
+            return (log10(1 - asarray(gamma_keq_values, dtype=float)) /
+                    log10(asarray(rate_values, dtype=float))) * 100
+
     def append_to_file(self, file_name, term_name=None, parent=None):
         if not parent:
             parent = self._parent._rname
@@ -754,7 +1474,7 @@ class AdditionalTerm(Term):
         self.creation_operation = creation_operation
 
     def simplify_expression(self):
-        self._expression = self._unfac_expression.factor()
+        self._expression = ExpressionCache.factor(self._unfac_expression)
         self._latex_expression = None
 
     def get_elasticity(self, var_par, term_name=None):
@@ -4,11 +4,15 @@ from __future__ import unicode_literals
 
 from os import path
 from re import match, findall, sub
+import json
 
 import pysces
-from sympy import Symbol, sympify
+from sympy import Symbol, sympify, srepr
 from datetime import datetime
 
+from ..latextools import ExpressionCache
+from ..utils.misc import parallel_map
+
 
 
 # File reading/validation functions
@@ -645,25 +649,184 @@ def check_for_negatives(terms):
     return any_negs
 
 
-def create_reqn_data(mod):
-    string_formulas = get_str_formulas(mod)
-    string_formulas = replace_pow(string_formulas)
-    sympy_formulas = get_sympy_formulas(string_formulas)
-    sympy_terms = get_sympy_terms(sympy_formulas)
-    non_irr = filter_irreversible(sympy_terms)
-    gamma_keq_terms, _ = get_gamma_keq_terms(mod, non_irr)
-    ma_terms, messages = get_ma_terms(mod, sympy_terms)
-    binding_vc_terms = get_binding_vc_terms(sympy_formulas, ma_terms)
+def analyse_reaction(args):
+    """
+    Splits a single rate equation into mass action, binding/rate
+    capacity and gamma/keq terms.
+
+    This performs the same steps as `get_sympy_terms`, `get_ma_terms`,
+    `get_binding_vc_terms` and `get_gamma_keq_terms` for a single
+    reaction, but factors the ratio of the forward and reverse terms
+    only once for both the mass action and the gamma/keq terms.
+
+    Parameters
+    ----------
+    args : tuple
+        A tuple of the reaction name, the string rate equation (with
+        python syntax powers, see `replace_pow`), and lists of the
+        substrate and product names. A single argument is used so that
+        this function can be used with `parallel_map`.
+
+    Returns
+    -------
+    dict
+        A dictionary with the "ma", "bind_vc" and "gamma_keq" terms (None
+        if they could not be determined), the "message" of the term
+        separation and the "gamma_keq_message" (None for irreversible
+        reactions).
+
+    See Also
+    --------
+    analyse_reactions
+    """
+    name, str_formula, substrates, products = args
+    formula = sympify(str_formula)
+    substrates = [sympify(substrate) for substrate in substrates]
+    products = [sympify(product) for product in products]
+
+    result = {'ma': None,
+              'bind_vc': None,
+              'gamma_keq': None,
+              'message': 'rate equation not included - irreversible or '
+                         'unknown form',
+              'gamma_keq_message': None}
+
+    terms = formula.expand().as_coeff_add()[1]
+    if len(terms) == 2 and check_for_negatives(terms):
+        # make sure negative term is second in term list
+        terms = sort_terms(terms)
+        # divide pos term by neg term and factorise
+        expressions = (-terms[0] / terms[1]).factor()
+        # get substrate, product and keq terms (and strategy)
+        st, pt, keq, message = get_st_pt_keq(expressions, substrates,
+                                             products)
+        result['message'] = message
+        if all([st, pt, keq]):
+            ma_term = st - pt / keq
+            result['ma'] = ma_term
+            result['bind_vc'] = (formula / ma_term).factor().factor()
+            result['gamma_keq'] = pt / (keq * st)
+            result['gamma_keq_message'] = \
+                'successful generation of gamma/keq term'
+        else:
+            result['gamma_keq_message'] = 'generation of gamma/keq term failed'
+    return result
+
+
+_expression_results = ['ma', 'bind_vc', 'gamma_keq']
+
+
+def _reaction_result_to_str(result):
+    to_dump = dict(result)
+    for k in _expression_results:
+        if to_dump[k] is not None:
+            to_dump[k] = srepr(to_dump[k])
+    return json.dumps(to_dump)
+
+
+def _reaction_result_from_str(result_str):
+    result = json.loads(result_str)
+    for k in _expression_results:
+        if result[k] is not None:
+            result[k] = sympify(result[k])
+    return result
+
+
+# results of analyse_reaction for this session keyed by the
+# ExpressionCache key of the rate equation
+_reaction_results = {}
+
+
+def analyse_reactions(mod, processes=1):
+    """
+    Splits the rate equations of all reactions in a model into mass
+    action, binding/rate capacity and gamma/keq terms.
+
+    The analysis of each reaction is cached (both in memory and on disk
+    via `ExpressionCache`) based on its rate equation, substrates and
+    products, so that unchanged reactions are not analysed again.
+    Reactions that are not cached are analysed in parallel.
+
+    Parameters
+    ----------
+    mod : PysMod
+    processes : int, optional (Default : 1)
+        The number of worker processes. If None the number of CPUs is
+        used.
+
+    Returns
+    -------
+    dict of str:dict
+        Reaction names as keys and the results of `analyse_reaction` as
+        values.
+    """
+    string_formulas = replace_pow(get_str_formulas(mod))
+    model_map = pysces.ModelMap(mod)
+
+    results = {}
+    jobs = []
+    keys = {}
+    for name in mod.reactions:
+        reaction_map = getattr(model_map, name)
+        substrates = [str(each) for each in reaction_map.hasSubstrates()]
+        products = [str(each) for each in reaction_map.hasProducts()]
+        key = ExpressionCache.make_key('reqn',
+                                       string_formulas[name],
+                                       substrates,
+                                       products)
+        keys[name] = key
+        if key in _reaction_results:
+            results[name] = _reaction_results[key]
+            continue
+        cached = ExpressionCache.get(key)
+        if cached is not None:
+            try:
+                results[name] = _reaction_result_from_str(cached)
+                _reaction_results[key] = results[name]
+                continue
+            except (ValueError, KeyError):
+                pass
+        jobs.append((name, string_formulas[name], substrates, products))
+
+    for job, result in zip(jobs, parallel_map(analyse_reaction,
+                                              jobs,
+                                              processes=processes)):
+        name = job[0]
+        results[name] = result
+        _reaction_results[keys[name]] = result
+        ExpressionCache.set(keys[name], 'reqn',
+                            _reaction_result_to_str(result))
+
+    return results
+
+
+def create_reqn_data(mod, processes=1):
+    analysed = analyse_reactions(mod, processes)
+    ma_terms = {}
+    binding_vc_terms = {}
+    gamma_keq_terms = {}
+    messages = {}
+    for name in mod.reactions:
+        result = analysed[name]
+        messages[name] = result['message']
+        if result['ma'] is not None:
+            ma_terms[name] = result['ma']
+            binding_vc_terms[name] = result['bind_vc']
+        if result['gamma_keq'] is not None:
+            gamma_keq_terms[name] = result['gamma_keq']
     return ma_terms, binding_vc_terms, gamma_keq_terms, messages
 
 
-def create_gamma_keq_reqn_data(mod):
-    string_formulas = get_str_formulas(mod)
-    string_formulas = replace_pow(string_formulas)
-    sympy_formulas = get_sympy_formulas(string_formulas)
-    sympy_terms = get_sympy_terms(sympy_formulas)
-    sympy_terms = filter_irreversible(sympy_terms)
-    gamma_keq, messages = get_gamma_keq_terms(mod, sympy_terms)
+def create_gamma_keq_reqn_data(mod, processes=1):
+    analysed = analyse_reactions(mod, processes)
+    gamma_keq = {}
+    messages = {}
+    for name in mod.reactions:
+        result = analysed[name]
+        if result['gamma_keq_message']:
+            messages[name] = result['gamma_keq_message']
+        if result['gamma_keq'] is not None:
+            gamma_keq[name] = result['gamma_keq']
     return gamma_keq, messages
 
 
@@ -1 +1,2 @@
 from ._expressions import *
+from ._cache import *
@@ -0,0 +1,258 @@
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import sqlite3
+from hashlib import sha1
+from os import path, getpid
+from time import time
+
+from pysces import output_dir
+from sympy import srepr, sympify
+
+__all__ = ['ExpressionCache']
+
+
+class ExpressionCache:
+    """
+    A disk-backed cache of expensive symbolic results (e.g. factored
+    expressions and LaTeX renderings) shared by ``ThermoKin``, ``Symca``
+    and ``LatexExpr``.
+
+    Entries are keyed by the sha1 hash of the ``srepr`` of the unprocessed
+    expression (together with the kind of result and any additional
+    context) and stored in an SQLite database in the PySCeS output
+    directory. The cache holds at most ``max_entries`` entries, the least
+    recently used entries being evicted first.
+
+    All methods are class methods; there is a single cache per process.
+    Any database error results in the value being recalculated rather
+    than in an exception.
+    """
+    _path = path.join(output_dir, 'psctb_expression_cache.sqlite')
+    _connection = None
+    _pid = None
+    enabled = True
+    max_entries = 50000
+
+    @classmethod
+    def configure(cls, cache_path=None, max_entries=None, enabled=None):
+        """
+        Changes the settings of the cache.
+
+        Parameters
+        ----------
+        cache_path : str, optional (Default : None)
+            The path of the SQLite database file.
+        max_entries : int, optional (Default : None)
+            The maximum number of cached entries.
+        enabled : bool, optional (Default : None)
+            Enables or disables the cache.
+        """
+        if cache_path is not None and cache_path != cls._path:
+            cls.close()
+            cls._path = cache_path
+        if max_entries is not None:
+            cls.max_entries = max_entries
+            cls._evict()
+        if enabled is not None:
+            cls.enabled = enabled
+
+    @classmethod
+    def close(cls):
+        if cls._connection is not None:
+            try:
+                cls._connection.close()
+            except sqlite3.Error:
+                pass
+        cls._connection = None
+
+    @classmethod
+    def _get_connection(cls):
+        # connections cannot be shared with forked worker processes
+        if cls._connection is None or cls._pid != getpid():
+            connection = sqlite3.connect(cls._path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS cache ('
+                               'key TEXT PRIMARY KEY, '
+                               'kind TEXT, '
+                               'value TEXT, '
+                               'last_access REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS access_index '
+                               'ON cache (last_access)')
+            connection.commit()
+            cls._connection = connection
+            cls._pid = getpid()
+        return cls._connection
+
+    @staticmethod
+    def make_key(kind, expression, *context):
+        """
+        Returns the cache key of an expression.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of result (e.g. "factor" or "latex").
+        expression : sympy expression
+        context : str
+            Any additional information that the result depends on.
+
+        Returns
+        -------
+        str
+        """
+        key_string = '\n'.join([kind, srepr(expression)] +
+                               [str(each) for each in context])
+        return sha1(key_string.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get(cls, key):
+        """
+        Returns the cached value of ``key`` or None.
+        """
+        if not cls.enabled:
+            return None
+        try:
+            connection = cls._get_connection()
+            row = connection.execute('SELECT value FROM cache WHERE key=?',
+                                     (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute('UPDATE cache SET last_access=? WHERE key=?',
+                               (time(), key))
+            connection.commit()
+            return row[0]
+        except sqlite3.Error:
+            return None
+
+    @classmethod
+    def set(cls, key, kind, value):
+        """
+        Stores the value of ``key``.
+        """
+        if not cls.enabled:
+            return
+        try:
+            connection = cls._get_connection()
+            connection.execute('INSERT OR REPLACE INTO cache '
+                               '(key, kind, value, last_access) '
+                               'VALUES (?, ?, ?, ?)',
+                               (key, kind, value, time()))
+            connection.commit()
+            cls._evict()
+        except sqlite3.Error:
+            pass
+
+    @classmethod
+    def _evict(cls):
+        # removes the least recently used entries (and a margin of 10%
+        # so that eviction does not happen on every insert)
+        try:
+            connection = cls._get_connection()
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > cls.max_entries:
+                to_remove = count - int(cls.max_entries * 0.9)
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY last_access ASC LIMIT ?)', (to_remove,))
+                connection.commit()
+        except sqlite3.Error:
+            pass
+
+    @classmethod
+    def clear(cls):
+        """
+        Removes all entries from the cache.
+        """
+        try:
+            connection = cls._get_connection()
+            connection.execute('DELETE FROM cache')
+            connection.commit()
+        except sqlite3.Error:
+            pass
+
+    @classmethod
+    def size(cls):
+        """
+        Returns the number of entries in the cache.
+        """
+        try:
+            return cls._get_connection().execute(
+                'SELECT COUNT(*) FROM cache').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    @classmethod
+    def expression(cls, kind, expression, function, *context):
+        """
+        Returns the (cached) sympy expression resulting from applying
+        ``function`` to ``expression``.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of result (e.g. "factor").
+        expression : sympy expression
+        function : function
+            A function that takes ``expression`` as argument and returns a
+            sympy expression.
+        context : str
+            Any additional information that the result depends on.
+
+        Returns
+        -------
+        sympy expression
+        """
+        if not cls.enabled:
+            return function(expression)
+        key = cls.make_key(kind, expression, *context)
+        cached = cls.get(key)
+        if cached is not None:
+            try:
+                return sympify(cached)
+            except Exception:
+                pass
+        result = function(expression)
+        cls.set(key, kind, srepr(result))
+        return result
+
+    @classmethod
+    def factor(cls, expression):
+        """
+        Returns the (cached) factored form of a sympy expression.
+        """
+        return cls.expression('factor', expression, lambda e: e.factor())
+
+    @classmethod
+    def string(cls, kind, expression, function, *context):
+        """
+        Returns the (cached) string resulting from applying ``function``
+        to ``expression`` (e.g. a LaTeX rendering).
+
+        Parameters
+        ----------
+        kind : str
+            The kind of result (e.g. "latex").
+        expression : sympy expression
+        function : function
+            A function that takes ``expression`` as argument and returns a
+            string.
+        context : str
+            Any additional information that the result depends on.
+
+        Returns
+        -------
+        str
+        """
+        if not cls.enabled:
+            return function(expression)
+        key = cls.make_key(kind, expression, *context)
+        cached = cls.get(key)
+        if cached is not None:
+            return cached
+        result = function(expression)
+        cls.set(key, kind, result)
+        return result
@@ -3,8 +3,11 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 from sympy import latex, sympify, Symbol
+from hashlib import sha1
 import sys
 
+from ._cache import ExpressionCache
+
 __all__ = ['LatexExpr']
 
 
@@ -37,9 +40,24 @@ class LatexExpr(object):
         self._added_tk = False
         self._tk_subs = None
         self._term_types = None
+        self._cache_signature = None
 
     def add_term_types(self, term_types):
         self._term_types = term_types
+        self._cache_signature = None
+
+    @property
+    def cache_signature(self):
+        # the latex representation of an expression depends on the
+        # names of the model components and the thermokin term types
+        if not self._cache_signature:
+            mod = self.mod
+            components = (sorted(mod.species), sorted(mod.reactions),
+                          sorted(mod.parameters),
+                          sorted(self._term_types or []))
+            self._cache_signature = sha1(
+                repr(components).encode('utf-8')).hexdigest()
+        return self._cache_signature
 
     def _add_tk_subs(self):
         if not self._subs_dict:
@@ -250,6 +268,14 @@ class LatexExpr(object):
         if type(expression) == str:
             expression = sympify(expression)
 
+        return ExpressionCache.string(
+            'latex',
+            expression,
+            lambda expr: self._expression_to_latex(expr, mul_symbol),
+            mul_symbol,
+            self.cache_signature)
+
+    def _expression_to_latex(self, expression, mul_symbol=None):
         # symbol substitution in sympy takes longer for larger dicts
         # therefore I only get the symbols that I need
         # for mcanut model substitution of a 2 symbol expression
@@ -16,7 +16,9 @@ __all__ = ['psc_to_str',
            'strip_fixed',
            'augment_fix_sting',
            'fix_metabolite',
-           'fix_metabolite_ss']
+           'fix_metabolites',
+           'fix_metabolite_ss',
+           'str_to_mod']
 
 
 def psc_to_str(name):
@@ -151,6 +153,74 @@ def fix_metabolite(mod, fix, model_name=None):
     return new_mod
 
 
+def fix_metabolites(mod, fix_list, model_name=None):
+    """
+    Fix several metabolites in a model and return a new model with the
+    fixed metabolites.
+
+    Unlike repeated calls to ``fix_metabolite`` the model is only parsed
+    once, regardless of the number of metabolites that are fixed.
+
+    Parameters
+    ----------
+    mod : PysMod
+        The original model.
+    fix_list : list of str
+        The metabolites to fix.
+    model_name : str, optional (Default : none)
+        The file name to use when saving the model (in psc/orca).
+        If None it defaults to original_model_name_fix1_fix2.
+
+    Returns
+    -------
+    PysMod
+        A new model instance with additional fixed species.
+
+    See Also
+    --------
+    fix_metabolite
+    """
+    for fix in fix_list:
+        assert fix in mod.species, "\nInvalid fixed species."
+
+    if model_name is None:
+        model_name = get_model_name(mod) + '_' + '_'.join(fix_list)
+
+    mod_str = mod_to_str(mod)
+    fix_head, mod_str_sans_fix = strip_fixed(mod_str)
+    if not fix_head:
+        fix_head = 'FIX:'
+    new_fix_head = fix_head
+    for fix in fix_list:
+        new_fix_head = augment_fix_sting(new_fix_head, fix)
+    return str_to_mod(new_fix_head + '\n' + mod_str_sans_fix, model_name)
+
+
+def str_to_mod(fstr, model_name):
+    """
+    Instantiates a PySCeS model from the string representation of a
+    model file.
+
+    Parameters
+    ----------
+    fstr : str
+        String representation of a psc file (e.g. as produced by
+        ``mod_to_str``).
+    model_name : str
+        The file name to use when saving the model (in psc/orca).
+
+    Returns
+    -------
+    PysMod
+        A new model instance.
+
+    See Also
+    --------
+    mod_to_str
+    """
+    return model(model_name, loader="string", fString=fstr)
+
+
 def fix_metabolite_ss(mod, fix, model_name=None):
     """
     Fix a metabolite at its steady state in a model and return a new
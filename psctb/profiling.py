@@ -0,0 +1,306 @@
+"""
+Opt-in instrumentation of the computationally expensive functions that
+are used by the PySCeSToolbox analyses.
+
+While a `Profiler` is active the functions listed in `hot_paths` are
+replaced by wrappers that record the number of calls, the cumulative time
+and the cumulative payload size (e.g. the length of the expressions that
+are evaluated or the number of scan points) of each function. The
+original functions are restored when the last active profiler is
+disabled, so that profiling has no cost at all when it is not used.
+
+Examples
+--------
+>>> from psctb.profiling import profile
+>>> with profile() as prof:
+...     tk = ThermoKin(mod)
+...     tk.do_par_scan('X0', scan_range)
+>>> print(prof.table())
+>>> prof.to_json('profile.json')
+"""
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import sys
+from functools import wraps
+from time import perf_counter
+
+__all__ = ['Profiler',
+           'profile',
+           'hot_paths']
+
+
+def _length(value):
+    try:
+        return len(str(value))
+    except Exception:
+        return 0
+
+
+def _first_arg_length(args, kwargs, result):
+    return _length(args[0]) if args else 0
+
+
+def _second_arg_length(args, kwargs, result):
+    return _length(args[1]) if len(args) > 1 else 0
+
+
+def _scan_points(args, kwargs, result):
+    return len(getattr(args[0], 'ScanSpace', ()))
+
+
+def _no_payload(args, kwargs, result):
+    return 0
+
+
+def _get_value():
+    from .utils.misc import _misc
+    return _misc, 'get_value'
+
+
+def _expression_to_latex():
+    from .latextools import LatexExpr
+    return LatexExpr, 'expression_to_latex'
+
+
+def _do_state():
+    from pysces.PyscesModel import PysMod
+    return PysMod, 'doState'
+
+
+def _do_mca():
+    from pysces.PyscesModel import PysMod
+    return PysMod, 'doMca'
+
+
+def _scanner_run():
+    from pysces import Scanner
+    return Scanner, 'Run'
+
+
+def _maxima_factor():
+    from .analyse._symca.symca_toolbox import SymcaToolBox
+    return SymcaToolBox, 'maxima_factor'
+
+
+def _sympify():
+    import sympy
+    return sympy, 'sympify'
+
+
+# name -> (function returning the owner and attribute name of the
+# function, function returning the payload size of a call)
+hot_paths = {
+    'get_value': (_get_value, _first_arg_length),
+    'expression_to_latex': (_expression_to_latex, _second_arg_length),
+    'doState': (_do_state, _no_payload),
+    'doMca': (_do_mca, _no_payload),
+    'Scanner.Run': (_scanner_run, _scan_points),
+    'maxima_factor': (_maxima_factor, _first_arg_length),
+    'sympify': (_sympify, _first_arg_length),
+}
+
+# the currently active profilers
+_active = []
+# the patched functions: (owner, attribute, original value or None if
+# the original value is inherited)
+_patches = []
+
+
+def _make_wrapper(name, function, payload):
+    # nested (e.g. recursive) calls are counted, but only the time of the
+    # outermost call is added to the cumulative time
+    depth = [0]
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        depth[0] += 1
+        start = perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            depth[0] -= 1
+        elapsed = perf_counter() - start if depth[0] == 0 else 0.0
+        try:
+            size = payload(args, kwargs, result)
+        except Exception:
+            size = 0
+        for profiler in _active:
+            profiler._record(name, elapsed, size)
+        return result
+    wrapper.__wrapped_hot_path__ = function
+    return wrapper
+
+
+def _patch():
+    for name, (resolve, payload) in hot_paths.items():
+        try:
+            owner, attribute = resolve()
+        except ImportError:
+            continue
+        if isinstance(owner, type):
+            # the attribute may be defined by a base class
+            defined_by = [cls for cls in owner.__mro__
+                          if attribute in cls.__dict__]
+            if not defined_by:
+                continue
+            raw = defined_by[0].__dict__[attribute]
+            own = defined_by[0] is owner
+        else:
+            raw = getattr(owner, attribute)
+            own = True
+        is_static = isinstance(raw, staticmethod)
+        function = raw.__func__ if is_static else raw
+        wrapper = _make_wrapper(name, function, payload)
+        setattr(owner, attribute, staticmethod(wrapper) if is_static
+                else wrapper)
+        _patches.append((owner, attribute, raw if own else None))
+        # functions that were imported by name into psctb modules
+        if not isinstance(owner, type):
+            for module_name, module in list(sys.modules.items()):
+                if module is None or module is owner or \
+                        not module_name.startswith('psctb'):
+                    continue
+                if module.__dict__.get(attribute) is function:
+                    setattr(module, attribute, wrapper)
+                    _patches.append((module, attribute, function))
+
+
+def _restore():
+    while _patches:
+        owner, attribute, original = _patches.pop()
+        if original is None:
+            delattr(owner, attribute)
+        else:
+            setattr(owner, attribute, original)
+    # psctb modules that were first imported while profiling (see the lazy
+    # imports of psctb) imported the wrappers by name
+    for module_name, module in list(sys.modules.items()):
+        if module is None or not module_name.startswith('psctb'):
+            continue
+        for attribute, value in list(vars(module).items()):
+            original = getattr(value, '__wrapped_hot_path__', None)
+            if original is not None:
+                setattr(module, attribute, original)
+
+
+class Profiler(object):
+    """
+    Records the calls of the functions in `hot_paths` while it is
+    enabled.
+
+    A profiler can be used as a context manager (see `profile`) or be
+    enabled and disabled explicitly. Several profilers may be active at
+    the same time; each records all calls made while it is enabled.
+
+    Attributes
+    ----------
+    stats : dict
+        Function names as keys and dictionaries with the number of
+        "calls", the cumulative "time" (in seconds) and the cumulative
+        "payload" size as values.
+    """
+
+    def __init__(self):
+        super(Profiler, self).__init__()
+        self.stats = {}
+        self.enabled = False
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+
+    def enable(self):
+        """
+        Starts recording calls.
+        """
+        if self.enabled:
+            return
+        if not _active:
+            _patch()
+        _active.append(self)
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stops recording calls. The original functions are restored if no
+        other profiler is active.
+        """
+        if not self.enabled:
+            return
+        _active.remove(self)
+        if not _active:
+            _restore()
+        self.enabled = False
+
+    def reset(self):
+        """
+        Removes all recorded statistics.
+        """
+        self.stats = {}
+
+    def _record(self, name, elapsed, size):
+        entry = self.stats.get(name)
+        if entry is None:
+            entry = {'calls': 0, 'time': 0.0, 'payload': 0}
+            self.stats[name] = entry
+        entry['calls'] += 1
+        entry['time'] += elapsed
+        entry['payload'] += size
+
+    def table(self):
+        """
+        Returns the statistics as a text table sorted by cumulative time.
+
+        Returns
+        -------
+        str
+        """
+        header = '{:<22}{:>10}{:>14}{:>16}{:>14}'.format(
+            'function', 'calls', 'time (s)', 'time/call (ms)', 'payload')
+        lines = [header, '-' * len(header)]
+        for name, entry in sorted(self.stats.items(),
+                                  key=lambda item: -item[1]['time']):
+            lines.append('{:<22}{:>10}{:>14.4f}{:>16.4f}{:>14}'.format(
+                name,
+                entry['calls'],
+                entry['time'],
+                1000 * entry['time'] / entry['calls'],
+                entry['payload']))
+        return '\n'.join(lines)
+
+    def to_json(self, file_name=None):
+        """
+        Returns the statistics as a JSON string and optionally writes them
+        to a file.
+
+        Parameters
+        ----------
+        file_name : str, optional (Default : None)
+            The file to write to.
+
+        Returns
+        -------
+        str
+        """
+        json_string = json.dumps(self.stats, indent=1, sort_keys=True)
+        if file_name:
+            with open(file_name, 'w') as f:
+                f.write(json_string)
+        return json_string
+
+
+def profile():
+    """
+    Returns a new `Profiler` to be used as a context manager.
+
+    Returns
+    -------
+    Profiler
+    """
+    return Profiler()
@@ -1,5 +1,34 @@
-from . import misc
-from . import plotting
-from . import model_graph
-from .config import ConfigReader
-from .model_comparing import compare_models, SteadyStateComparer, SimulationComparer, ParameterScanComparer, ClosedOpenComparer
\ No newline at end of file
+# Submodules and their (heavy) dependencies are only imported when they
+# are first accessed.
+from importlib import import_module
+
+_lazy_submodules = ['misc',
+                    'plotting',
+                    'model_graph']
+
+_lazy_attributes = {'ConfigReader': '.config',
+                    'compare_models': '.model_comparing',
+                    'SteadyStateComparer': '.model_comparing',
+                    'SimulationComparer': '.model_comparing',
+                    'ParameterScanComparer': '.model_comparing',
+                    'ClosedOpenComparer': '.model_comparing',
+                    'EnsembleComparer': '.model_comparing'}
+
+__all__ = _lazy_submodules + list(_lazy_attributes)
+
+
+def __getattr__(name):
+    if name in _lazy_submodules:
+        return import_module('.' + name, __name__)
+    try:
+        module_name = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(
+            __name__, name))
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
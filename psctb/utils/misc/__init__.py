@@ -1 +1,7 @@
 from ._misc import *
+from ._parallel import *
+from ._state import *
+from ._engine import *
+from ._registry import *
+from ._results import *
+from ._quiet import *
@@ -0,0 +1,144 @@
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+from numpy import asarray, broadcast_shapes, broadcast_to, float64, errstate
+from sympy import Symbol, sympify, lambdify
+
+__all__ = ['ExpressionEngine',
+           'expression_engine']
+
+
+class ExpressionEngine(object):
+    """
+    Evaluates string expressions (e.g. the ``str`` of sympy expressions
+    of control coefficients, control patterns or ThermoKin terms) for
+    numeric or array values of their symbols.
+
+    Each expression is parsed and compiled into a numpy function only
+    once for a particular set of symbol names. Compiled functions are
+    kept in a least recently used cache of at most ``max_size``
+    functions.
+
+    Mathematical functions and constants (e.g. ``log``, ``exp``, ``Abs``,
+    ``pi``) are translated to their numpy equivalents when an expression
+    is compiled, and arrays are evaluated element-wise by numpy rather
+    than with a Python loop. All names that are given values are treated
+    as symbols, even if they coincide with sympy names (e.g. ``E`` or
+    ``S``).
+
+    Parameters
+    ----------
+    max_size : int, optional (Default : 4096)
+        The maximum number of compiled functions that are cached.
+    """
+
+    def __init__(self, max_size=4096):
+        super(ExpressionEngine, self).__init__()
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _compile(self, expression, names):
+        symbols = [Symbol(name) for name in names]
+        sympy_expression = sympify(expression,
+                                   locals=dict(zip(names, symbols)))
+        if sympy_expression.free_symbols - set(symbols):
+            # the expression cannot be evaluated numerically
+            return None, sympy_expression
+        return lambdify(symbols, sympy_expression, modules='numpy'), \
+            sympy_expression
+
+    def compile(self, expression, names):
+        """
+        Returns the compiled function of an expression.
+
+        Parameters
+        ----------
+        expression : str
+            The expression.
+        names : tuple of str
+            The names of the symbols (in the order of the arguments of the
+            function).
+
+        Returns
+        -------
+        tuple
+            The function (None if the expression contains symbols that are
+            not in ``names``) and the sympy expression.
+        """
+        key = (expression, names)
+        try:
+            compiled = self._cache.pop(key)
+            self.hits += 1
+        except KeyError:
+            compiled = self._compile(expression, names)
+            self.misses += 1
+            if len(self._cache) >= self.max_size:
+                self._cache.popitem(last=False)
+        self._cache[key] = compiled
+        return compiled
+
+    def evaluate(self, expression, subs_dict=None):
+        """
+        Evaluates an expression.
+
+        Parameters
+        ----------
+        expression : str
+            The expression.
+        subs_dict : dict, optional (Default : None)
+            A dictionary with symbol names as keys and numbers or arrays
+            (of the same length) as values.
+
+        Returns
+        -------
+        float64 or numpy.ndarray
+            The value of the expression. If the expression contains
+            symbols without values, the partially substituted sympy
+            expression is returned instead.
+        """
+        if not subs_dict:
+            subs_dict = {}
+        names = tuple(sorted(subs_dict))
+        function, sympy_expression = self.compile(str(expression), names)
+        values = [asarray(subs_dict[name], dtype=float64) for name in names]
+        if function is None:
+            return sympy_expression.subs(dict(zip(names, values)))
+        with errstate(all='ignore'):
+            result = asarray(function(*values), dtype=float64)
+        shape = broadcast_shapes(*[value.shape for value in values])
+        if result.shape != shape:
+            # e.g. constant expressions
+            result = broadcast_to(result, shape).copy()
+        if result.ndim == 0:
+            return float64(result)
+        return result
+
+    def cache_clear(self):
+        """
+        Removes all compiled functions from the cache.
+        """
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def cache_info(self):
+        """
+        Returns the number of cache hits, misses and the current and
+        maximum number of cached functions.
+
+        Returns
+        -------
+        dict
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._cache),
+                'max_size': self.max_size}
+
+
+expression_engine = ExpressionEngine()
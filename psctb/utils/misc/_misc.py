@@ -3,7 +3,9 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 import sys
-from os import path, devnull
+from os import path
+from collections import OrderedDict
+from weakref import ref
 
 
 from numpy.ma import log10
@@ -11,10 +13,13 @@ from numpy import array, errstate, nanmin, nanmax, nonzero, float64,\
     bool_, bytes_, ones
 from pysces.PyscesModel import PysMod
 from pysces import ModelMap
-from IPython.display import HTML
 from sympy import sympify
 from functools import wraps
 from ..config import ConfigReader
+from ._state import frozen_state, mark_state_changed, state_version
+from ._engine import expression_engine
+from ._registry import CoefficientRegistry
+from ._quiet import quiet
 
 __all__ = ['cc_list',
            'ec_list',
@@ -24,6 +29,7 @@ __all__ = ['cc_list',
            'prc_list',
            'silence_print',
            'DotDict',
+           'LazyDotDict',
            'PseudoDotDict',
            'is_number',
            'formatter_factory',
@@ -32,6 +38,7 @@ __all__ = ['cc_list',
            'find_min',
            'find_max',
            'split_coefficient',
+           'coefficient_registry',
            'ec_dict',
            'cc_dict',
            'rc_dict',
@@ -64,16 +71,200 @@ __all__ = ['cc_list',
            'is_prc',]
 
 
-def memoize(function):
-    memo = {}
+def _structure_signature(model):
+    # cheap signature of the model structure: the name lists are replaced
+    # or grow when the structure of a model changes
+    signature = []
+    for list_name in ('species', 'reactions', 'parameters', 'fixed_species'):
+        name_list = getattr(model, list_name, None)
+        try:
+            signature.append((id(name_list), len(name_list)))
+        except TypeError:
+            signature.append((id(name_list), None))
+    return tuple(signature)
+
+
+class _ModelMemo(object):
+    """
+    A least recently used cache for functions of (among other arguments)
+    Pysces models.
+
+    Values are cached separately for each model (or combination of
+    models) and at most `max_size` values are kept per model. Models are
+    only referenced weakly and their values are removed as soon as they
+    are garbage collected.
+
+    The structure signature of a model is only checked when its state
+    version (see `state_version`) has changed since the previous check,
+    i.e. after attributes of the model have been assigned. The values of
+    a model are recalculated if its species, reactions, parameters or
+    fixed species have changed.
+    """
+
+    def __init__(self, function, max_size):
+        super(_ModelMemo, self).__init__()
+        self.function = function
+        self.max_size = max_size
+        # model id (or tuple of model ids) -> [state version(s), structure
+        # signature(s), entries]
+        self._groups = {}
+        # the position of the model in the arguments of the previous call
+        self._position = 0
+        # model id -> (weakref of model, set of model ids of its groups)
+        self._models = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _forget_model(self, model_id):
+        for group_key in self._models.pop(model_id, (None, ()))[1]:
+            self._groups.pop(group_key, None)
+
+    def _new_group(self, group_key, models, versions):
+        group = [versions,
+                 tuple(map(_structure_signature, models)),
+                 OrderedDict()]
+        self._groups[group_key] = group
+        for model in models:
+            model_id = id(model)
+            if model_id not in self._models:
+                model_ref = ref(model, lambda _, model_id=model_id:
+                                self._forget_model(model_id))
+                self._models[model_id] = (model_ref, set())
+            self._models[model_id][1].add(group_key)
+        return group
+
+    def _call(self, args):
+        models = []
+        key = []
+        for position, arg in enumerate(args):
+            if isinstance(arg, PysMod):
+                models.append(arg)
+                key.append(_model_arg)
+                self._position = position
+            else:
+                key.append(arg)
+        key = tuple(key)
+        if len(models) == 1:
+            group_key = id(models[0])
+            versions = state_version(models[0])
+        else:
+            # the fast path only applies to functions of a single model
+            self._position = len(args)
+            group_key = tuple(map(id, models))
+            versions = tuple(map(state_version, models))
+
+        group = self._groups.get(group_key)
+        if group is None:
+            group = self._new_group(group_key, models, versions)
+        elif group[0] != versions:
+            group[0] = versions
+            signatures = tuple(map(_structure_signature, models))
+            if signatures != group[1]:
+                group[1] = signatures
+                group[2].clear()
+
+        entries = group[2]
+        try:
+            value = entries.get(key, _missing)
+        except TypeError:
+            # unhashable arguments cannot be cached
+            return self.function(*args)
+        if value is not _missing:
+            entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = self.function(*args)
+        entries[key] = value
+        if len(entries) > self.max_size:
+            entries.popitem(last=False)
+        return value
+
+    def cache_info(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': sum(len(group[2])
+                            for group in self._groups.values()),
+                'max_size': self.max_size}
+
+    def cache_clear(self):
+        self._groups.clear()
+        self._models.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# placeholders for missing values and for models in cache keys
+_missing = object()
+_model_arg = object()
+
+
+def memoize(function=None, max_size=8192):
+    """
+    Decorator that caches the return values of a function of Pysces models
+    (and other hashable arguments).
+
+    Models are held through weak references so that the cache does not
+    keep them alive, at most `max_size` values are kept per model (the
+    least recently used values being evicted first) and values are
+    recalculated when the species, reactions, parameters or fixed species
+    of a model change.
+
+    The decorated function has `cache_info` and `cache_clear` methods that
+    respectively return the cache statistics and empty the cache.
+
+    Parameters
+    ----------
+    function : function
+        The function to decorate.
+    max_size : int, optional (Default : 8192)
+        The maximum number of cached values per model (or combination of
+        models).
+
+    Returns
+    -------
+    function
+
+    Examples
+    --------
+    >>> @memoize
+    ... def reaction_count(mod):
+    ...     return len(mod.reactions)
+    >>> @memoize(max_size=128)
+    ... def is_fixed(attr, mod):
+    ...     return attr in mod.fixed_species
+    """
+    if function is None:
+        return lambda function: memoize(function, max_size)
+
+    memo = _ModelMemo(function, max_size)
+    groups = memo._groups
+    call = memo._call
+
     @wraps(function)
     def wrapper(*args):
-        if args in memo:
-            return memo[args]
-        else:
-            return_val = function(*args)
-            memo[args] = return_val
-            return return_val
+        # fast path for the common case of a single model at the same
+        # position as in the previous call (see _ModelMemo._call)
+        position = memo._position
+        if position < len(args):
+            model = args[position]
+            if isinstance(model, PysMod):
+                group = groups.get(id(model))
+                if group is not None and group[0] == state_version(model):
+                    key = args[:position] + (_model_arg,) + \
+                        args[position + 1:]
+                    try:
+                        value = group[2].get(key, _missing)
+                    except TypeError:
+                        value = _missing
+                    if value is not _missing:
+                        group[2].move_to_end(key)
+                        memo.hits += 1
+                        return value
+        return call(args)
+    wrapper.cache_info = memo.cache_info
+    wrapper.cache_clear = memo.cache_clear
     return wrapper
 
 @memoize
@@ -148,7 +339,7 @@ def is_rc(attr, model):
         return False
 @memoize
 def is_mca_coef(attr, model):
-    mca_func_list = [is_rc, is_prc, is_ec, is_ec]
+    mca_func_list = [is_cc, is_ec, is_rc, is_prc]
     return any([func(attr, model) for func in mca_func_list])
 
 def get_filename_from_caller():
@@ -407,7 +598,7 @@ def do_safe_state(mod, parameter, value, type='ss'):
     mod.SetQuiet()
     mod.doState()
     if mod.__StateOK__:
-        if type is 'mca':
+        if type == 'mca':
             mod.EvalEvar()
             mod.EvalEpar()
             mod.EvalCC()
@@ -415,6 +606,7 @@ def do_safe_state(mod, parameter, value, type='ss'):
     else:
         ret = False
     mod.SetLoud()
+    mark_state_changed(mod)
     return ret
 
 
@@ -467,30 +659,55 @@ def get_value_sympy(expression, subs_dict):
 
 
 def get_value(expression, subs_dict):
-    try:
-        # reasons for excepting:
-        #    expression is just a single number
-        #    expression contains mathematical functions e.g. log, sin, cos
-        return get_value_eval(expression, subs_dict)
-    except:
-        return get_value_sympy(expression, subs_dict)
+    """
+    Evaluates a string expression for the values (numbers or arrays) of
+    its symbols in `subs_dict`.
+
+    The expression is compiled once and cached by the shared
+    `ExpressionEngine`, which also handles mathematical functions (e.g.
+    log, exp) and evaluates arrays without looping over their elements.
+
+    Parameters
+    ----------
+    expression : str
+        The expression (e.g. the string of a sympy expression).
+    subs_dict : dict
+        Symbol names as keys and numbers or arrays as values.
+
+    Returns
+    -------
+    float64 or numpy.ndarray
+
+    See Also
+    --------
+    ExpressionEngine
+    """
+    return expression_engine.evaluate(expression, subs_dict)
 
 
 def split_coefficient(coefficient_name, mod):
-    coefficient_2_types = ['cc', 'ec', 'rc']
-    coefficient_3_types = ['prc']
-    if coefficient_name[:2] in coefficient_2_types:
-        coefficient_type = coefficient_name[:2]
-    elif coefficient_name[:3] in coefficient_3_types:
-        coefficient_type = coefficient_name[:3]
-    else:
-        return None
-    try:
-        members = eval(coefficient_type + '_dict(mod)["' + coefficient_name + '"]')
-        return_val = tuple([coefficient_type] + list(members))
-    except KeyError:
-        return_val = None
-    return return_val
+    """
+    Returns the kind ("cc", "ec", "rc" or "prc") and the members of a
+    coefficient of a model.
+
+    Parameters
+    ----------
+    coefficient_name : str
+        The name of the coefficient (e.g. "ecR1_S1").
+    mod : PysMod
+        The model.
+
+    Returns
+    -------
+    tuple of str or None
+        For example ("ec", "R1", "S1") or None if `coefficient_name` is not
+        a coefficient of `mod`.
+
+    See Also
+    --------
+    coefficient_registry
+    """
+    return coefficient_registry(mod).split(coefficient_name)
 
 
 def is_number(suspected_number):
@@ -677,6 +894,7 @@ def html_table(matrix_or_array_like,
     if raw:
         return ''.join(html_table)
     else:
+        from IPython.display import HTML
         return HTML(''.join(html_table))
 
 
@@ -685,7 +903,8 @@ def silence_print(func):
     A function wrapper that silences the stdout output of a function.
 
     This function is *very* useful for silencing pysces functions that
-    print a lot of unneeded output.
+    print a lot of unneeded output. Output is only silenced for the
+    thread that calls the function (see `quiet`).
 
     Parameters
     ----------
@@ -699,21 +918,33 @@ def silence_print(func):
     """
     @wraps(func)
     def wrapper(*args, **kwargs):
-        # stdout = sys.stdout
-        try:
-            sys.stdout = open(devnull, 'w')
-            returns = func(*args, **kwargs)
-            fix_printing()
-            return returns
-        except KeyboardInterrupt as e:
-            fix_printing()
-            raise e
+        with quiet():
+            return func(*args, **kwargs)
     return wrapper
 
 def fix_printing():
     sys.stdout = ConfigReader.get_config()['stdout']
 
 
+@memoize
+def coefficient_registry(mod):
+    """
+    Returns the `CoefficientRegistry` of a model.
+
+    The registry is shared by all analyses of the model and is rebuilt
+    when the species, reactions or parameters of the model change.
+
+    Parameters
+    ----------
+    mod : PysMod
+        A Pysces model.
+
+    Returns
+    -------
+    CoefficientRegistry
+    """
+    return CoefficientRegistry(mod)
+
 @memoize
 def cc_list(mod):
     """
@@ -738,30 +969,11 @@ def cc_list(mod):
     ec_list, rc_list, prc_list
 
     """
-    ccs = []
-    for base_reaction in mod.reactions:
-        for top_species in mod.species:
-            cc = 'cc%s_%s' % (top_species, base_reaction)
-            ccs.append(str(cc))
-        for top_reaction in mod.reactions:
-            cc = 'ccJ%s_%s' % (top_reaction, base_reaction)
-            ccs.append(str(cc))
-    ccs.sort()
-    return ccs
+    return sorted(coefficient_registry(mod).names('cc'))
 
 @memoize
 def cc_dict(mod):
-    ccs = {}
-    for base_reaction in mod.reactions:
-        for top_species in mod.species:
-            cc = 'cc%s_%s' % (top_species, base_reaction)
-            cc = str(cc)
-            ccs[cc] = (str(top_species), str(base_reaction))
-        for top_reaction in mod.reactions:
-            cc = 'ccJ%s_%s' % (top_reaction, base_reaction)
-            cc = str(cc)
-            ccs[cc] = (str(top_reaction), str(base_reaction))
-    return ccs
+    return coefficient_registry(mod).member_dict('cc')
 
 @memoize
 def ec_list(mod):
@@ -787,16 +999,7 @@ def ec_list(mod):
     cc_list, rc_list, prc_list
 
     """
-    ecs = []
-    for top_reaction in mod.reactions:
-        for base_species in mod.species:
-            ec = 'ec%s_%s' % (top_reaction, base_species)
-            ecs.append(str(ec))
-        for base_param in mod.parameters:
-            ec = 'ec%s_%s' % (top_reaction, base_param)
-            ecs.append(str(ec))
-    ecs.sort()
-    return ecs
+    return sorted(coefficient_registry(mod).names('ec'))
 
 @memoize
 def prod_ec_list(mod):
@@ -849,17 +1052,7 @@ def mod_ec_list(mod):
 
 @memoize
 def ec_dict(mod):
-    ecs = {}
-    for top_reaction in mod.reactions:
-        for base_species in mod.species:
-            ec = 'ec%s_%s' % (top_reaction, base_species)
-            ec = str(ec)
-            ecs[ec] = (str(top_reaction), str(base_species))
-        for base_param in mod.parameters:
-            ec = 'ec%s_%s' % (top_reaction, base_param)
-            ec = str(ec)
-            ecs[ec] = (str(top_reaction), str(base_param))
-    return ecs
+    return coefficient_registry(mod).member_dict('ec')
 
 @memoize
 def rc_list(mod):
@@ -885,30 +1078,11 @@ def rc_list(mod):
     cc_list, ec_list, prc_list
 
     """
-    rcs = []
-    for base_param in mod.parameters:
-        for top_species in mod.species:
-            rc = 'rc%s_%s' % (top_species, base_param)
-            rcs.append(str(rc))
-        for top_reaction in mod.reactions:
-            rc = 'rcJ%s_%s' % (top_reaction, base_param)
-            rcs.append(str(rc))
-    rcs.sort()
-    return rcs
+    return sorted(coefficient_registry(mod).names('rc'))
 
 @memoize
 def rc_dict(mod):
-    rcs = {}
-    for base_param in mod.parameters:
-        for top_species in mod.species:
-            rc = 'rc%s_%s' % (top_species, base_param)
-            rc = str(rc)
-            rcs[rc] = (str(top_species), str(base_param))
-        for top_reaction in mod.reactions:
-            rc = 'rcJ%s_%s' % (top_reaction, base_param)
-            rc = str(rc)
-            rcs[rc] = (str(top_reaction), str(base_param))
-    return rcs
+    return coefficient_registry(mod).member_dict('rc')
 
 @memoize
 def prc_list(mod):
@@ -935,40 +1109,11 @@ def prc_list(mod):
     cc_list, ec_list, rc_list
 
     """
-    prcs = []
-    for base_param in mod.parameters:
-        for back_reaction in mod.reactions:
-            for top_species in mod.species:
-                prc = 'prc%s_%s_%s' % (top_species, base_param, back_reaction)
-                prc = str(prc)
-                prcs.append(prc)
-            for top_reaction in mod.reactions:
-                prc = 'prcJ%s_%s_%s' % (top_reaction,
-                                        base_param,
-                                        back_reaction)
-                prc = str(prc)
-                prcs.append(prc)
-    prcs.sort()
-    return prcs
+    return sorted(coefficient_registry(mod).names('prc'))
 
 @memoize
 def prc_dict(mod):
-    prcs = {}
-    for base_param in mod.parameters:
-        for back_reaction in mod.reactions:
-            for top_species in mod.species:
-                prc = 'prc%s_%s_%s' % (top_species, base_param, back_reaction)
-                prc = str(prc)
-                prcs[prc] = (str(top_species), str(base_param), str(back_reaction))
-            for top_reaction in mod.reactions:
-                prc = 'prcJ%s_%s_%s' % (top_reaction,
-                                        base_param,
-                                        back_reaction)
-                prc = str(prc)
-                prcs[prc] = (str(top_reaction),
-                             str(base_param),
-                             str(back_reaction))
-    return prcs
+    return coefficient_registry(mod).member_dict('prc')
 
 @memoize
 def flux_list(mod):
@@ -1159,10 +1304,12 @@ class DotDict(dict):
             values = [self[the_key] for the_key in keys]
             items = list(zip(keys, values))
             lst = []
-            for k, v in items:
-                col1 = eval(key)
-                col2 = eval(value)
-                lst.append((col1, col2))
+            # the model state cannot change while the table is made
+            with frozen_state():
+                for k, v in items:
+                    col1 = eval(key)
+                    col2 = eval(value)
+                    lst.append((col1, col2))
 
             tables = []
             cur_list = []
@@ -1197,6 +1344,134 @@ class DotDict(dict):
         self._repr_html_ = representation
 
 
+class LazyDotDict(DotDict):
+    """A ``DotDict`` of which some values are only calculated when needed.
+
+    Lazy keys are registered together with a factory function that takes
+    no arguments and returns the value of that key. The factory is called
+    the first time the key is accessed (via dot notation, indexing or
+    ``get``), after which the value is stored like any other ``DotDict``
+    value. Lazy keys are included in ``keys``, ``len`` and membership tests
+    without being evaluated, while operations involving all values (e.g.
+    ``values``, ``items`` or the html representation) evaluate all
+    outstanding lazy keys.
+
+    Assigning a value to a lazy key discards its factory, so a single
+    factory may populate several keys at once.
+
+    See Also
+    --------
+    DotDict
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.__dict__['_factories'] = {}
+        super(LazyDotDict, self).__init__(*args, **kwargs)
+
+    def add_lazy(self, key, factory):
+        """
+        Registers a lazily evaluated key.
+
+        Parameters
+        ----------
+        key : str
+            The key.
+        factory : function
+            A function without arguments that returns the value of ``key``.
+        """
+        if key in DotDict._reserved:
+            raise Exception('%s is a reserved key' % key)
+        self._factories[key] = factory
+
+    def update_lazy(self, factories):
+        """
+        Registers several lazily evaluated keys.
+
+        Parameters
+        ----------
+        factories : dict
+            A dictionary of keys and their factory functions.
+        """
+        for k, v in factories.items():
+            self.add_lazy(k, v)
+
+    def is_evaluated(self, key):
+        """
+        Returns False if ``key`` is a lazy key that has not been
+        evaluated yet.
+        """
+        return key not in self._factories
+
+    def _evaluate(self, key):
+        factory = self._factories.pop(key)
+        value = factory()
+        # the factory may have already assigned the value
+        if not dict.__contains__(self, key):
+            self.__setitem__(key, value)
+        return dict.__getitem__(self, key)
+
+    def _evaluate_all(self):
+        for key in list(self._factories.keys()):
+            if key in self._factories:
+                self._evaluate(key)
+
+    def __getattr__(self, name):
+        # only called when normal attribute lookup fails
+        factories = self.__dict__.get('_factories', {})
+        if name in factories:
+            return self._evaluate(name)
+        raise AttributeError(name)
+
+    def __missing__(self, key):
+        if key in self._factories:
+            return self._evaluate(key)
+        raise KeyError(key)
+
+    def __setitem__(self, x, y):
+        self._factories.pop(x, None)
+        super(LazyDotDict, self).__setitem__(x, y)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._factories
+
+    def __len__(self):
+        return dict.__len__(self) + len(self._factories)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __repr__(self):
+        self._evaluate_all()
+        return dict.__repr__(self)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys(self):
+        return list(dict.keys(self)) + list(self._factories.keys())
+
+    def update(self, dic):
+        # lazy keys of another LazyDotDict stay lazy and are evaluated
+        # by (and shared with) that LazyDotDict
+        if isinstance(dic, LazyDotDict):
+            for k in dict.keys(dic):
+                self.__setitem__(k, dict.__getitem__(dic, k))
+            for k in dic._factories.keys():
+                self.add_lazy(k, lambda k=k: dic[k])
+        else:
+            super(LazyDotDict, self).update(dic)
+
+    def values(self):
+        self._evaluate_all()
+        return dict.values(self)
+
+    def items(self):
+        self._evaluate_all()
+        return dict.items(self)
+
+
 # no use yet for this class but seemed like a nice/quick/simple way to address
 # directory trees with no overlapping subdirectory names.
 # will work for ['/a/b/c/d',/a/b/c/e'] but not for ['/a/b/c/d',/a/b/d']
@@ -0,0 +1,151 @@
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from copy import deepcopy
+from multiprocessing import Pool, cpu_count
+
+from numpy import array, array_split, full, nan, vstack
+
+from ._misc import do_safe_state, silence_print
+from ... import modeltools
+
+__all__ = ['parallel_map',
+           'legacy_scan']
+
+
+def parallel_map(function, iterable, processes=None, chunksize=1):
+    """
+    Applies a function to every item of an iterable using a pool of
+    worker processes and returns the results in order.
+
+    When only a single process is requested (or there is only a single
+    item to process) the work is done serially in the current process,
+    which avoids the overhead of starting a pool.
+
+    Parameters
+    ----------
+    function : function
+        A picklable (module level) function that takes a single argument.
+    iterable : iterable
+        The items that `function` should be applied to.
+    processes : int, optional (Default : None)
+        The number of worker processes. If None the number of CPUs is used.
+    chunksize : int, optional (Default : 1)
+        The number of items sent to a worker at a time.
+
+    Returns
+    -------
+    list
+        The return values of `function` in the same order as `iterable`.
+    """
+    items = list(iterable)
+    if processes is None:
+        processes = cpu_count()
+    processes = min(processes, len(items))
+    if processes <= 1:
+        return [function(item) for item in items]
+
+    pool = Pool(processes)
+    try:
+        results = pool.map(function, items, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+def _scan_points(mod, parameter, scan_range, output_names, state_type):
+    # calculates the state of mod (which is modified) at each point and
+    # returns the output values, or NaNs for points without a valid state
+    results = full((len(scan_range), len(output_names)), nan)
+    for i, value in enumerate(scan_range):
+        try:
+            state_valid = do_safe_state(mod, parameter, value,
+                                        type=state_type)
+            if state_valid:
+                results[i] = [getattr(mod, name) for name in output_names]
+        except Exception:
+            mod.SetLoud()
+    return results
+
+
+@silence_print
+def _legacy_scan_worker(args):
+    # worker for legacy_scan - needs to be module level to be picklable
+    model_str, model_name, values, parameter, scan_range, output_names, \
+        state_type = args
+    try:
+        mod = modeltools.str_to_mod(model_str, model_name)
+        mod.SetQuiet()
+        for k, v in values.items():
+            setattr(mod, k, v)
+    except Exception:
+        return full((len(scan_range), len(output_names)), nan)
+    return _scan_points(mod, parameter, scan_range, output_names, state_type)
+
+
+def legacy_scan(mod, parameter, scan_range, output_names, state_type='ss',
+                processes=1):
+    """
+    Scans a parameter by calculating the steady state of a model at each
+    point separately.
+
+    This is slower than a PySCeS ``Scanner`` scan, but a point for which
+    no valid steady state is found does not end the scan: its outputs are
+    simply NaN. The scan is performed on copies of `mod`, so that `mod`
+    itself is never modified. With more than one process the scan points
+    are split into contiguous chunks that are scanned by worker processes,
+    each with its own copy of the model.
+
+    Parameters
+    ----------
+    mod : PysMod
+        The model.
+    parameter : str
+        The parameter to scan.
+    scan_range : array-like
+        The values of the parameter.
+    output_names : list of str
+        The model attributes (e.g. species, fluxes or elasticities) to
+        return at each point.
+    state_type : str, optional (Default : "ss")
+        "ss" to calculate the steady state or "mca" to also calculate
+        elasticities and control coefficients at each point.
+    processes : int, optional (Default : 1)
+        The number of worker processes. If None the number of CPUs is used.
+
+    Returns
+    -------
+    dict
+        `output_names` (and `parameter`) as keys and arrays of their values
+        as values.
+
+    See Also
+    --------
+    do_safe_state
+    """
+    assert state_type in ['ss', 'mca'], 'state_type must be "ss" or "mca"'
+    scan_range = array(scan_range, dtype=float)
+    output_names = list(output_names)
+    if processes is None:
+        processes = cpu_count()
+    processes = max(1, min(processes, len(scan_range)))
+
+    if processes == 1:
+        results = _scan_points(deepcopy(mod), parameter, scan_range,
+                               output_names, state_type)
+    else:
+        model_str = silence_print(modeltools.mod_to_str)(mod)
+        model_name = modeltools.get_model_name(mod)
+        values = {k: getattr(mod, k) for k in
+                  list(mod.parameters) + list(mod.species) +
+                  list(mod.fixed_species)}
+        jobs = [(model_str, '{}_legacy_scan_{}'.format(model_name, i),
+                 values, parameter, chunk, output_names, state_type)
+                for i, chunk in enumerate(array_split(scan_range, processes))]
+        results = vstack(parallel_map(_legacy_scan_worker, jobs, processes))
+
+    scan_results = {name: results[:, i] for i, name in enumerate(output_names)}
+    scan_results[parameter] = scan_range
+    return scan_results
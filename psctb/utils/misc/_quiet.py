@@ -0,0 +1,109 @@
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+__all__ = ['quiet',
+           'is_quiet']
+
+
+class _NullWriter(object):
+    """
+    A text stream that discards everything written to it.
+    """
+
+    def write(self, text):
+        return len(text)
+
+    def writelines(self, lines):
+        pass
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class _StdoutProxy(object):
+    """
+    Replaces ``sys.stdout`` and forwards all output to the stream of the
+    current context: the shared null sink inside a `quiet` context and the
+    original stream otherwise.
+    """
+
+    def __init__(self, stream):
+        super(_StdoutProxy, self).__init__()
+        self._stream = stream
+
+    def _target(self):
+        if _quiet_context.get():
+            return _sink
+        return self._stream
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def writelines(self, lines):
+        return self._target().writelines(lines)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        # e.g. encoding, fileno or isatty of the original stream
+        return getattr(self._stream, name)
+
+
+# the single sink shared by all quiet contexts
+_sink = _NullWriter()
+# True within a quiet context - context variables are local to each
+# thread (and asyncio task), and each process has its own proxy
+_quiet_context = ContextVar('psctb_quiet', default=False)
+_install_lock = Lock()
+
+
+def _install_proxy():
+    # (re)installs the proxy if sys.stdout has been replaced since
+    if not isinstance(sys.stdout, _StdoutProxy):
+        with _install_lock:
+            if not isinstance(sys.stdout, _StdoutProxy):
+                sys.stdout = _StdoutProxy(sys.stdout)
+
+
+@contextmanager
+def quiet():
+    """
+    A context manager that silences output to ``sys.stdout``.
+
+    Unlike replacing ``sys.stdout`` with a file, only output of the
+    current thread (or asyncio task) is silenced, so that output of other
+    threads is unaffected and contexts can be nested and used concurrently.
+    No file is opened: all output is discarded by a single shared sink.
+
+    Examples
+    --------
+    >>> with quiet():
+    ...     mod.doState()
+
+    See Also
+    --------
+    silence_print
+    """
+    _install_proxy()
+    token = _quiet_context.set(True)
+    try:
+        yield
+    finally:
+        _quiet_context.reset(token)
+
+
+def is_quiet():
+    """
+    Returns True within a `quiet` context.
+    """
+    return _quiet_context.get()
@@ -0,0 +1,296 @@
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from bisect import bisect_right
+from itertools import combinations, product
+
+from numpy import arange, array, int64
+
+__all__ = ['CoefficientRegistry']
+
+
+class CoefficientRegistry(object):
+    """
+    Assigns integer ids to the reactions, species and parameters of a
+    model and to each of its control ("cc"), elasticity ("ec"), response
+    ("rc") and partial response ("prc") coefficients.
+
+    The id of a coefficient is calculated from the positions of its
+    members (e.g. the reaction and species of an elasticity coefficient)
+    in the reaction, species and parameter lists of the model, so that no
+    coefficient has to be stored and the size of the registry does not
+    grow with the number of coefficients (which, for prc coefficients,
+    grows with the cube of the model size). Coefficients can thus be
+    constructed, decomposed and used to index arrays without building the
+    names of all coefficients.
+
+    Coefficients follow the same syntax as ``cc_list``, ``ec_list``,
+    ``rc_list`` and ``prc_list``, i.e. "ccJR1_R2", "ccS1_R2", "ecR1_S1",
+    "ecR1_Vf_1", "rcJR1_Vf_1", "prcS1_Vf_1_R2", etc.
+
+    Parameters
+    ----------
+    mod : PysMod
+        A Pysces model.
+
+    See Also
+    --------
+    coefficient_registry
+    """
+
+    kinds = ('cc', 'ec', 'rc', 'prc')
+
+    def __init__(self, mod):
+        super(CoefficientRegistry, self).__init__()
+        self.reactions = [str(each) for each in mod.reactions]
+        self.species = [str(each) for each in mod.species]
+        self.parameters = [str(each) for each in mod.parameters]
+
+        self._entity_names = self.reactions + self.species + self.parameters
+        self._entity_ids = {}
+        for entity_id, name in enumerate(self._entity_names):
+            self._entity_ids.setdefault(name, entity_id)
+
+        # the coefficients of each kind are laid out as nested loops over
+        # the "axes" of the kind (outermost first). Each axis is a list of
+        # (member name, text in coefficient name) pairs and "order" gives
+        # the axes of the members in the order of the coefficient name.
+        top = [(each, each) for each in self.species] + \
+              [(each, 'J' + each) for each in self.reactions]
+        reactions = [(each, each) for each in self.reactions]
+        bases = [(each, each) for each in self.species + self.parameters]
+        parameters = [(each, each) for each in self.parameters]
+        self._layouts = {'cc': {'axes': [reactions, top],
+                                'order': (1, 0)},
+                         'ec': {'axes': [reactions, bases],
+                                'order': (0, 1)},
+                         'rc': {'axes': [parameters, top],
+                                'order': (1, 0)},
+                         'prc': {'axes': [parameters, reactions, top],
+                                 'order': (2, 0, 1)}}
+
+        offset = 0
+        self._offsets = []
+        for kind in self.kinds:
+            layout = self._layouts[kind]
+            # member name or name text -> position on each axis
+            layout['members'] = [dict((member, i) for i, (member, _)
+                                      in enumerate(axis))
+                                 for axis in layout['axes']]
+            layout['texts'] = [dict((text, i) for i, (_, text)
+                                    in enumerate(axis))
+                               for axis in layout['axes']]
+            size = 1
+            for axis in layout['axes']:
+                size *= len(axis)
+            layout['offset'] = offset
+            layout['size'] = size
+            self._offsets.append(offset)
+            offset += size
+        self._size = offset
+
+    @staticmethod
+    def _id_of(layout, positions):
+        local = 0
+        for axis, position in zip(layout['axes'], positions):
+            local = local * len(axis) + position
+        return layout['offset'] + local
+
+    def _locate(self, coefficient_id):
+        # returns the kind and the member and text pairs of a coefficient
+        if not 0 <= coefficient_id < self._size:
+            raise IndexError('Invalid coefficient id %s' % coefficient_id)
+        kind = self.kinds[bisect_right(self._offsets, coefficient_id) - 1]
+        layout = self._layouts[kind]
+        local = coefficient_id - layout['offset']
+        positions = []
+        for axis in reversed(layout['axes']):
+            local, position = divmod(local, len(axis))
+            positions.append(position)
+        positions.reverse()
+        return kind, [layout['axes'][axis][positions[axis]]
+                      for axis in layout['order']]
+
+    def _parse(self, name):
+        # returns the id of a coefficient (or None) by splitting its name
+        # at underscores into the texts of its members - member names may
+        # themselves contain underscores, so all splits are tried
+        if name.startswith('prc'):
+            kind = 'prc'
+        elif name[:2] in ('cc', 'ec', 'rc'):
+            kind = name[:2]
+        else:
+            return None
+        layout = self._layouts[kind]
+        order = layout['order']
+        rest = name[len(kind):]
+        underscores = [i for i, char in enumerate(rest) if char == '_']
+        found = None
+        for splits in combinations(underscores, len(order) - 1):
+            bounds = [-1] + list(splits) + [len(rest)]
+            positions = [None] * len(order)
+            for i, axis in enumerate(order):
+                position = layout['texts'][axis].get(
+                    rest[bounds[i] + 1:bounds[i + 1]])
+                if position is None:
+                    break
+                positions[axis] = position
+            else:
+                # an ambiguous name refers to the last such coefficient
+                coefficient_id = self._id_of(layout, positions)
+                if found is None or coefficient_id > found:
+                    found = coefficient_id
+        return found
+
+    def _entries(self, kind):
+        # yields the name and member names of each coefficient of a kind
+        # in the order of their ids
+        order = self._layouts[kind]['order']
+        for pairs in product(*self._layouts[kind]['axes']):
+            pairs = [pairs[axis] for axis in order]
+            yield (kind + '_'.join(text for _, text in pairs),
+                   tuple(member for member, _ in pairs))
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, name):
+        return self._parse(name) is not None
+
+    def entity_id(self, name):
+        """
+        Returns the id of a reaction, species or parameter.
+        """
+        return self._entity_ids[name]
+
+    def entity_name(self, entity_id):
+        """
+        Returns the name of the reaction, species or parameter with id
+        `entity_id`.
+        """
+        return self._entity_names[entity_id]
+
+    def coefficient_id(self, name):
+        """
+        Returns the id of a coefficient.
+
+        Raises
+        ------
+        KeyError
+            If `name` is not a coefficient of the model.
+        """
+        coefficient_id = self._parse(name)
+        if coefficient_id is None:
+            raise KeyError(name)
+        return coefficient_id
+
+    def coefficient_name(self, coefficient_id):
+        """
+        Returns the name of the coefficient with id `coefficient_id`.
+        """
+        kind, pairs = self._locate(coefficient_id)
+        return kind + '_'.join(text for _, text in pairs)
+
+    def find(self, kind, *members):
+        """
+        Returns the id of a coefficient from its kind and the names of its
+        members.
+
+        Parameters
+        ----------
+        kind : str
+            One of "cc", "ec", "rc" or "prc".
+        members : str
+            The names of the members of the coefficient in the same order
+            as in its name (e.g. reaction and species for "ec").
+
+        Returns
+        -------
+        int
+
+        Examples
+        --------
+        >>> registry.coefficient_name(registry.find('ec', 'R1', 'S1'))
+        'ecR1_S1'
+        """
+        layout = self._layouts[kind]
+        if len(members) != len(layout['order']):
+            raise KeyError((kind,) + members)
+        positions = [None] * len(members)
+        for member, axis in zip(members, layout['order']):
+            positions[axis] = layout['members'][axis][member]
+        return self._id_of(layout, positions)
+
+    def kind(self, coefficient_id):
+        """
+        Returns the kind ("cc", "ec", "rc" or "prc") of a coefficient.
+        """
+        return self._locate(coefficient_id)[0]
+
+    def member_ids(self, coefficient_id):
+        """
+        Returns the ids of the members of a coefficient.
+        """
+        return tuple(self._entity_ids[member]
+                     for member, _ in self._locate(coefficient_id)[1])
+
+    def split(self, name):
+        """
+        Returns the kind and the names of the members of a coefficient.
+
+        Parameters
+        ----------
+        name : str
+            The name of a coefficient.
+
+        Returns
+        -------
+        tuple of str or None
+            None if `name` is not a coefficient of the model.
+
+        Examples
+        --------
+        >>> registry.split('prcJR1_Vf_1_R2')
+        ('prc', 'R1', 'Vf_1', 'R2')
+        """
+        coefficient_id = self._parse(name)
+        if coefficient_id is None:
+            return None
+        kind, pairs = self._locate(coefficient_id)
+        return (kind,) + tuple(member for member, _ in pairs)
+
+    def names(self, kind=None):
+        """
+        Returns the names of all coefficients (of a particular kind) in
+        the order of their ids.
+        """
+        kinds = self.kinds if kind is None else (kind,)
+        return [name for each in kinds for name, _ in self._entries(each)]
+
+    def ids(self, kind=None):
+        """
+        Returns an array of the ids of all coefficients (of a particular
+        kind).
+        """
+        if kind is None:
+            return arange(self._size, dtype=int64)
+        layout = self._layouts[kind]
+        return arange(layout['offset'], layout['offset'] + layout['size'],
+                      dtype=int64)
+
+    def ids_of(self, names):
+        """
+        Returns an array of the ids of a sequence of coefficients that can
+        be used to index arrays of coefficient values.
+        """
+        return array([self.coefficient_id(each) for each in names],
+                     dtype=int64)
+
+    def member_dict(self, kind):
+        """
+        Returns a dictionary with the names of the coefficients of a
+        particular kind as keys and tuples of the names of their members
+        as values.
+        """
+        return dict(self._entries(kind))
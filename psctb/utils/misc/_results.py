@@ -0,0 +1,260 @@
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from weakref import WeakValueDictionary
+
+from numpy import array, append, float64, full, nan
+
+from ._misc import DotDict, formatter_factory, html_table
+from ._state import frozen_state
+
+__all__ = ['ResultIndex',
+           'ResultArray']
+
+
+class ResultIndex(object):
+    """
+    An immutable, ordered index of result names.
+
+    Indices are shared: `ResultIndex.shared` returns the same instance for
+    the same sequence of names, so that many `ResultArray` objects with the
+    same names only store the names (and their positions) once.
+
+    Parameters
+    ----------
+    names : iterable of str
+        The names in the order of their positions.
+    """
+
+    _shared = WeakValueDictionary()
+
+    def __init__(self, names):
+        super(ResultIndex, self).__init__()
+        self.names = tuple(str(each) for each in names)
+        self.positions = dict((name, i) for i, name in enumerate(self.names))
+        assert len(self.positions) == len(self.names), \
+            'Result names must be unique'
+
+    @classmethod
+    def shared(cls, names):
+        """
+        Returns the shared index of a sequence of names.
+        """
+        if isinstance(names, ResultIndex):
+            return names
+        names = tuple(str(each) for each in names)
+        index = cls._shared.get(names)
+        if index is None:
+            index = cls(names)
+            cls._shared[names] = index
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __reduce__(self):
+        return ResultIndex.shared, (self.names,)
+
+    def extended(self, name):
+        """
+        Returns the shared index of these names followed by `name`.
+        """
+        return ResultIndex.shared(self.names + (str(name),))
+
+
+class ResultArray(object):
+    """
+    A compact, dictionary-like container of numeric results.
+
+    The names of the results are held by a shared `ResultIndex` and their
+    values by a single numpy array, rather than as separate dictionary
+    entries and instance attributes as with ``DotDict``. Results may
+    nevertheless be accessed by key (``results['ecR1_S1']``) or via dot
+    notation (``results.ecR1_S1``), and the container supports the
+    ``dict`` methods commonly used on ``DotDict`` results (``keys``,
+    ``values``, ``items``, ``get``, ``update``, etc.). Like ``DotDict``,
+    an html representation can be set up with ``_make_repr``; it is only
+    rendered when requested.
+
+    Parameters
+    ----------
+    names : iterable of str or ResultIndex, optional (Default : None)
+        The names of the results, or a dictionary of names and values.
+    values : array_like, optional (Default : None)
+        The values of the results (in the order of `names`). If None the
+        values are initialised to NaN or, if `names` is a dictionary, to
+        its values.
+
+    See Also
+    --------
+    DotDict
+    ResultIndex
+    """
+
+    def __init__(self, names=None, values=None):
+        super(ResultArray, self).__init__()
+        if names is None:
+            names = ()
+        if isinstance(names, dict):
+            keys = list(names.keys())
+            values = [names[each] for each in keys]
+            names = keys
+        self._index = ResultIndex.shared(names)
+        if values is None:
+            self._values = full(len(self._index), nan)
+        else:
+            self._values = array(values, dtype=float64).reshape(
+                len(self._index))
+        self._repr_args = None
+
+    @property
+    def index(self):
+        """
+        The `ResultIndex` of the results.
+        """
+        return self._index
+
+    @property
+    def array(self):
+        """
+        The values of the results as a numpy array in the order of
+        ``keys()``.
+        """
+        return self._values
+
+    def __getattr__(self, name):
+        # only called when normal attribute lookup fails
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._values[self._index.positions[name]]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __dir__(self):
+        return sorted(set(dir(type(self)) + list(self.__dict__.keys()) +
+                          list(self._index.names)))
+
+    def __getitem__(self, key):
+        return self._values[self._index.positions[key]]
+
+    def __setitem__(self, key, value):
+        position = self._index.positions.get(key)
+        if position is None:
+            if key in DotDict._reserved or hasattr(ResultArray, key):
+                raise Exception('%s is a reserved key' % key)
+            self._index = self._index.extended(key)
+            self._values = append(self._values, float64(value))
+        else:
+            self._values[position] = value
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __eq__(self, other):
+        try:
+            return dict(self.items()) == dict(other.items())
+        except AttributeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def keys(self):
+        return list(self._index.names)
+
+    def values(self):
+        return list(self._values)
+
+    def items(self):
+        return list(zip(self._index.names, self._values))
+
+    def get(self, key, default=None):
+        position = self._index.positions.get(key)
+        if position is None:
+            return default
+        return self._values[position]
+
+    def update(self, dic):
+        if isinstance(dic, ResultArray) and dic._index is self._index:
+            self._values[:] = dic._values
+            return
+        new_keys = [k for k in dic.keys() if k not in self._index]
+        if new_keys:
+            for k in new_keys:
+                if k in DotDict._reserved or hasattr(ResultArray, k):
+                    raise Exception('%s is a reserved key' % k)
+            self._index = ResultIndex.shared(self._index.names +
+                                             tuple(new_keys))
+            self._values = append(self._values, full(len(new_keys), nan))
+        positions = self._index.positions
+        for k in dic.keys():
+            self._values[positions[k]] = dic[k]
+
+    def copy(self):
+        new = ResultArray(self._index, self._values.copy())
+        new._repr_args = self._repr_args
+        return new
+
+    def to_dict(self):
+        """
+        Returns the results as a ``DotDict``.
+        """
+        return DotDict(self.items())
+
+    def _make_repr(self, key, value, formatter=None):
+        """
+        Sets up the html representation of the results (see
+        ``DotDict._make_repr``). The table is only rendered when
+        ``_repr_html_`` is called.
+
+        Parameters
+        ----------
+        key : str
+            A string that will be evaluated indicating how to represent the
+            keys ("k"). If "k" is passed, the key will be displayed as is.
+        value : str
+            A string that will be evaluated indicating how to represent
+            the values ("v"). If "v" is passed, the value will be displayed
+            as is.
+        formatter : function, optional (Default : None)
+            A formatter function that formats numbers. If none, the default
+            function produced by `formatter_factory` will be used.
+        """
+        self._repr_args = (key, value, formatter)
+
+    def _repr_html_(self):
+        key, value, formatter = self._repr_args or ('k', 'v', None)
+        if not formatter:
+            formatter = formatter_factory()
+        lst = []
+        with frozen_state():
+            for k, v in sorted(self.items()):
+                lst.append((eval(key), eval(value)))
+
+        tables = []
+        for i in range(0, len(lst), 10):
+            tables.append(html_table(lst[i:i + 10],
+                                     style='display: inline-table',
+                                     raw=True,
+                                     formatter=formatter))
+        return '<div>' + ''.join(each + '\t\t' for each in tables) + \
+            '</div>'
@@ -0,0 +1,121 @@
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+
+__all__ = ['state_version',
+           'mark_state_changed',
+           'frozen_state']
+
+# the instance attribute that holds the state version of a model
+_VERSION = '_psctb_state_version'
+# True once PysMod.__setattr__ counts state changes
+_tracking = [False]
+# a stack of dictionaries (id(model) -> version) of active frozen_state
+# contexts
+_frozen_versions = []
+
+
+def _install_tracking():
+    # Pysces changes the state of a model (parameters, species, steady
+    # state values, elasticities, etc.) only by assigning model attributes,
+    # either directly or in the code it executes during doState, doMca,
+    # etc. Counting assignments therefore counts every state change, at
+    # the cost of a dictionary update per assignment.
+    from pysces.PyscesModel import PysMod
+
+    base_setattr = PysMod.__setattr__
+
+    def __setattr__(self, name, value):
+        base_setattr(self, name, value)
+        attributes = self.__dict__
+        attributes[_VERSION] = attributes.get(_VERSION, 0) + 1
+
+    PysMod.__setattr__ = __setattr__
+    _tracking[0] = True
+
+
+def mark_state_changed(mod):
+    """
+    Increases the state version of a model.
+
+    Assigning an attribute of a model (e.g. ``mod.Vf_1 = 2`` or
+    ``setattr(mod, 'S1', 1.5)``) and calculating its state already do so;
+    this is only needed after the arrays of a model have been modified in
+    place.
+
+    Parameters
+    ----------
+    mod : PysMod
+        A Pysces model.
+
+    See Also
+    --------
+    state_version
+    """
+    if not _tracking[0]:
+        _install_tracking()
+    attributes = mod.__dict__
+    attributes[_VERSION] = attributes.get(_VERSION, 0) + 1
+
+
+def state_version(mod):
+    """
+    Returns the state version of a model.
+
+    The version is a counter that is increased every time an attribute
+    of the model is assigned, i.e. whenever parameters or species are set
+    (directly or e.g. by a scan) and whenever the state of the model is
+    calculated (``doState``, ``doMca``, etc.). Values calculated from the
+    model may therefore be stored together with the version and reused
+    for as long as the version stays the same.
+
+    Within a `frozen_state` context the version of each model is only
+    read once.
+
+    Parameters
+    ----------
+    mod : PysMod
+        A Pysces model.
+
+    Returns
+    -------
+    int
+
+    See Also
+    --------
+    mark_state_changed
+    frozen_state
+    """
+    if not _tracking[0]:
+        _install_tracking()
+    if _frozen_versions:
+        frozen = _frozen_versions[-1]
+        version = frozen.get(id(mod))
+        if version is None:
+            version = mod.__dict__.get(_VERSION, 0)
+            frozen[id(mod)] = version
+        return version
+    return mod.__dict__.get(_VERSION, 0)
+
+
+@contextmanager
+def frozen_state():
+    """
+    A context manager during which the state of models is assumed not
+    to change.
+
+    Values that are read many times at once (e.g. when rendering the html
+    representation of a ``DotDict``) are then computed from a consistent
+    state. The state of models should not be changed inside this context.
+
+    See Also
+    --------
+    state_version
+    """
+    _frozen_versions.append({})
+    try:
+        yield
+    finally:
+        _frozen_versions.pop()
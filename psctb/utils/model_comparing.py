@@ -1,21 +1,26 @@
 import copy
 import warnings
-from os import path
+from collections import OrderedDict
+from hashlib import sha1
+from os import path, makedirs
 
 import numpy as np
 import pandas as pd
 from pysces import Scanner, ParScanner
 from pysces import model as pysces_model
 from matplotlib import pyplot as plt
+from multiprocessing import cpu_count
 
+from .. import modeltools
 from .misc import scanner_range_setup, DotDict, cc_dict, rc_dict, ec_dict, prc_dict, is_parameter, is_species, \
-    is_mca_coef, silence_print
+    is_mca_coef, silence_print, parallel_map
 
 __all__ = ['compare_models',
            'SteadyStateComparer',
            'SimulationComparer',
            'ParameterScanComparer',
-           'ClosedOpenComparer']
+           'ClosedOpenComparer',
+           'EnsembleComparer']
 
 def compare_models(model_list, model_mapping = None, augment_mapping=True, comparison_type = 'ss'):
     """
@@ -74,6 +79,152 @@ def compare_models(model_list, model_mapping = None, augment_mapping=True, compa
     return  comparer(model_list, model_mapping, augment_mapping)
 
 
+quiet_mod_to_str = silence_print(modeltools.mod_to_str)
+
+
+def _rebuild_model(model_str, model_name, values):
+    """
+    Instantiates a model from its string representation and sets its
+    parameters and species to `values`.
+    """
+    model = modeltools.str_to_mod(model_str, model_name)
+    model.SetQuiet()
+    for k, v in values.items():
+        setattr(model, k, v)
+    return model
+
+
+def _failure_message(error):
+    return '{}: {}'.format(type(error).__name__, error)
+
+
+@silence_print
+def _steady_state_worker(args):
+    # worker for SteadyStateComparer - needs to be module level to be
+    # picklable. Returns the results and None, or NaNs and an error message
+    model_str, model_name, values, state_method, attr_names = args
+    try:
+        model = _rebuild_model(model_str, model_name, values)
+        if state_method == 'mca':
+            model.doMca()
+        else:
+            model.doState()
+        return [np.nan if attr is None else getattr(model, attr)
+                for attr in attr_names], None
+    except Exception as e:
+        return [np.nan for _ in attr_names], _failure_message(e)
+
+
+@silence_print
+def _parameter_scan_worker(args):
+    # worker for ParameterScanComparer - needs to be module level to be
+    # picklable. Returns the results and None, or NaNs and an error message
+    (model_str, model_name, values, scan_in, scan_out,
+     start, end, points, is_log_range) = args
+    try:
+        model = _rebuild_model(model_str, model_name, values)
+        return ResultsGenerator.do_par_scan(model=model,
+                                            scan_in=scan_in,
+                                            scan_out=scan_out,
+                                            start=start,
+                                            end=end,
+                                            points=points,
+                                            is_log_range=is_log_range,
+                                            par_scan=False,
+                                            par_engine=None), None
+    except Exception as e:
+        return ResultsGenerator.failed_scan(start, end, points, is_log_range,
+                                            len(scan_out)), \
+            _failure_message(e)
+
+
+@silence_print
+def _ensemble_worker(args):
+    # worker for EnsembleComparer - needs to be module level to be
+    # picklable. Solves a chunk of parameter sets with a single model
+    # instance and returns the results and a dict of failure messages
+    # (keyed by the row in the chunk)
+    (model_str, model_name, values, parameter_names, parameter_matrix,
+     state_method, output_list) = args
+    results = np.empty((len(parameter_matrix), len(output_list)))
+    results.fill(np.nan)
+    failures = {}
+    try:
+        model = _rebuild_model(model_str, model_name, values)
+    except Exception as e:
+        message = _failure_message(e)
+        return results, {i: message for i in range(len(parameter_matrix))}
+    species_values = {k: values[k] for k in model.species}
+    for i, parameter_values in enumerate(parameter_matrix):
+        try:
+            # every parameter set starts from the same initial state
+            for k, v in species_values.items():
+                setattr(model, k, v)
+            for k, v in zip(parameter_names, parameter_values):
+                setattr(model, k, v)
+            model.doState()
+            if not model.__StateOK__:
+                failures[i] = 'Invalid steady state'
+                continue
+            if state_method == 'mca':
+                model.EvalEvar()
+                model.EvalEpar()
+                model.EvalCC()
+            results[i] = [getattr(model, attr) for attr in output_list]
+        except Exception as e:
+            failures[i] = _failure_message(e)
+    return results, failures
+
+
+def _open_output(stream_file, shape):
+    if stream_file:
+        return np.lib.format.open_memmap(stream_file, mode='r+')
+    return np.empty(shape)
+
+
+@silence_print
+def _simulation_worker(args):
+    # worker for SimulationComparer - needs to be module level to be
+    # picklable. Returns the results (None if they were written to
+    # stream_file) and None, or NaNs and an error message
+    (model_str, model_name, values, time_range, plan, num_of_columns,
+     stream_file, chunk_points) = args
+    out = _open_output(stream_file, (len(time_range), num_of_columns))
+    message = None
+    try:
+        model = _rebuild_model(model_str, model_name, values)
+        ResultsGenerator.simulate_into(model, time_range, plan, out, chunk_points)
+    except Exception as e:
+        out[:, 1:] = np.nan
+        message = _failure_message(e)
+    if stream_file:
+        out.flush()
+        out = None
+    return out, message
+
+
+@silence_print
+def _closed_open_worker(args):
+    # worker for ClosedOpenComparer - needs to be module level to be
+    # picklable. The input and time columns of `out` are already filled in
+    (model_str, model_name, values, input_names, input_matrix, output_names,
+     output_columns, out, stream_file) = args
+    if stream_file:
+        out = np.lib.format.open_memmap(stream_file, mode='r+')
+    message = None
+    try:
+        model = _rebuild_model(model_str, model_name, values)
+        ResultsGenerator.steady_states_into(model, input_names, input_matrix,
+                                            output_names, output_columns, out)
+    except Exception as e:
+        out[:, output_columns] = np.nan
+        message = _failure_message(e)
+    if stream_file:
+        out.flush()
+        out = None
+    return out, message
+
+
 class ModelMapper(object):
     @staticmethod
     def map_models(model_list, model_mapping=None, augment_mapping=True):
@@ -155,10 +306,12 @@ class ModelMapper(object):
         instantiations, returns a list of unique objects.
         """
         new_model_list = []
+        seen = set()
         for model in model_list:
-            if model in new_model_list:
+            if id(model) in seen:
                 new_model_list.append(ModelMapper.clone_model(model))
             else:
+                seen.add(id(model))
                 new_model_list.append(model)
         return new_model_list
 
@@ -200,20 +353,68 @@ class ModelMapper(object):
             mapping_array.append(match_attributes)
         return np.array(mapping_array).T
 
+    # structure signature -> unmodified model instance from which clones
+    # are copied. Only the most recently used templates are kept so that
+    # the templates of models that are no longer compared are freed.
+    _clone_templates = OrderedDict()
+    clone_template_limit = 8
+
     @staticmethod
     def clone_model(model):
         """
         Given a model this method returns a new instantiation of the same
-        model.
+        model with the same parameter and species values.
+
+        The model file is only parsed the first time a model with a
+        particular structure is cloned. The resulting instance is kept
+        as a template from which further clones are copied, which avoids
+        parsing and compiling the model again. Templates of the
+        `clone_template_limit` most recently cloned structures are kept.
+        If the model file no longer matches the structure of `model` it
+        is parsed for every clone.
 
         See also:
         replace_with_clones
+        structure_signature
         """
-        new_model_path = path.join(model.ModelDir,
-                                   model.ModelFile)
-        new_model = pysces_model(new_model_path)
+        signature = ModelMapper.structure_signature(model)
+        templates = ModelMapper._clone_templates
+        template = templates.get(signature)
+        if template is not None:
+            templates.move_to_end(signature)
+            new_model = copy.deepcopy(template)
+        else:
+            new_model_path = path.join(model.ModelDir,
+                                       model.ModelFile)
+            new_model = pysces_model(new_model_path)
+            if ModelMapper.structure_signature(new_model) == signature:
+                templates[signature] = copy.deepcopy(new_model)
+                while len(templates) > ModelMapper.clone_template_limit:
+                    templates.popitem(last=False)
+        for k in list(model.parameters) + list(model.species):
+            if hasattr(new_model, k):
+                setattr(new_model, k, getattr(model, k))
         return new_model
 
+    @staticmethod
+    def structure_signature(model):
+        """
+        Returns a hash of the structure of a model (i.e. its species,
+        parameters, reactions, rate equations and stoichiometry) that
+        does not depend on the values of parameters or species.
+        """
+        structure = [list(model.species),
+                     list(model.fixed_species),
+                     list(model.parameters),
+                     list(model.reactions)]
+        for reaction in model.reactions:
+            reaction_dict = model.__nDict__[reaction]
+            structure.append([reaction_dict['RateEq'],
+                              reaction_dict['AllReagents'],
+                              reaction_dict['Modifiers']])
+        structure.append(sorted(getattr(model, '__rules__', {}).keys()))
+        return sha1(repr(structure).encode('utf-8')).hexdigest()
+
     @staticmethod
     def get_mca_dict_mapping(mca_dict, map_dict):
         """
@@ -298,13 +499,56 @@ class ModelMap(object):
         if not is_now_fixed:
             is_now_fixed = []
         self.is_now_fixed = is_now_fixed
+        self._build_index()
 
     @staticmethod
     def _reverse_dict(dict_):
         return {v: k for k, v in dict_.items()}
 
-    def getattrname(self, key):
-        prefix, suffix, key = ModelMap._prefix_suffix_getter(key)
+    def _build_index(self):
+        """
+        Builds dictionaries of all base model attribute names (including
+        their "J_", "_ss" and "_init" variants) to the names in this
+        model and vice versa, so that names are resolved with a single
+        lookup instead of being parsed on every call.
+
+        Only names that are parsed back into the same prefix, suffix and
+        attribute by `_prefix_suffix_getter` are included, so that the
+        indexed results are identical to the parsed results. Other names
+        fall back to parsing.
+        """
+        is_now_fixed = set(self.is_now_fixed)
+        self._index = {}
+        for key in self.attr_dict:
+            for prefix, suffix, full_key in ModelMap._variants(key):
+                self._index[full_key] = self._resolve(prefix, suffix, key)
+
+        self._rev_index = {False: {}, True: {}}
+        for attr, base_attr in self._rev_attr_dict.items():
+            if attr is None:
+                continue
+            is_fixed = base_attr in is_now_fixed
+            for prefix, suffix, full_attr in ModelMap._variants(attr):
+                self._rev_index[False][full_attr] = prefix + base_attr + suffix
+                self._rev_index[True][full_attr] = prefix + base_attr + \
+                    ('_ss' if is_fixed else suffix)
+
+    @staticmethod
+    def _variants(key):
+        # the names derived from key (with their prefix and suffix) that
+        # _prefix_suffix_getter parses back into key
+        variants = []
+        if not key.startswith('J_'):
+            if not key.endswith('_ss') and not key.endswith('_init'):
+                variants.append(('', '', key))
+            variants.append(('J_', '', 'J_' + key))
+            variants.append(('', '_ss', key + '_ss'))
+            variants.append(('', '_init', key + '_init'))
+        else:
+            variants.append(('J_', '', 'J_' + key))
+        return variants
+
+    def _resolve(self, prefix, suffix, key):
         attr = self.attr_dict[key]
         if attr is None:
             return None
@@ -313,9 +557,19 @@ class ModelMap(object):
         else:
             return prefix + attr + suffix
 
+    def getattrname(self, key):
+        try:
+            return self._index[key]
+        except KeyError:
+            pass
+        prefix, suffix, key = ModelMap._prefix_suffix_getter(key)
+        return self._resolve(prefix, suffix, key)
+
     def hasattr(self, item):
+        if item in self._index:
+            return True
         _, _, item = ModelMap._prefix_suffix_getter(item)
-        if item in list(self.attr_dict.keys()):
+        if item in self.attr_dict:
             return True
         else:
             return False
@@ -345,6 +599,11 @@ class ModelMap(object):
         return converted_attrs
 
     def base_names_from_attr_names(self, attr_list, add_ss = False):
+        rev_index = self._rev_index[bool(add_ss)]
+        try:
+            return [rev_index[attr] for attr in attr_list]
+        except KeyError:
+            pass
         new_attr_list = [ModelMap._prefix_suffix_getter(attr) for \
                          attr in attr_list]
         for i, p_s_a in enumerate(new_attr_list):
@@ -407,6 +666,21 @@ class ResultsGenerator(object):
         result = scanner.getResultMatrix()
         return result
 
+    @staticmethod
+    def failed_scan(start, end, points, is_log_range, num_of_outputs):
+        """
+        Returns the result matrix of a parameter scan that failed, i.e.
+        the scan range followed by columns of NaNs.
+        """
+        if is_log_range:
+            scan_range = np.logspace(np.log10(start), np.log10(end), points)
+        else:
+            scan_range = np.linspace(start, end, points)
+        result = np.empty((points, num_of_outputs + 1))
+        result.fill(np.nan)
+        result[:, 0] = scan_range
+        return result
+
     @staticmethod
     def do_simulation(model, time_range, sim_out):
         model.sim_time = time_range
@@ -417,6 +691,101 @@ class ResultsGenerator(object):
         results_to_keep = results[:,sim_out_index]
         return results_to_keep
 
+    @staticmethod
+    def iter_simulation(model, time_range, sim_out, chunk_points=None):
+        """
+        Simulates a model and yields the results in chunks of at most
+        `chunk_points` time points as tuples of the first row, the end
+        row (exclusive) and the results of the chunk.
+
+        Each chunk is simulated starting from the final species
+        concentrations of the previous chunk (with time shifted to start
+        at zero) so that only a single chunk is held in memory at a time.
+        This requires the model to be autonomous (i.e. without events or
+        other explicit time dependencies, see `is_autonomous`). If
+        `chunk_points` is None the whole time course is simulated at once.
+        """
+        time_range = np.asarray(time_range, dtype=float)
+        num_of_points = len(time_range)
+        if not chunk_points or chunk_points >= num_of_points:
+            yield 0, num_of_points, ResultsGenerator.do_simulation(model, time_range,
+                                                                    sim_out)
+            return
+
+        chunk_points = max(2, chunk_points)
+        species = list(model.species)
+        init_values = {s: getattr(model, s + '_init') for s in species}
+        try:
+            yield 0, chunk_points, ResultsGenerator.do_simulation(
+                model, time_range[:chunk_points], sim_out)
+            start = chunk_points
+            while start < num_of_points:
+                end = min(start + chunk_points - 1, num_of_points)
+                final_values = model.data_sim.getSpecies()[-1, 1:]
+                for s, value in zip(species, final_values):
+                    setattr(model, s + '_init', value)
+                # the chunk starts at the last point of the previous chunk
+                offset = time_range[start - 1]
+                results = ResultsGenerator.do_simulation(
+                    model, time_range[start - 1:end] - offset, sim_out)
+                results[:, 0] += offset
+                yield start, end, results[1:]
+                start = end
+        finally:
+            for s, value in init_values.items():
+                setattr(model, s + '_init', value)
+
+    @staticmethod
+    def is_autonomous(model_str):
+        """
+        Returns True if a model (as a string) has no events and does not
+        refer to time, i.e. if it can be simulated in chunks.
+        """
+        return '_TIME_' not in model_str and 'Event:' not in model_str
+
+    @staticmethod
+    def simulate_into(model, time_range, plan, out, chunk_points=None):
+        """
+        Simulates a model and writes the results into `out` (an array or
+        memory map with a row per time point and a column for time
+        followed by a column per output).
+
+        `plan` is a dictionary with the model attributes to simulate
+        ("sim_out") and the columns of `out` they are written to
+        ("sim_columns"), and the columns ("fixed_columns") and values
+        ("fixed_values") of outputs that are fixed in the model. All other
+        columns are set to NaN.
+        """
+        out[:] = np.nan
+        out[:, 0] = time_range
+        if plan['fixed_columns']:
+            out[:, plan['fixed_columns']] = plan['fixed_values']
+        for start, end, results in ResultsGenerator.iter_simulation(model,
+                                                                    time_range,
+                                                                    plan['sim_out'],
+                                                                    chunk_points):
+            out[start:end, 0] = results[:, 0]
+            out[start:end, plan['sim_columns']] = results[:, 1:]
+
+    @staticmethod
+    def steady_states_into(model, input_names, input_matrix, output_names,
+                           output_columns, out):
+        """
+        Calculates the steady state of a model for each row of
+        `input_matrix` (the values of the model attributes in
+        `input_names`) and writes the values of the model attributes in
+        `output_names` to the `output_columns` of `out`. Output names that
+        are None result in NaN.
+        """
+        output_index = [i for i, name in enumerate(output_names) if name is not None]
+        output_names = [output_names[i] for i in output_index]
+        output_columns = [output_columns[i] for i in output_index]
+        for row, input_values in enumerate(input_matrix):
+            for name, value in zip(input_names, input_values):
+                setattr(model, name, value)
+            model.doState()
+            out[row, output_columns] = [getattr(model, name) for name in output_names]
+
 
 class BaseModelComparer(object):
     def __init__(self, model_list, model_mapping=None, augment_mapping=True):
@@ -429,13 +798,17 @@ class BaseModelComparer(object):
 
         self.raw_data = None
         self.comparison = None
+        self.failures = DotDict()
 
     @silence_print
-    def do_compare(self, output_list=None, custom_init=None, uniform_init=True):
+    def do_compare(self, output_list=None, custom_init=None, uniform_init=True,
+                   parallel=False, processes=None):
         """
         Performs the comparison of the models.
 
         Results are stored in `self.raw_data` and `self.comparison`.
+        Models for which the calculation failed have NaN results and
+        are listed in `self.failures` together with the error message.
 
         Parameters
         ----------
@@ -453,13 +826,20 @@ class BaseModelComparer(object):
             If set to True, the attributes of each model will be set to
             that of the base model prior to comparison. `custom_inits`
             are applied after making model attributes uniform.
+        parallel : boolean, optional (Default : False)
+            If True each model is solved in a separate worker process
+            using an independent copy of the model. The models in
+            `model_list` are then not updated with the results.
+        processes : int, optional (Default : None)
+            The number of worker processes used when `parallel` is True.
+            If None the number of CPUs is used.
         """
         if output_list is None:
             output_list = self._get_default_outputs()
 
         self._uniform_init(uniform_init)
         self._custom_init(custom_init)
-        self._generate_raw_data(output_list)
+        self._generate_raw_data(output_list, parallel, processes)
         self._compare_raw_data()
 
     @silence_print
@@ -501,9 +881,35 @@ class BaseModelComparer(object):
     def _compare_raw_data(self):
         raise NotImplementedError
 
-    def _generate_raw_data(self, output_list):
+    def _generate_raw_data(self, output_list, parallel=False, processes=None):
         raise NotImplementedError
 
+    def _model_jobs(self):
+        """
+        Returns a list of the string representation, a unique name and
+        the parameter and species values of each model for rebuilding the
+        models in worker processes.
+        """
+        jobs = []
+        for i, mmap in enumerate(self.mmap_list):
+            model = mmap.model
+            values = {k: getattr(model, k) for k in
+                      list(model.parameters) + list(model.species)}
+            jobs.append((quiet_mod_to_str(model),
+                         '{}_compare_{}'.format(mmap.model_name, i),
+                         values))
+        return jobs
+
+    def _record_failures(self, messages):
+        self.failures = DotDict()
+        for mmap, message in zip(self.mmap_list, messages):
+            if message is not None:
+                self.failures[mmap.model_name] = message
+        if self.failures:
+            warnings.warn('Calculation failed for model(s): {}. '
+                          'See `failures` for details.'.format(
+                              ', '.join(self.failures.keys())))
+
     @silence_print
     def _output_to_ss(self, output_list):
         base_model = self.mmap_list[0].model
@@ -520,21 +926,39 @@ class BaseModelComparer(object):
 
 class SteadyStateComparer(BaseModelComparer):
     @silence_print
-    def _generate_raw_data(self, output_list):
+    def _generate_raw_data(self, output_list, parallel=False, processes=None):
         output_list = self._output_to_ss(output_list)
         all_results = []
+        messages = []
 
         base_model = self.mmap_list[0].model
         state_method = 'mca' if any([is_mca_coef(attr, base_model) for attr in output_list]) else 'ss'
 
-        for mmap in self.mmap_list:
-            if state_method == 'mca':
-                mmap.model.doMca()
-            else:
-                mmap.model.doState()
-            model_results = [mmap.getattr(attr) for attr in output_list]
-            all_results.append(model_results)
-        all_results = np.array(all_results).T
+        if parallel:
+            jobs = [job + (state_method,
+                           [mmap.getattrname(attr) for attr in output_list])
+                    for job, mmap in zip(self._model_jobs(), self.mmap_list)]
+            for model_results, message in parallel_map(_steady_state_worker,
+                                                       jobs,
+                                                       processes=processes):
+                all_results.append(model_results)
+                messages.append(message)
+        else:
+            for mmap in self.mmap_list:
+                try:
+                    if state_method == 'mca':
+                        mmap.model.doMca()
+                    else:
+                        mmap.model.doState()
+                    model_results = [mmap.getattr(attr) for attr in output_list]
+                    message = None
+                except Exception as e:
+                    model_results = [np.nan for _ in output_list]
+                    message = _failure_message(e)
+                all_results.append(model_results)
+                messages.append(message)
+        self._record_failures(messages)
+        all_results = np.array(all_results, dtype=float).T
         self.raw_data = pd.DataFrame(data=all_results,
                                      columns=[mmap.model_name for mmap in self.mmap_list],
                                      index=output_list)
@@ -566,11 +990,14 @@ class SteadyStateComparer(BaseModelComparer):
 class ParameterScanComparer(BaseModelComparer):
     @silence_print
     def do_compare(self, scan_in, scan_range, output_list=None, custom_init=None,
-                   uniform_init=True, par_scan=False, par_engine='multiproc'):
+                   uniform_init=True, par_scan=False, par_engine='multiproc',
+                   parallel=False, processes=None):
         """
         Performs the comparison of the models.
 
         Results are stored in `self.raw_data` and `self.comparison`.
+        Models for which the scan failed have NaN results and are listed
+        in `self.failures` together with the error message.
 
         Parameters
         ----------
@@ -599,38 +1026,71 @@ class ParameterScanComparer(BaseModelComparer):
         par_enging: str, optional (Default : 'multiproc')
             The parallel engine to be used. Options are dictated by
             PySCeS's ParScanner.
+        parallel : boolean, optional (Default : False)
+            If True the scan of each model is performed in a separate
+            worker process using an independent copy of the model (in
+            which case `par_scan` is ignored). The models in `model_list`
+            are then not modified by the scan.
+        processes : int, optional (Default : None)
+            The number of worker processes used when `parallel` is True.
+            If None the number of CPUs is used.
         """
         if output_list is None:
             output_list = self._get_default_outputs()
         self._uniform_init(uniform_init)
         self._custom_init(custom_init)
 
-        self._generate_raw_data(scan_in, output_list, scan_range, par_scan, par_engine)
+        self._generate_raw_data(scan_in, output_list, scan_range, par_scan, par_engine,
+                                parallel, processes)
         self._compare_raw_data()
 
     @silence_print
-    def _generate_raw_data(self, scan_in, output_list, scan_range, par_scan, par_engine):
+    def _generate_raw_data(self, scan_in, output_list, scan_range, par_scan, par_engine,
+                           parallel=False, processes=None):
         output_list = self._output_to_ss(output_list)
         main_column_labels = [scan_in] + output_list
         start, end, points, is_log_range = scanner_range_setup(scan_range)
 
-        all_results = DotDict()
-        for i, mmap in enumerate(self.mmap_list):
+        scan_args = []
+        for mmap in self.mmap_list:
             current_scan_in = mmap.getattrname(scan_in)
             current_scan_out = mmap.attr_names_from_base_names(output_list)
-            current_col_labels = [scan_in] + mmap.base_names_from_attr_names(current_scan_out, add_ss=True)
-
-            # parameter scan
-            raw_result = ResultsGenerator.do_par_scan(model=mmap.model,
-                                                      scan_in=current_scan_in,
-                                                      scan_out=current_scan_out,
-                                                      start=start,
-                                                      end=end,
-                                                      points=points,
-                                                      is_log_range=is_log_range,
-                                                      par_scan=par_scan,
-                                                      par_engine=par_engine)
+            scan_args.append((current_scan_in, current_scan_out))
+
+        if parallel:
+            jobs = [job + scan_arg + (start, end, points, is_log_range)
+                    for job, scan_arg in zip(self._model_jobs(), scan_args)]
+            outcomes = parallel_map(_parameter_scan_worker,
+                                    jobs,
+                                    processes=processes)
+        else:
+            outcomes = []
+            for mmap, (current_scan_in, current_scan_out) in zip(self.mmap_list,
+                                                                 scan_args):
+                # parameter scan
+                try:
+                    raw_result = ResultsGenerator.do_par_scan(model=mmap.model,
+                                                              scan_in=current_scan_in,
+                                                              scan_out=current_scan_out,
+                                                              start=start,
+                                                              end=end,
+                                                              points=points,
+                                                              is_log_range=is_log_range,
+                                                              par_scan=par_scan,
+                                                              par_engine=par_engine)
+                    outcomes.append((raw_result, None))
+                except Exception as e:
+                    outcomes.append((ResultsGenerator.failed_scan(start, end, points,
+                                                                  is_log_range,
+                                                                  len(current_scan_out)),
+                                     _failure_message(e)))
+        self._record_failures([message for _, message in outcomes])
 
+        all_results = DotDict()
+        for mmap, (_, current_scan_out), (raw_result, _) in zip(self.mmap_list,
+                                                                 scan_args,
+                                                                 outcomes):
+            current_col_labels = [scan_in] + mmap.base_names_from_attr_names(current_scan_out, add_ss=True)
             complete_results = pd.DataFrame(data=raw_result,
                                             columns=current_col_labels)
             complete_results = complete_results.reindex(columns=main_column_labels)
@@ -714,11 +1174,14 @@ class ParameterScanComparer(BaseModelComparer):
 class SimulationComparer(ParameterScanComparer):
     @silence_print
     def do_compare(self, time_range, output_list=None, custom_init=None,
-                   uniform_init=True):
+                   uniform_init=True, parallel=False, processes=None,
+                   stream_dir=None, chunk_points=None):
         """
         Performs the comparison of the models.
 
         Results are stored in `self.raw_data` and `self.comparison`.
+        Models for which the simulation failed have NaN results and are
+        listed in `self.failures` together with the error message.
 
         Parameters
         ----------
@@ -740,65 +1203,143 @@ class SimulationComparer(ParameterScanComparer):
             If set to True, the attributes of each model will be set to
             that of the base model prior to comparison. `custom_inits`
             are applied after making model attributes uniform.
+        parallel : boolean, optional (Default : False)
+            If True each model is simulated in a separate worker process
+            using an independent copy of the model.
+        processes : int, optional (Default : None)
+            The number of worker processes used when `parallel` is True.
+            If None the number of CPUs is used.
+        stream_dir : str, optional (Default : None)
+            A directory to which the results of each model are written as
+            a ".npy" file (named after the model) while they are
+            calculated. The DataFrames in `self.raw_data` are then backed
+            by read-only memory maps of these files rather than being
+            held in memory.
+        chunk_points : int, optional (Default : None)
+            The maximum number of time points that are simulated at once.
+            Longer time courses are simulated in consecutive chunks, each
+            starting from the final state of the previous one. Only used
+            for models without events or explicit time dependencies. If
+            None the whole time course is simulated at once.
         """
         if output_list is None:
             output_list = self._get_default_outputs()
         self._uniform_init(uniform_init)
         self._custom_init(custom_init)
 
-        self._generate_raw_data(output_list, time_range)
+        self._generate_raw_data(output_list, time_range, parallel, processes,
+                                stream_dir, chunk_points)
         self._compare_raw_data()
 
+    def _simulation_plan(self, mmap, output_list):
+        """
+        Returns the simulation plan (see `ResultsGenerator.simulate_into`)
+        of a model for a list of base model outputs.
+        """
+        plan = {'sim_out': [],
+                'sim_columns': [],
+                'fixed_columns': [],
+                'fixed_values': []}
+        for column, out in enumerate(output_list, 1):
+            if out in mmap.is_now_fixed:
+                plan['fixed_columns'].append(column)
+                plan['fixed_values'].append(mmap.getattr(out))
+            else:
+                attr = mmap.getattrname(out)
+                if attr is not None:
+                    plan['sim_out'].append(attr)
+                    plan['sim_columns'].append(column)
+        return plan
+
+    @staticmethod
+    def _stream_file(stream_dir, model_name):
+        if stream_dir:
+            return path.join(stream_dir, '{}.npy'.format(model_name))
+        return None
+
+    @staticmethod
+    def _make_output(stream_file, shape):
+        if stream_file:
+            return np.lib.format.open_memmap(stream_file, mode='w+',
+                                             dtype=float, shape=shape)
+        return np.empty(shape)
+
+    @staticmethod
+    def _results_frame(results, column_labels):
+        return pd.DataFrame(data=results[:, 1:],
+                            index=pd.Index(results[:, 0], name=column_labels[0]),
+                            columns=column_labels[1:],
+                            copy=False)
+
+    @staticmethod
+    def _finish_output(out, stream_file):
+        if stream_file:
+            out.flush()
+            return np.load(stream_file, mmap_mode='r')
+        return out
+
     @silence_print
-    def _generate_raw_data(self, output_list, time_range):
+    def _generate_raw_data(self, output_list, time_range, parallel=False,
+                           processes=None, stream_dir=None, chunk_points=None):
+        time_range = np.asarray(time_range, dtype=float)
         main_column_labels = ['Time'] + output_list
-        all_results = DotDict()
-        for i, mmap in enumerate(self.mmap_list):
-
-            now_fixed_indicies = []
-            for i,out in enumerate(output_list):
-                if out in mmap.is_now_fixed:
-                    now_fixed_indicies.append(i)
-            new_output_list = copy.deepcopy(output_list)
-            param_cols = []
-            for ind in reversed(now_fixed_indicies):
-                out_val = mmap.getattr(output_list[ind])
-                new_output_list.pop(ind)
-                param_cols.append([out_val for _ in range(time_range.shape[0])])
-            param_cols = param_cols
-
-            current_sim_out = mmap.attr_names_from_base_names(new_output_list)
-
-            real_sim_out = mmap.attr_names_from_base_names(output_list)
-            current_col_labels = ['Time'] + mmap.base_names_from_attr_names(real_sim_out )
-
-            # parameter scan
-            raw_result = ResultsGenerator.do_simulation(model=mmap.model,
-                                                        time_range=time_range,
-                                                        sim_out=current_sim_out)
-
-            new_raw_result = [col for col in raw_result.T]
-            for ind, col in zip(reversed(now_fixed_indicies), param_cols):
-                new_raw_result.insert(ind, col)
-            new_raw_result = np.array(new_raw_result).T
-
-            complete_results = pd.DataFrame(data=new_raw_result,
-                                            columns=current_col_labels)
+        shape = (len(time_range), len(main_column_labels))
+        if stream_dir and not path.exists(stream_dir):
+            makedirs(stream_dir)
+
+        plans = [self._simulation_plan(mmap, output_list) for mmap in self.mmap_list]
+        stream_files = [self._stream_file(stream_dir, mmap.model_name)
+                        for mmap in self.mmap_list]
+        outputs = [self._make_output(stream_file, shape) for stream_file in stream_files]
+
+        if parallel:
+            jobs = []
+            for job, plan, stream_file, out in zip(self._model_jobs(), plans,
+                                                   stream_files, outputs):
+                if stream_file:
+                    out.flush()
+                model_chunk_points = chunk_points if \
+                    ResultsGenerator.is_autonomous(job[0]) else None
+                jobs.append(job + (time_range, plan, shape[1], stream_file,
+                                   model_chunk_points))
+            outcomes = parallel_map(_simulation_worker, jobs, processes=processes)
+            messages = [message for _, message in outcomes]
+            outputs = [out if result is None else result
+                       for out, (result, _) in zip(outputs, outcomes)]
+        else:
+            messages = []
+            for mmap, plan, out in zip(self.mmap_list, plans, outputs):
+                model_chunk_points = chunk_points
+                if chunk_points and not ResultsGenerator.is_autonomous(
+                        quiet_mod_to_str(mmap.model)):
+                    model_chunk_points = None
+                try:
+                    ResultsGenerator.simulate_into(mmap.model, time_range, plan,
+                                                   out, model_chunk_points)
+                    messages.append(None)
+                except Exception as e:
+                    out[:, 1:] = np.nan
+                    messages.append(_failure_message(e))
+        self._record_failures(messages)
 
-            complete_results = complete_results.reindex(columns=main_column_labels)
-            complete_results = complete_results.set_index('Time')
-            all_results[mmap.model_name] = complete_results
+        all_results = DotDict()
+        for mmap, out, stream_file in zip(self.mmap_list, outputs, stream_files):
+            out = self._finish_output(out, stream_file)
+            all_results[mmap.model_name] = self._results_frame(out, main_column_labels)
         self.raw_data = all_results
 
 
 class ClosedOpenComparer(SimulationComparer):
     @silence_print
     def do_compare(self, time_range, output_list=None, custom_init=None,
-                   uniform_init=True):
+                   uniform_init=True, parallel=False, processes=None,
+                   stream_dir=None, chunk_points=None):
         """
         Performs the comparison of the models.
 
         Results are stored in `self.raw_data` and `self.comparison`.
+        Models for which the calculation failed have NaN results and are
+        listed in `self.failures` together with the error message.
 
         Parameters
         ----------
@@ -820,17 +1361,36 @@ class ClosedOpenComparer(SimulationComparer):
             If set to True, the attributes of each model will be set to
             that of the base model prior to comparison. `custom_inits`
             are applied after making model attributes uniform.
+        parallel : boolean, optional (Default : False)
+            If True the steady states of each (open) comparison model are
+            calculated in a separate worker process using an independent
+            copy of the model.
+        processes : int, optional (Default : None)
+            The number of worker processes used when `parallel` is True.
+            If None the number of CPUs is used.
+        stream_dir : str, optional (Default : None)
+            A directory to which the results of each model are written as
+            a ".npy" file (named after the model) while they are
+            calculated. The DataFrames in `self.raw_data` are then backed
+            by read-only memory maps of these files rather than being
+            held in memory.
+        chunk_points : int, optional (Default : None)
+            The maximum number of time points of the base model that are
+            simulated at once (see `SimulationComparer.do_compare`).
         """
         if output_list is None:
             output_list = self._get_default_outputs()
         self._uniform_init(uniform_init)
         self._custom_init(custom_init)
 
-        self._generate_raw_data(output_list, time_range)
+        self._generate_raw_data(output_list, time_range, parallel, processes,
+                                stream_dir, chunk_points)
         self._compare_raw_data()
 
     @silence_print
-    def _generate_raw_data(self, output_list, time_range):
+    def _generate_raw_data(self, output_list, time_range, parallel=False,
+                           processes=None, stream_dir=None, chunk_points=None):
+        time_range = np.asarray(time_range, dtype=float)
         base_mmap = self.mmap_list[0]
         full_scan_column_names = []
         for mmap in self.mmap_list:
@@ -839,38 +1399,245 @@ class ClosedOpenComparer(SimulationComparer):
         base_sim_out_list = full_scan_column_names + [out for out in output_list \
                                                       if out not in full_scan_column_names]
         base_column_names = ['Time'] + base_sim_out_list
-
-        all_results = DotDict()
-        simulation_results = ResultsGenerator.do_simulation(model=base_mmap.model,
-                                                            time_range=time_range,
-                                                            sim_out=base_sim_out_list)
-        base_complete_results = pd.DataFrame(data=simulation_results,
-                                             columns=base_column_names)
-        base_complete_results = base_complete_results.set_index('Time')
-        all_results[base_mmap.model_name] = base_complete_results
-
-        for i, mmap in enumerate(self.mmap_list[1:]):
+        shape = (len(time_range), len(base_column_names))
+        if stream_dir and not path.exists(stream_dir):
+            makedirs(stream_dir)
+
+        # the closed base model is simulated
+        base_stream_file = self._stream_file(stream_dir, base_mmap.model_name)
+        base_out = self._make_output(base_stream_file, shape)
+        base_plan = {'sim_out': base_sim_out_list,
+                     'sim_columns': list(range(1, len(base_column_names))),
+                     'fixed_columns': [],
+                     'fixed_values': []}
+        if chunk_points and not ResultsGenerator.is_autonomous(
+                quiet_mod_to_str(base_mmap.model)):
+            chunk_points = None
+        messages = [None]
+        try:
+            ResultsGenerator.simulate_into(base_mmap.model, time_range, base_plan,
+                                           base_out, chunk_points)
+        except Exception as e:
+            base_out[:, 1:] = np.nan
+            messages[0] = _failure_message(e)
+
+        # the steady states of the open comparison models are calculated
+        # for the concentrations of the (now fixed) species of the
+        # closed model at each time point
+        jobs = []
+        outputs = []
+        stream_files = []
+        for job, mmap in zip(self._model_jobs()[1:] if parallel else
+                             [None] * (len(self.mmap_list) - 1),
+                             self.mmap_list[1:]):
             scan_column_names = mmap.is_now_fixed
             output_partial = [out for out in output_list if out not in scan_column_names]
-            outputs = self._output_to_ss(output_partial)
-            output_col_names = ['Time'] + scan_column_names + output_partial
-
-            time_col = base_complete_results.reset_index()['Time'].as_matrix()
-            input_val_list = [base_complete_results[col_name].as_matrix() for col_name in scan_column_names]
-            raw_results = []
-            for input_vals in zip(*input_val_list):
-                current_row = [] + list(input_vals)
-                dict_to_set = dict(list(zip(scan_column_names, input_vals)))
-                mmap.setattrs_from_dict(dict_to_set)
-                mmap.model.doState()
-                current_row = current_row + mmap.getattrs_from_list(outputs)
-                raw_results.append(current_row)
-            raw_results = np.hstack((time_col[:,np.newaxis],np.array(raw_results)))
-            complete_results = pd.DataFrame(data=raw_results,
-                                            columns=output_col_names)
-            complete_results = complete_results.reindex(columns=base_column_names)
-            complete_results = complete_results.set_index('Time')
-            all_results[mmap.model_name] = complete_results
+            outputs_ss = self._output_to_ss(output_partial)
+
+            input_columns = [base_column_names.index(name) for name in scan_column_names]
+            output_columns = [base_column_names.index(name) for name in output_partial]
+            input_names = [mmap.getattrname(name) for name in scan_column_names]
+            output_names = [mmap.getattrname(name) for name in outputs_ss]
+
+            stream_file = self._stream_file(stream_dir, mmap.model_name)
+            out = self._make_output(stream_file, shape)
+            out[:] = np.nan
+            out[:, 0] = base_out[:, 0]
+            out[:, input_columns] = base_out[:, input_columns]
+            input_matrix = np.array(base_out[:, input_columns])
+            outputs.append(out)
+            stream_files.append(stream_file)
+
+            if parallel:
+                if stream_file:
+                    out.flush()
+                jobs.append(job + (input_names, input_matrix, output_names,
+                                   output_columns, None if stream_file else out,
+                                   stream_file))
+            else:
+                try:
+                    ResultsGenerator.steady_states_into(mmap.model, input_names,
+                                                        input_matrix, output_names,
+                                                        output_columns, out)
+                    messages.append(None)
+                except Exception as e:
+                    out[:, output_columns] = np.nan
+                    messages.append(_failure_message(e))
+        if parallel:
+            outcomes = parallel_map(_closed_open_worker, jobs, processes=processes)
+            messages += [message for _, message in outcomes]
+            outputs = [out if result is None else result
+                       for out, (result, _) in zip(outputs, outcomes)]
+        self._record_failures(messages)
+
+        all_results = DotDict()
+        for mmap, out, stream_file in zip(self.mmap_list,
+                                          [base_out] + outputs,
+                                          [base_stream_file] + stream_files):
+            out = self._finish_output(out, stream_file)
+            all_results[mmap.model_name] = self._results_frame(out, base_column_names)
         self.raw_data = all_results
 
 
+class EnsembleComparer(object):
+    """
+    Compares the steady state of a model for an ensemble of parameter
+    sets (e.g. sampled for an uncertainty analysis) to its steady state
+    with its current parameter values.
+
+    Unlike the other model comparers, results are stored as dense arrays
+    (one row per parameter set and one column per output) rather than
+    as a DataFrame per model.
+
+    Parameters
+    ----------
+    model : PysMod
+        The model. Its current parameter values and species
+        concentrations are used as reference. The model itself is not
+        modified by the comparison.
+    parameter_names : list of str
+        The names of the parameters that are varied.
+    parameter_matrix : array-like
+        An array with a row for each parameter set and a column for each
+        parameter in `parameter_names`.
+    """
+    def __init__(self, model, parameter_names, parameter_matrix):
+        super(EnsembleComparer, self).__init__()
+        parameter_matrix = np.atleast_2d(np.array(parameter_matrix, dtype=float))
+        assert parameter_matrix.shape[1] == len(parameter_names), \
+            'parameter_matrix must have a column for each parameter'
+        for parameter in parameter_names:
+            assert hasattr(model, parameter), \
+                'Invalid parameter {}'.format(parameter)
+        self.model = model
+        self.parameter_names = list(parameter_names)
+        self.parameter_matrix = parameter_matrix
+
+        self.output_list = None
+        self.reference = None
+        self.raw_data = None
+        self.comparison = None
+        self.failures = {}
+
+    @silence_print
+    def do_compare(self, output_list=None, parallel=False, processes=None,
+                   chunk_size=None, abs_values=False):
+        """
+        Performs the comparison of the parameter sets.
+
+        The reference values are stored in `self.reference` (an array with
+        a value per output), the results of each parameter set in
+        `self.raw_data` and the percentage changes relative to the
+        reference in `self.comparison` (arrays with a row per parameter set
+        and a column per output). The names of the outputs are stored
+        in `self.output_list`. Parameter sets for which a steady state
+        could not be calculated have NaN results and their row indices are
+        keys of `self.failures` with the error messages as values.
+
+        Parameters
+        ----------
+        output_list : list of str, optional (Default : None)
+            A list of model attributes to compare. Valid options are:
+            species, reactions, parameters, and mca coefficients. By
+            default all species and reactions are compared.
+        parallel : boolean, optional (Default : False)
+            If True chunks of parameter sets are solved in separate worker
+            processes.
+        processes : int, optional (Default : None)
+            The number of worker processes used when `parallel` is True.
+            If None the number of CPUs is used.
+        chunk_size : int, optional (Default : None)
+            The number of parameter sets solved by a single model
+            instance. By default the parameter sets are divided evenly
+            between the worker processes (or solved in a single chunk if
+            `parallel` is False).
+        abs_values : boolean, optional (Default : False)
+            If True the absolute percentage changes are calculated.
+        """
+        if output_list is None:
+            output_list = list(self.model.species) + list(self.model.reactions)
+        output_list = self._output_to_ss(output_list)
+        state_method = 'mca' if any([is_mca_coef(attr, self.model)
+                                     for attr in output_list]) else 'ss'
+
+        model_str = quiet_mod_to_str(self.model)
+        model_name = '{}_ensemble'.format(path.split(self.model.ModelFile)[-1][:-4])
+        values = {k: getattr(self.model, k) for k in
+                  list(self.model.parameters) + list(self.model.species)}
+
+        # the reference is calculated in the same way as the ensemble
+        reference, reference_failures = _ensemble_worker(
+            (model_str, model_name + '_ref', values, [], np.empty((1, 0)),
+             state_method, output_list))
+        if reference_failures:
+            warnings.warn('Calculation of the reference failed: {}'.format(
+                reference_failures[0]))
+
+        chunks = self._make_chunks(parallel, processes, chunk_size)
+        jobs = [(model_str, '{}_{}'.format(model_name, i), values,
+                 self.parameter_names, self.parameter_matrix[chunk],
+                 state_method, output_list)
+                for i, chunk in enumerate(chunks)]
+        outcomes = parallel_map(_ensemble_worker,
+                                jobs,
+                                processes=processes if parallel else 1)
+
+        self.failures = {}
+        for chunk, (_, chunk_failures) in zip(chunks, outcomes):
+            for i, message in chunk_failures.items():
+                self.failures[int(chunk[i])] = message
+        if self.failures:
+            warnings.warn('Calculation failed for {} of {} parameter sets. '
+                          'See `failures` for details.'.format(
+                              len(self.failures), len(self.parameter_matrix)))
+
+        self.output_list = output_list
+        self.reference = reference[0]
+        self.raw_data = np.vstack([results for results, _ in outcomes])
+        self.comparison = ResultsGenerator.percentage_change(self.reference,
+                                                             self.raw_data,
+                                                             abs_values)
+
+    def _make_chunks(self, parallel, processes, chunk_size):
+        num_of_sets = len(self.parameter_matrix)
+        if not chunk_size:
+            if parallel:
+                if processes is None:
+                    processes = cpu_count()
+                chunk_size = int(np.ceil(num_of_sets / float(processes)))
+            else:
+                chunk_size = num_of_sets
+        chunk_size = max(1, chunk_size)
+        indices = np.arange(num_of_sets)
+        return [indices[i:i + chunk_size] for i in range(0, num_of_sets, chunk_size)]
+
+    def _output_to_ss(self, output_list):
+        new_out_list = []
+        for each in output_list:
+            if each in self.model.species:
+                new_out_list.append(each + '_ss')
+            elif each in self.model.reactions:
+                new_out_list.append('J_' + each)
+            else:
+                new_out_list.append(each)
+        return new_out_list
+
+    def to_dataframe(self, comparison=True):
+        """
+        Returns the results as a DataFrame with a row per parameter set.
+
+        Parameters
+        ----------
+        comparison : boolean, optional (Default : True)
+            If True the percentage changes are returned, otherwise the
+            raw results.
+
+        Returns
+        -------
+        values: pandas.DataFrame
+            A DataFrame that includes the parameter values of each set
+            followed by the outputs.
+        """
+        data = self.comparison if comparison else self.raw_data
+        return pd.DataFrame(data=np.hstack([self.parameter_matrix, data]),
+                            columns=self.parameter_names + self.output_list)
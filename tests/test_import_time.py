@@ -0,0 +1,47 @@
+"""
+Checks that ``import psctb`` is fast, i.e. that the analysis modules and
+their heavy dependencies are only imported on first use.
+"""
+from __future__ import division, print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import subprocess
+import sys
+from os import path
+
+# generous compared to the few milliseconds it takes, while importing any
+# of the heavy dependencies takes several seconds
+IMPORT_TIME_BUDGET = 0.5
+
+HEAVY_MODULES = ['pysces', 'sympy', 'matplotlib']
+
+_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import psctb
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed,
+                  'imported': [each for each in %r if each in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def _measure_import():
+    # a fresh interpreter so that nothing is imported beforehand
+    repo_dir = path.dirname(path.dirname(path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-c', _SCRIPT],
+                                     cwd=repo_dir)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def test_import_time_budget():
+    result = _measure_import()
+    assert result['elapsed'] < IMPORT_TIME_BUDGET, \
+        'import psctb took %.3f s' % result['elapsed']
+
+
+def test_heavy_modules_not_imported():
+    result = _measure_import()
+    assert result['imported'] == [], \
+        'import psctb imported %s' % ', '.join(result['imported'])